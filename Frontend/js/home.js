@@ -70,11 +70,39 @@ function checkLoginStatus() {
     });
 }
 
+// Keyset pagination state for the feed
+let feedCursor = null;
+let feedLoading = false;
+let feedExhausted = false;
+let feedObserver = null;
+
 /**
  * Load and display feed posts
  */
 function loadFeed() {
-    fetch('http://localhost:5000/api/feed', {
+    feedCursor = null;
+    feedExhausted = false;
+    fetchFeedPage(false);
+}
+
+/**
+ * Load the next page of the feed (called when the end of the feed scrolls into view)
+ */
+function loadMoreFeed() {
+    if (feedLoading || feedExhausted || !feedCursor) return;
+    fetchFeedPage(true);
+}
+
+/**
+ * Fetch one page of the feed; append to the existing posts when `append` is true
+ */
+function fetchFeedPage(append) {
+    feedLoading = true;
+    const url = feedCursor
+        ? `http://localhost:5000/api/feed?cursor=${encodeURIComponent(feedCursor)}`
+        : 'http://localhost:5000/api/feed';
+
+    fetch(url, {
         method: 'GET',
         credentials: 'include'
     })
@@ -96,16 +124,24 @@ function loadFeed() {
         if (data.error) {
             console.error('Feed API error:', data.error);
             const postsContainer = document.querySelector('.posts-container');
-            if (postsContainer) {
+            if (postsContainer && !append) {
                 postsContainer.innerHTML = `<div class="no-posts" style="color: #ed4956; padding: 20px; text-align: center;">Error: ${data.error}</div>`;
             }
             return;
         }
+
+        feedCursor = data.next_cursor || null;
+        feedExhausted = !feedCursor;
         
         if (data.posts && data.posts.length > 0) {
             console.log(`✓ Rendering ${data.posts.length} posts`);
-            renderPosts(data.posts);
-        } else {
+            if (append) {
+                appendPosts(data.posts);
+            } else {
+                renderPosts(data.posts);
+            }
+            observeFeedEnd();
+        } else if (!append) {
             console.log('No posts in response');
             const postsContainer = document.querySelector('.posts-container');
             if (postsContainer) {
@@ -116,12 +152,38 @@ function loadFeed() {
     .catch(error => {
         console.error('Error loading feed:', error);
         const postsContainer = document.querySelector('.posts-container');
-        if (postsContainer) {
+        if (postsContainer && !append) {
             postsContainer.innerHTML = `<div class="no-posts" style="color: #ed4956; padding: 20px;">Failed to load posts. Check console for details.</div>`;
         }
+    })
+    .finally(() => {
+        feedLoading = false;
     });
 }
 
+/**
+ * Watch the last rendered post and load the next page when it becomes visible
+ */
+function observeFeedEnd() {
+    const postsContainer = document.querySelector('.posts-container');
+    if (!postsContainer || !('IntersectionObserver' in window)) return;
+
+    if (!feedObserver) {
+        feedObserver = new IntersectionObserver(entries => {
+            if (entries.some(entry => entry.isIntersecting)) {
+                loadMoreFeed();
+            }
+        }, { rootMargin: '600px' });
+    }
+    feedObserver.disconnect();
+    if (feedExhausted) return;
+
+    const lastPost = postsContainer.lastElementChild;
+    if (lastPost) {
+        feedObserver.observe(lastPost);
+    }
+}
+
 /**
  * Render posts to the DOM
  */
@@ -148,6 +210,22 @@ function renderPosts(posts) {
     // Interactions are already set up via event delegation, no need to re-setup
 }
 
+/**
+ * Append a further page of posts below the ones already rendered
+ */
+function appendPosts(posts) {
+    const postsContainer = document.querySelector('.posts-container');
+    if (!postsContainer) return;
+
+    posts.forEach((post, index) => {
+        try {
+            postsContainer.appendChild(createPostElement(post));
+        } catch (error) {
+            console.error(`Error rendering post ${index + 1}:`, error, post);
+        }
+    });
+}
+
 /**
  * Create a post element from post data
  */
@@ -210,7 +288,7 @@ function createPostElement(post) {
             <button class="post-more">⋯</button>
         </div>
         <div class="post-image">
-            <img src="${postImagePath}" alt="Post by ${post.username}" onerror="this.style.display='none'; this.nextElementSibling.style.display='flex';">
+            <img src="${postImagePath}"${post.image_srcset ? ` srcset="${post.image_srcset}" sizes="(max-width: 640px) 100vw, 614px"` : ''} alt="Post by ${post.username}" onerror="this.style.display='none'; this.nextElementSibling.style.display='flex';">
             <div class="placeholder-image" style="display: none;">📷</div>
         </div>
         <div class="post-actions">
@@ -289,10 +367,16 @@ function loadStories() {
             console.error('Stories API error:', data.error);
             return;
         }
-        if (data.stories && data.stories.length > 0) {
-            console.log(`Rendering ${data.stories.length} stories`);
-            window._storiesCache = data.stories;
-            renderStories(data.stories);
+        if (data.rings && data.rings.length > 0) {
+            console.log(`Rendering ${data.rings.length} story rings`);
+            // The viewer steps through every story, ring after ring
+            window._storiesCache = data.rings.flatMap(ring => ring.stories.map(story => ({
+                ...story,
+                user_id: ring.user_id,
+                username: ring.username,
+                profile_pic: ring.profile_pic
+            })));
+            renderStories(data.rings);
         } else {
             console.log('No stories found');
             window._storiesCache = [];
@@ -304,16 +388,16 @@ function loadStories() {
 }
 
 /**
- * Render stories to the DOM
+ * Render story rings to the DOM (one tile per author)
  */
-function renderStories(stories) {
+function renderStories(rings) {
     const storiesContainer = document.querySelector('.stories-bottom-scroll');
     if (!storiesContainer) {
         console.error('Stories container not found!');
         return;
     }
     
-    console.log(`Rendering ${stories.length} stories`);
+    console.log(`Rendering ${rings.length} story rings`);
     storiesContainer.innerHTML = '';
     
     // Add "Your Story" first
@@ -333,23 +417,25 @@ function renderStories(stories) {
     }
     storiesContainer.appendChild(yourStory);
     
-    // Add other stories
-    stories.forEach(story => {
-        const storyElement = createStoryElement(story);
+    // Add one tile per author, opening at their oldest live story
+    rings.forEach(ring => {
+        const storyElement = createStoryElement(ring);
         storiesContainer.appendChild(storyElement);
     });
 }
 
 /**
- * Create a story element
+ * Create a story ring element
  */
-function createStoryElement(story) {
+function createStoryElement(ring) {
+    const story = { ...ring.stories[0], username: ring.username, profile_pic: ring.profile_pic };
     const div = document.createElement('div');
     div.className = 'story-item-bottom';
     div.dataset.storyId = story.id;
     div.dataset.storyUsername = story.username;
     div.dataset.storyImage = story.image_url || '';
     div.dataset.storyProfile = story.profile_pic || '';
+    div.dataset.storyCount = ring.stories.length;
     
     // Profile pic path for stories
     let profilePicPath;
@@ -584,7 +670,7 @@ function setupInteractions() {
 const likeRequestsInProgress = new Set();
 
 /**
- * Toggle like on a post
+ * Toggle like on a post (PUT to like, DELETE to unlike, so repeats are harmless)
  */
 function toggleLike(postId, button) {
     // Prevent double-clicks
@@ -595,7 +681,7 @@ function toggleLike(postId, button) {
     likeRequestsInProgress.add(postId);
     
     fetch(`http://localhost:5000/api/posts/${postId}/like`, {
-        method: 'POST',
+        method: button.classList.contains('liked') ? 'DELETE' : 'PUT',
         credentials: 'include',
         headers: {
             'Content-Type': 'application/json'
@@ -790,11 +876,11 @@ function showStoryAtIndex(idx) {
     // Resolve image path
     let imagePath = '';
     if (story.image_url) {
-        if (story.image_url.startsWith('posts/') || story.image_url.startsWith('stories/')) {
+        if (story.image_url.startsWith('posts/') || story.image_url.startsWith('stories/') || story.image_url.startsWith('media/')) {
             imagePath = `/assets/images/${story.image_url}`;
         } else {
             const cleanPath = story.image_url.replace(/\\/g, '/');
-            if (cleanPath.startsWith('posts/') || cleanPath.startsWith('stories/')) {
+            if (cleanPath.startsWith('posts/') || cleanPath.startsWith('stories/') || cleanPath.startsWith('media/')) {
                 imagePath = `/assets/images/${cleanPath}`;
             } else {
                 imagePath = `/assets/images/stories/${cleanPath.split('/').pop()}`;
@@ -817,6 +903,8 @@ function showStoryAtIndex(idx) {
         }
     }
 
+    img.srcset = story.image_srcset || '';
+    img.sizes = '100vw';
     img.src = imagePath || '';
     img.alt = story.username || 'Story';
     usernameEl.textContent = story.username || 'unknown';
@@ -11,6 +11,8 @@ let currentMessages = [];
 let currentUserId = null;
 let currentUsername = '';
 let pollHandle = null;
+let messageStream = null;
+let streamConversationId = null;
 const POLL_INTERVAL_MS = 5000;
 
 document.addEventListener('DOMContentLoaded', () => {
@@ -174,6 +176,7 @@ function loadConversations(options = {}) {
             selectConversation(conversations[0].id, { skipListRefresh: true });
         } else {
             showEmptyState();
+            closeMessageStream();
             stopPolling();
         }
     })
@@ -241,8 +244,6 @@ function selectConversation(conversationId, options = {}) {
 }
 
 function fetchMessages(conversationId, options = {}) {
-    const { skipListRefresh = false, fromPoll = false } = options;
-
     fetch(`${API_BASE}/api/messages/conversations/${conversationId}/messages`, {
         method: 'GET',
         credentials: 'include'
@@ -256,23 +257,103 @@ function fetchMessages(conversationId, options = {}) {
         currentMessages = data.messages || [];
         renderMessages(currentMessages);
         showChatArea();
-        if (!fromPoll) {
-            ensurePolling();
-        }
+        openMessageStream(conversationId);
     })
     .catch(err => {
         console.error('Error loading conversation messages:', err);
     });
 }
 
+// Server push: new messages arrive over Server-Sent Events, so an idle chat
+// sends no requests. Polling is only used when EventSource is unavailable.
+function openMessageStream(conversationId) {
+    if (messageStream && String(streamConversationId) === String(conversationId)) return;
+    closeMessageStream();
+
+    if (!window.EventSource) {
+        ensurePolling();
+        return;
+    }
+
+    const lastId = currentMessages.length ? currentMessages[currentMessages.length - 1].id : 0;
+    const url = `${API_BASE}/api/messages/conversations/${conversationId}/stream?after_id=${lastId || 0}`;
+    const stream = new EventSource(url, { withCredentials: true });
+
+    stream.addEventListener('message', event => {
+        if (String(conversationId) !== String(selectedConversationId)) return;
+        try {
+            appendMessage(JSON.parse(event.data));
+        } catch (err) {
+            console.error('Error reading pushed message:', err);
+        }
+    });
+
+    stream.addEventListener('error', () => {
+        // The browser reconnects on its own (resuming from Last-Event-ID);
+        // a closed stream means the server refused it, so fall back to polling.
+        if (stream.readyState === EventSource.CLOSED && messageStream === stream) {
+            messageStream = null;
+            streamConversationId = null;
+            ensurePolling();
+        }
+    });
+
+    messageStream = stream;
+    streamConversationId = conversationId;
+    stopPolling();
+}
+
+function closeMessageStream() {
+    if (messageStream) {
+        messageStream.close();
+        messageStream = null;
+        streamConversationId = null;
+    }
+}
+
+function appendMessage(message) {
+    if (!message || currentMessages.some(m => String(m.id) === String(message.id))) return;
+    currentMessages.push(message);
+    renderMessages(currentMessages);
+    updateConversationPreview(selectedConversationId, message);
+}
+
+function updateConversationPreview(conversationId, message) {
+    const index = conversations.findIndex(c => String(c.id) === String(conversationId));
+    if (index === -1) return;
+    const [conv] = conversations.splice(index, 1);
+    conv.last_message = message;
+    conversations.unshift(conv);
+    renderConversationList(selectedConversationId);
+}
+
 function ensurePolling() {
     if (pollHandle) return;
     pollHandle = setInterval(() => {
         if (!selectedConversationId) return;
-        fetchMessages(selectedConversationId, { skipListRefresh: true, fromPoll: true });
+        pollNewMessages(selectedConversationId);
     }, POLL_INTERVAL_MS);
 }
 
+// Fallback poll: asks only for messages after the last one shown; the
+// response carries an ETag, so an unchanged chat revalidates as a 304.
+function pollNewMessages(conversationId) {
+    const lastId = currentMessages.length ? currentMessages[currentMessages.length - 1].id : 0;
+    fetch(`${API_BASE}/api/messages/conversations/${conversationId}/messages?after_id=${lastId || 0}`, {
+        method: 'GET',
+        credentials: 'include',
+        cache: 'no-cache'
+    })
+    .then(res => res.json())
+    .then(data => {
+        if (String(conversationId) !== String(selectedConversationId)) return;
+        (data.messages || []).forEach(appendMessage);
+    })
+    .catch(err => {
+        console.error('Error polling conversation messages:', err);
+    });
+}
+
 function stopPolling() {
     if (pollHandle) {
         clearInterval(pollHandle);
@@ -354,9 +435,7 @@ function sendMessage(text) {
     .then(res => res.json())
     .then(data => {
         if (!data.message) return;
-        currentMessages.push(data.message);
-        renderMessages(currentMessages);
-        loadConversations({ selectId: selectedConversationId });
+        appendMessage(data.message);
     })
     .catch(err => {
         console.error('Error sending message:', err);
@@ -522,7 +601,6 @@ function startConversation(userId) {
 
         closeStartModal();
         loadConversations({ selectId: convoId });
-        ensurePolling();
     })
     .catch(err => {
         console.error('Error starting conversation:', err);
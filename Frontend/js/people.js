@@ -2,7 +2,8 @@
  * People You May Know page
  */
 
-let peoplePage = 1;
+let peopleCursor = null;
+let peopleExhausted = false;
 const peoplePerPage = 12;
 let peopleLoading = false;
 
@@ -62,11 +63,12 @@ function loadNavProfile() {
 }
 
 function loadPeople() {
-    if (peopleLoading) return;
+    if (peopleLoading || peopleExhausted) return;
     peopleLoading = true;
     setLoadMoreState(true);
 
-    fetch(`http://localhost:5000/api/people-you-may-know?page=${peoplePage}&per_page=${peoplePerPage}`, {
+    const cursorParam = peopleCursor ? `&cursor=${encodeURIComponent(peopleCursor)}` : '';
+    fetch(`http://localhost:5000/api/people-you-may-know?limit=${peoplePerPage}${cursorParam}`, {
         method: 'GET',
         credentials: 'include'
     })
@@ -78,8 +80,9 @@ function loadPeople() {
         const grid = document.getElementById('people-grid');
         if (!grid) return;
         renderPeople(data.users || [], grid);
-        const returned = (data.users || []).length;
-        if (!returned || returned < peoplePerPage) {
+        peopleCursor = data.next_cursor || null;
+        if (!peopleCursor) {
+            peopleExhausted = true;
             hideLoadMore();
         } else {
             setLoadMoreState(false);
@@ -87,7 +90,6 @@ function loadPeople() {
     })
     .catch(err => {
         console.error('Error loading people:', err);
-        if (peoplePage > 1) peoplePage -= 1; // rollback
         setLoadMoreState(false);
     })
     .finally(() => {
@@ -114,6 +116,7 @@ function renderPeople(users, grid) {
         const followers = parseInt(user.followers_count, 10) || 0;
         const following = parseInt(user.following_count, 10) || 0;
         const posts = parseInt(user.posts_count, 10) || 0;
+        const mutual = parseInt(user.mutual_count, 10) || 0;
 
         const gradient = pickGradient(String(user.id || user.username || '0'));
         card.style.background = gradient.bg;
@@ -129,6 +132,7 @@ function renderPeople(users, grid) {
                     <span>${followers} followers</span>
                     <span>${following} following</span>
                     <span>${posts} posts</span>
+                    ${mutual ? `<span>${mutual} mutual</span>` : ''}
                 </div>
                 <div class="people-bio">${user.bio || ''}</div>
                 <div class="people-action-row">
@@ -186,9 +190,18 @@ function setupPeopleInteractions() {
     const loadMoreBtn = document.getElementById('people-load-more');
     if (loadMoreBtn) {
         loadMoreBtn.addEventListener('click', () => {
-            peoplePage += 1;
             loadPeople();
         });
+
+        // Infinite scroll: load the next page as the button approaches the viewport
+        if ('IntersectionObserver' in window) {
+            const observer = new IntersectionObserver(entries => {
+                if (entries.some(entry => entry.isIntersecting)) {
+                    loadPeople();
+                }
+            }, { rootMargin: '400px' });
+            observer.observe(loadMoreBtn);
+        }
     }
 
     // Follow buttons (event delegation)
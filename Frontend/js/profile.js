@@ -106,56 +106,6 @@ function toggleFollow(userId) {
     });
 }
 
-function loadProfilePosts(userId) {
-    fetch(`http://localhost:5000/api/user/${userId}/posts`, {
-        method: 'GET',
-        credentials: 'include'
-    })
-    .then(res => res.json())
-    .then(data => {
-        renderProfilePosts(data.posts || []);
-    })
-    .catch(err => console.error('Error loading profile posts:', err));
-}
-
-function renderProfilePosts(posts) {
-    const gallery = document.getElementById('profile-gallery');
-    if (!gallery) return;
-    gallery.innerHTML = '';
-    if (!posts.length) {
-        const empty = document.createElement('div');
-        empty.className = 'profile-gallery-empty';
-        empty.textContent = 'No posts yet.';
-        gallery.appendChild(empty);
-        return;
-    }
-    posts.forEach(p => {
-        const item = document.createElement('div');
-        item.className = 'profile-gallery-item';
-        const img = document.createElement('img');
-        img.src = resolvePostImage(p.image_url);
-        img.alt = p.caption || 'Post';
-        img.loading = 'lazy';
-        item.appendChild(img);
-
-        const overlay = document.createElement('div');
-        overlay.className = 'profile-gallery-overlay';
-        const likeVal = Number(p.likes_count) || 0;
-        const commentVal = Number(p.comments_count) || 0;
-        const likes = document.createElement('span');
-        likes.className = 'overlay-count';
-        likes.innerHTML = `❤ ${likeVal}`;
-        const comments = document.createElement('span');
-        comments.className = 'overlay-count';
-        comments.innerHTML = `💬 ${commentVal}`;
-        overlay.appendChild(likes);
-        overlay.appendChild(comments);
-        item.appendChild(overlay);
-
-        gallery.appendChild(item);
-    });
-}
-
 function resolvePostImage(path) {
     const base = 'http://localhost:5000';
     if (!path) return '';
@@ -168,6 +118,14 @@ function resolvePostImage(path) {
     return `${base}/assets/images/posts/${clean.split('/').pop()}`;
 }
 
+function resolveSrcset(srcset) {
+    // "url 320w, url 1080w" -> same list with each URL resolved like resolvePostImage
+    return String(srcset).split(',').map(entry => {
+        const [url, descriptor] = entry.trim().split(/\s+/);
+        return `${resolvePostImage(url)} ${descriptor || ''}`.trim();
+    }).join(', ');
+}
+
 function resolveProfilePic(pic) {
     const base = 'http://localhost:5000';
     if (!pic) return `${base}/assets/images/profiles/default.jpg`;
@@ -180,24 +138,59 @@ function resolveProfilePic(pic) {
     return `${base}/assets/images/profiles/${clean.split('/').pop()}`;
 }
 
-function loadProfilePosts(userId) {
-    fetch(`http://localhost:5000/api/user/${userId}/posts`, {
+// Keyset pagination state for the profile gallery
+let galleryCursor = null;
+let galleryLoading = false;
+let galleryObserver = null;
+
+function loadProfilePosts(userId, cursor) {
+    if (galleryLoading) return;
+    galleryLoading = true;
+    const url = cursor
+        ? `http://localhost:5000/api/user/${userId}/posts?cursor=${encodeURIComponent(cursor)}`
+        : `http://localhost:5000/api/user/${userId}/posts`;
+
+    fetch(url, {
         method: 'GET',
         credentials: 'include'
     })
     .then(res => res.json())
     .then(data => {
-        console.log('Profile posts:', data.posts ? data.posts.length : 0);
-        renderProfilePosts(data.posts || []);
+        renderProfilePosts(data.posts || [], Boolean(cursor));
+        galleryCursor = data.next_cursor || null;
+        observeGalleryEnd(userId);
     })
-    .catch(err => console.error('Error loading profile posts:', err));
+    .catch(err => console.error('Error loading profile posts:', err))
+    .finally(() => {
+        galleryLoading = false;
+    });
 }
 
-function renderProfilePosts(posts) {
+// Load the next page of the gallery once its last item scrolls into view
+function observeGalleryEnd(userId) {
+    const gallery = document.getElementById('profile-gallery');
+    if (!gallery || !('IntersectionObserver' in window)) return;
+
+    if (!galleryObserver) {
+        galleryObserver = new IntersectionObserver(entries => {
+            if (galleryCursor && entries.some(entry => entry.isIntersecting)) {
+                loadProfilePosts(userId, galleryCursor);
+            }
+        }, { rootMargin: '400px' });
+    }
+    galleryObserver.disconnect();
+    if (!galleryCursor) return;
+
+    const lastItem = gallery.lastElementChild;
+    if (lastItem) galleryObserver.observe(lastItem);
+}
+
+function renderProfilePosts(posts, append) {
     const gallery = document.getElementById('profile-gallery');
     if (!gallery) return;
-    gallery.innerHTML = '';
+    if (!append) gallery.innerHTML = '';
     if (!posts.length) {
+        if (append) return;
         const empty = document.createElement('div');
         empty.className = 'profile-gallery-empty';
         empty.textContent = 'No posts yet.';
@@ -208,6 +201,10 @@ function renderProfilePosts(posts) {
         const item = document.createElement('div');
         item.className = 'profile-gallery-item';
         const img = document.createElement('img');
+        if (p.image_srcset) {
+            img.srcset = resolveSrcset(p.image_srcset);
+            img.sizes = '(max-width: 640px) 33vw, 300px';
+        }
         img.src = resolvePostImage(p.image_url);
         img.alt = p.caption || 'Post';
         img.loading = 'lazy';
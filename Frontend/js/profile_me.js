@@ -79,16 +79,51 @@ function renderProfile(user) {
     }
 }
 
-function loadProfilePosts(userId) {
-    fetch(`http://localhost:5000/api/user/${userId}/posts`, {
+// Keyset pagination state for the profile gallery
+let galleryCursor = null;
+let galleryLoading = false;
+let galleryObserver = null;
+
+function loadProfilePosts(userId, cursor) {
+    if (galleryLoading) return;
+    galleryLoading = true;
+    const url = cursor
+        ? `http://localhost:5000/api/user/${userId}/posts?cursor=${encodeURIComponent(cursor)}`
+        : `http://localhost:5000/api/user/${userId}/posts`;
+
+    fetch(url, {
         method: 'GET',
         credentials: 'include'
     })
     .then(res => res.json())
     .then(data => {
-        renderProfilePosts(data.posts || []);
+        renderProfilePosts(data.posts || [], Boolean(cursor));
+        galleryCursor = data.next_cursor || null;
+        observeGalleryEnd(userId);
     })
-    .catch(err => console.error('Error loading profile posts:', err));
+    .catch(err => console.error('Error loading profile posts:', err))
+    .finally(() => {
+        galleryLoading = false;
+    });
+}
+
+// Load the next page of the gallery once its last item scrolls into view
+function observeGalleryEnd(userId) {
+    const gallery = document.getElementById('profile-gallery');
+    if (!gallery || !('IntersectionObserver' in window)) return;
+
+    if (!galleryObserver) {
+        galleryObserver = new IntersectionObserver(entries => {
+            if (galleryCursor && entries.some(entry => entry.isIntersecting)) {
+                loadProfilePosts(userId, galleryCursor);
+            }
+        }, { rootMargin: '400px' });
+    }
+    galleryObserver.disconnect();
+    if (!galleryCursor) return;
+
+    const lastItem = gallery.lastElementChild;
+    if (lastItem) galleryObserver.observe(lastItem);
 }
 
 function setupEditModal() {
@@ -181,11 +216,12 @@ function setupEditModal() {
     });
 }
 
-function renderProfilePosts(posts) {
+function renderProfilePosts(posts, append) {
     const gallery = document.getElementById('profile-gallery');
     if (!gallery) return;
-    gallery.innerHTML = '';
+    if (!append) gallery.innerHTML = '';
     if (!posts.length) {
+        if (append) return;
         const empty = document.createElement('div');
         empty.className = 'profile-gallery-empty';
         empty.textContent = 'No posts yet.';
@@ -196,6 +232,10 @@ function renderProfilePosts(posts) {
         const item = document.createElement('div');
         item.className = 'profile-gallery-item';
         const img = document.createElement('img');
+        if (p.image_srcset) {
+            img.srcset = resolveSrcset(p.image_srcset);
+            img.sizes = '(max-width: 640px) 33vw, 300px';
+        }
         img.src = resolvePostImage(p.image_url);
         img.alt = p.caption || 'Post';
         img.loading = 'lazy';
@@ -231,6 +271,14 @@ function resolvePostImage(path) {
     return `${base}/assets/images/posts/${clean.split('/').pop()}`;
 }
 
+function resolveSrcset(srcset) {
+    // "url 320w, url 1080w" -> same list with each URL resolved like resolvePostImage
+    return String(srcset).split(',').map(entry => {
+        const [url, descriptor] = entry.trim().split(/\s+/);
+        return `${resolvePostImage(url)} ${descriptor || ''}`.trim();
+    }).join(', ');
+}
+
 function resolveProfilePic(pic) {
     const base = 'http://localhost:5000';
     if (!pic) return `${base}/assets/images/profiles/default.jpg`;
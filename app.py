@@ -1,34 +1,110 @@
 """
 Flask application for Instagram Clone
 """
-from flask import Flask, request, jsonify, send_from_directory, session
+from flask import Flask, request, jsonify, session, g, Response
 from flask_cors import CORS
-import os
 from functools import wraps
+import atexit
 from config import Config
 from database import db
 from auth import create_user, authenticate_user, AuthError
+from passwords import hasher, HasherBusy
+import timeline
+import counters
+import likes
+import user_stats
+import inbox
+import images
+import media_jobs
+import media_store
+import recommendations
+import stories
+from comment_previews import latest_comments
+from pubsub import broker
+from cache import bus, cache, viewer_scope
+import server_sessions
+from server_sessions import session_store
+import responses
+from static_files import frontend_location, send_page, send_static
+from validation import clean_text, BIO_MAX_LENGTH, CAPTION_MAX_LENGTH, COMMENT_MAX_LENGTH, MESSAGE_MAX_LENGTH
+from pagination import CursorError, decode_cursor, keyset_condition, paginate, parse_limit
 from werkzeug.utils import secure_filename
-import uuid
+
+def start_background_workers():
+    """
+    Start the in-process background threads enabled in Config (each start is a no-op if running)
+
+    create_app() calls this when Config.BACKGROUND_WORKERS is set, so the
+    workers run under any server that builds the app, not only `python app.py`.
+    """
+    if Config.MEDIA_WORKER_IN_APP:
+        media_jobs.worker.start()
+    if Config.MEDIA_GC_IN_APP:
+        media_store.collector.start()
+    if Config.STORY_SWEEPER_IN_APP:
+        stories.sweeper.start()
+    if Config.COUNTER_FOLD_IN_APP:
+        counters.folder.start()
+    if Config.LIKE_WRITE_BEHIND:
+        likes.buffer.start()
+        atexit.register(likes.buffer.stop)  # final flush; stop() is a no-op once stopped
+    if Config.RECOMMENDATION_REFRESH_IN_APP:
+        recommendations.refresher.start()
+
 
 def create_app():
     """Create and configure Flask app"""
-    app = Flask(__name__, static_folder='Frontend', static_url_path='')
+    # Frontend files go through serve_frontend/static_files.py, not Flask's static route
+    app = Flask(__name__, static_folder=None)
     app.config.from_object(Config)
     app.config['SESSION_COOKIE_SECURE'] = False
     app.config['SESSION_COOKIE_HTTPONLY'] = True
     app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
-    app.config['PERMANENT_SESSION_LIFETIME'] = 86400
+    app.config['PERMANENT_SESSION_LIFETIME'] = Config.SESSION_LIFETIME
+    # Session data lives in server_sessions.py's SQLite store; the cookie holds a signed id
+    server_sessions.init_app(app)
+    app.config['USE_X_SENDFILE'] = Config.STATIC_OFFLOAD == 'x-sendfile'
+    # Fast JSON encoding and response compression; registered first so it runs after the other hooks
+    responses.init_app(app)
     
     CORS(app, resources={
         r"/api/*": {
             "origins": ["http://localhost:5500", "http://localhost:5000", "http://127.0.0.1:5500", "http://127.0.0.1:5000"],
-            "methods": ["GET", "POST", "OPTIONS"],
+            "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
             "allow_headers": ["Content-Type", "Authorization"],
             "supports_credentials": True
         }
     }, supports_credentials=True)
     
+    def get_db():
+        """Return the request's database session, pinning a pooled connection on first use."""
+        if 'db_session' not in g:
+            g.db_session = db.session()
+        return g.db_session
+
+    @app.after_request
+    def commit_db_session(response):
+        # Commit before the response is sent so a failed commit surfaces as an error
+        dbs = g.pop('db_session', None)
+        if dbs is not None:
+            try:
+                dbs.close(commit=response.status_code < 500)
+            except Exception as e:
+                print(f"Error committing request transaction: {e}")
+                response = jsonify({'error': 'Internal server error'})
+                response.status_code = 500
+        return response
+
+    @app.teardown_request
+    def release_db_session(exc):
+        # Only reached with a session still bound when after_request did not run
+        dbs = g.pop('db_session', None)
+        if dbs is not None:
+            try:
+                dbs.close(commit=False)
+            except Exception:
+                pass
+
     @app.errorhandler(Exception)
     def handle_error(e):
         import traceback
@@ -41,6 +117,10 @@ def create_app():
         if not path:
             return '/assets/images/profiles/default.jpg'
         clean = str(path).replace('\\', '/')
+        # Avatars never need more than the thumbnail of an ingested picture
+        variants = images.variant_paths(clean)
+        if variants:
+            clean = variants['thumb']
         if clean.startswith('http://') or clean.startswith('https://'):
             return clean
         if clean.startswith('/assets/'):
@@ -49,7 +129,7 @@ def create_app():
             return f"/{clean}"
         if clean.startswith('images/'):
             return f"/assets/{clean}"
-        if clean.startswith('profiles/'):
+        if clean.startswith('profiles/') or clean.startswith('media/'):
             return f"/assets/images/{clean}"
         # filename only
         return f"/assets/images/profiles/{clean.split('/')[-1]}"
@@ -67,10 +147,20 @@ def create_app():
             return f"/{clean}"
         if clean.startswith('images/'):
             return f"/assets/{clean}"
-        if clean.startswith('posts/'):
+        if clean.startswith('posts/') or clean.startswith('stories/') or clean.startswith('media/'):
             return f"/assets/images/{clean}"
         # filename only
         return f"/assets/images/posts/{clean.split('/')[-1]}"
+
+    def post_image_srcset(path):
+        """Return a srcset of an ingested image's variants, or '' for single-file images"""
+        variants = images.variant_paths(str(path).replace('\\', '/')) if path else None
+        if not variants:
+            return ''
+        return ', '.join(
+            f"{normalize_post_image(variants[name])} {width}w"
+            for name, width in images.VARIANTS.items()
+        )
     
     def login_required(f):
         @wraps(f)
@@ -82,66 +172,72 @@ def create_app():
             return f(*args, **kwargs)
         return decorated_function
 
+    def format_inbox_entry(row):
+        """Return a normalized conversation payload from an inbox row."""
+        last_message = None
+        if row.get('last_message_id'):
+            last_message = {
+                'id': row.get('last_message_id'),
+                'sender_id': row.get('last_sender_id'),
+                'sender_username': row.get('last_sender_username'),
+                'message_text': row.get('last_message_text') or '',
+                'image_url': row.get('last_image_url'),
+                'created_at': row.get('last_created_at')
+            }
+        return {
+            'id': row.get('conversation_id'),
+            'other_user': {
+                'id': row.get('other_id'),
+                'username': row.get('other_username'),
+                'full_name': row.get('other_full_name'),
+                'profile_pic': normalize_profile_pic(row.get('other_profile_pic'))
+            },
+            'last_message': last_message
+        }
+
     def build_conversation_payload(conversation_id, current_user_id):
         """Return a normalized conversation payload with other participant and last message."""
         try:
-            members = db.execute_query(
-                """
-                SELECT u.id, u.username, u.full_name, u.profile_pic
-                FROM conversation_members cm
-                INNER JOIN users u ON cm.user_id = u.id
-                WHERE cm.conversation_id = %s
-                """,
-                (conversation_id,)
-            ) or []
-
-            if not members:
-                return None
+            row = inbox.get_inbox_entry(get_db(), conversation_id, current_user_id)
+            return format_inbox_entry(row) if row else None
+        except Exception:
+            return None
 
-            other_user = None
-            for m in members:
-                if m.get('id') != current_user_id:
-                    other_user = m
-                    break
-            if not other_user:
-                other_user = members[0]
+    def format_message(row):
+        """Return a normalized message payload from a messages/users row."""
+        return {
+            'id': row.get('id'),
+            'sender_id': row.get('sender_id'),
+            'sender_username': row.get('username'),
+            'message_text': row.get('message_text') or '',
+            'image_url': row.get('image_url'),
+            'created_at': row.get('created_at'),
+            'profile_pic': normalize_profile_pic(row.get('profile_pic'))
+        }
 
-            last_message_row = db.execute_query(
-                """
-                SELECT m.id, m.sender_id, m.message_text, m.image_url, m.created_at, u.username
-                FROM messages m
-                INNER JOIN users u ON m.sender_id = u.id
-                WHERE m.conversation_id = %s
-                ORDER BY m.created_at DESC, m.id DESC
-                LIMIT 1
-                """,
-                (conversation_id,)
-            )
-            last_message = None
-            if last_message_row:
-                lm = last_message_row[0]
-                last_message = {
-                    'id': lm.get('id'),
-                    'sender_id': lm.get('sender_id'),
-                    'sender_username': lm.get('username'),
-                    'message_text': lm.get('message_text') or '',
-                    'image_url': lm.get('image_url'),
-                    'created_at': str(lm.get('created_at', ''))
-                }
+    def fetch_messages_after(dbs, conversation_id, after_id, limit):
+        """Return up to `limit` messages newer than `after_id`, oldest first."""
+        rows = dbs.execute_query(
+            """
+            SELECT m.id, m.sender_id, m.message_text, m.image_url, m.created_at,
+                   u.username, u.profile_pic
+            FROM messages m
+            INNER JOIN users u ON m.sender_id = u.id
+            WHERE m.conversation_id = %s AND m.id > %s
+            ORDER BY m.id ASC
+            LIMIT %s
+            """,
+            (conversation_id, after_id, limit)
+        ) or []
+        return [format_message(row) for row in rows]
+
+    def server_busy():
+        """503 telling the client to retry once the password hashing pool has capacity."""
+        response = jsonify({'status': 'error', 'message': 'Server busy, please try again'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '1'
+        return response
 
-            return {
-                'id': conversation_id,
-                'other_user': {
-                    'id': other_user.get('id'),
-                    'username': other_user.get('username'),
-                    'full_name': other_user.get('full_name'),
-                    'profile_pic': normalize_profile_pic(other_user.get('profile_pic'))
-                },
-                'last_message': last_message
-            }
-        except Exception:
-            return None
-    
     # Signup
     @app.route('/api/signup', methods=['POST', 'OPTIONS'])
     def signup():
@@ -159,6 +255,8 @@ def create_app():
             return jsonify({'status': 'success', 'user': user}), 201
         except AuthError as e:
             return jsonify({'status': 'error', 'message': str(e)}), 400
+        except HasherBusy:
+            return server_busy()
         except Exception as e:
             return jsonify({'status': 'error', 'message': 'Registration failed'}), 500
     
@@ -171,12 +269,15 @@ def create_app():
             data = request.get_json()
             user = authenticate_user(data.get('username'), data.get('password'))
             if user:
+                session.regenerate()
                 session.permanent = True
                 session['user_id'] = user['id']
                 session['username'] = user['username']
                 session['logged_in'] = True
                 return jsonify({'status': 'success', 'user_id': user['id'], 'username': user['username']}), 200
             return jsonify({'status': 'error', 'message': 'Invalid credentials'}), 401
+        except HasherBusy:
+            return server_busy()
         except Exception as e:
             return jsonify({'status': 'error', 'message': 'Login failed'}), 500
     
@@ -207,26 +308,18 @@ def create_app():
             return jsonify({'posts': []}), 200
         
         try:
-            # Get list of users the current user follows + themselves
-            follows = db.execute_query("SELECT following_id FROM follows WHERE follower_id = %s", (user_id,)) or []
-            follow_ids = [row['following_id'] for row in follows if row.get('following_id') is not None]
-            follow_ids.append(user_id)  # include self
-
-            if not follow_ids:
-                return jsonify({'posts': []}), 200
-
-            placeholders = ','.join(['%s'] * len(follow_ids))
-            query = f"""
-                SELECT p.id, p.user_id, p.image_url, p.caption, p.created_at,
-                       u.username, u.profile_pic, u.full_name,
-                       (SELECT COUNT(*) FROM likes WHERE post_id = p.id) as likes_count,
-                       (SELECT COUNT(*) FROM comments WHERE post_id = p.id) as comments_count
-                FROM posts p
-                INNER JOIN users u ON p.user_id = u.id
-                WHERE p.user_id IN ({placeholders})
-                ORDER BY p.created_at DESC LIMIT 50
-            """
-            posts = db.execute_query(query, tuple(follow_ids)) or []
+            before = decode_cursor(request.args.get('cursor'), 2)
+        except CursorError as e:
+            return jsonify({'error': str(e)}), 400
+        limit = parse_limit(request.args.get('limit'), 20, 50)
+        
+        def load_feed():
+            dbs = get_db()
+            if not before:
+                # Timelines that predate fan-out on write are seeded on first read
+                timeline.seed_timeline(dbs, user_id)
+            posts = timeline.read_timeline(dbs, user_id, limit=limit + 1, before=before)
+            posts, next_cursor = paginate(posts, limit, lambda p: (p['created_at'], p['id']))
             
             # Collect post ids
             post_ids = [p['id'] for p in posts]
@@ -237,7 +330,7 @@ def create_app():
                 try:
                     placeholders = ','.join(['%s'] * len(post_ids))
                     likes_query = f"SELECT post_id FROM likes WHERE user_id = %s AND post_id IN ({placeholders})"
-                    likes_result = db.execute_query(likes_query, (user_id,) + tuple(post_ids)) or []
+                    likes_result = dbs.execute_query(likes_query, (user_id,) + tuple(post_ids)) or []
                     # Normalize to int for safe comparison
                     user_likes = {
                         int(row['post_id'])
@@ -251,26 +344,13 @@ def create_app():
             comments_by_post = {}
             if post_ids:
                 try:
-                    placeholders = ','.join(['%s'] * len(post_ids))
-                    comments_query = f"""
-                        SELECT c.id, c.post_id, c.comment_text, c.created_at, u.username
-                        FROM comments c
-                        INNER JOIN users u ON c.user_id = u.id
-                        WHERE c.post_id IN ({placeholders})
-                        ORDER BY c.post_id, c.created_at DESC
-                    """
-                    comments_result = db.execute_query(comments_query, tuple(post_ids)) or []
-                    for row in comments_result:
-                        pid = row['post_id']
-                        if pid not in comments_by_post:
-                            comments_by_post[pid] = []
-                        if len(comments_by_post[pid]) < 3:  # limit to 3 recent comments
-                            comments_by_post[pid].append({
-                                'id': row['id'],
-                                'username': row['username'],
-                                'comment_text': row['comment_text'],
-                                'created_at': str(row['created_at'])
-                            })
+                    for pid, rows in latest_comments(dbs, post_ids).items():
+                        comments_by_post[pid] = [{
+                            'id': row['id'],
+                            'username': row['username'],
+                            'comment_text': row['comment_text'],
+                            'created_at': row['created_at']
+                        } for row in rows]
                 except:
                     comments_by_post = {}
             
@@ -286,15 +366,30 @@ def create_app():
                     'profile_pic': normalize_profile_pic(p.get('profile_pic')),
                     'full_name': p.get('full_name') or '',
                     'image_url': normalize_post_image(p.get('image_url')),
+                    'image_srcset': post_image_srcset(p.get('image_url')),
+                    'image_status': p.get('image_status') or 'ready',
                     'caption': p.get('caption') or '',
                     'likes_count': int(p.get('likes_count') or 0),
                     'comments_count': int(p.get('comments_count') or 0),
                     'is_liked': pid_int in user_likes if pid_int is not None else False,
-                    'created_at': str(p.get('created_at', '')),
+                    'created_at': p.get('created_at'),
                     'comments': comments_by_post.get(pid, [])
                 })
-            
-            return jsonify({'posts': result}), 200
+            return {'posts': result, 'next_cursor': next_cursor}
+
+        try:
+            # Cached per viewer and page; the viewer's own likes, comments and
+            # follows (and new posts and profile changes from followed accounts)
+            # invalidate it
+            key = cache.key('feed', viewer_scope(user_id), request.args.get('cursor') or '', limit)
+            feed = cache.get(key)
+            if feed is None:
+                feed = load_feed()
+                # Not cached while an image is still being processed, since the
+                # media worker replaces (and deletes) the original it names
+                if not any(p['image_status'] == 'processing' for p in feed['posts']):
+                    cache.set(key, feed, Config.CACHE_FEED_TTL)
+            return jsonify(feed), 200
         except Exception as e:
             import traceback
             print(f"Error in get_feed: {e}")
@@ -309,65 +404,63 @@ def create_app():
             return '', 200
         
         try:
-            # Get list of users the current user follows + themselves
+            dbs = get_db()
             user_id = session.get('user_id')
-            follows = db.execute_query("SELECT following_id FROM follows WHERE follower_id = %s", (user_id,)) or []
-            follow_ids = [row['following_id'] for row in follows if row.get('following_id') is not None]
-            follow_ids.append(user_id)  # include self
-
-            if not follow_ids:
-                return jsonify({'stories': []}), 200
-
-            placeholders = ','.join(['%s'] * len(follow_ids))
-            query = f"""
-                SELECT s.*, u.username, u.profile_pic
-                FROM stories s
-                INNER JOIN users u ON s.user_id = u.id
-                WHERE s.user_id IN ({placeholders}) AND s.expires_at > NOW()
-                ORDER BY s.created_at DESC
-            """
-            stories = db.execute_query(query, tuple(follow_ids)) or []
-            
-            result = []
-            for s in stories:
-                result.append({
-                    'id': s.get('id'),
-                    'user_id': s.get('user_id'),
-                    'username': s.get('username', 'unknown'),
-                    'profile_pic': normalize_profile_pic(s.get('profile_pic')),
-                    'image_url': normalize_post_image(s.get('image_url')),
-                    'created_at': str(s.get('created_at', ''))
+            rings = []
+            for ring in stories.read_rings(dbs, user_id):
+                rings.append({
+                    'user_id': ring['user_id'],
+                    'username': ring['username'] or 'unknown',
+                    'profile_pic': normalize_profile_pic(ring['profile_pic']),
+                    'latest_at': ring['latest_at'],
+                    'stories': [
+                        {
+                            'id': s['id'],
+                            'image_url': normalize_post_image(s['image_url']),
+                            'image_srcset': post_image_srcset(s['image_url']),
+                            'image_status': s['image_status'],
+                            'created_at': s['created_at'],
+                            'expires_at': s['expires_at']
+                        }
+                        for s in ring['stories']
+                    ]
                 })
             
-            return jsonify({'stories': result}), 200
+            return jsonify({'rings': rings}), 200
         except Exception as e:
             import traceback
             print(f"Error in get_stories: {e}")
             traceback.print_exc()
-            return jsonify({'stories': []}), 200
+            return jsonify({'rings': []}), 200
     
-    # Like/Unlike post
-    @app.route('/api/posts/<int:post_id>/like', methods=['POST', 'OPTIONS'])
+    # Like/Unlike post: PUT likes, DELETE unlikes (both idempotent), POST toggles
+    @app.route('/api/posts/<int:post_id>/like', methods=['PUT', 'DELETE', 'POST', 'OPTIONS'])
     @login_required
     def toggle_like(post_id):
         if request.method == 'OPTIONS':
             return '', 200
         try:
+            dbs = get_db()
             user_id = session.get('user_id')
-            existing = db.execute_query("SELECT * FROM likes WHERE user_id = %s AND post_id = %s", (user_id, post_id))
-            
-            if existing:
-                db.execute_query("DELETE FROM likes WHERE user_id = %s AND post_id = %s", (user_id, post_id))
+            if request.method == 'PUT':
+                is_liked = True
+                delta = int(likes.like_post(dbs, user_id, post_id))
+            elif request.method == 'DELETE':
                 is_liked = False
+                delta = -int(likes.unlike_post(dbs, user_id, post_id))
+            elif likes.unlike_post(dbs, user_id, post_id):
+                is_liked, delta = False, -1
             else:
-                db.execute_query("INSERT INTO likes (user_id, post_id) VALUES (%s, %s)", (user_id, post_id))
                 is_liked = True
+                delta = int(likes.like_post(dbs, user_id, post_id))
+            if delta:
+                bus.publish_on_commit(dbs, 'post_liked', user_id=user_id, post_id=post_id)
             
-            # Get updated count
-            count_result = db.execute_query("SELECT COUNT(*) as count FROM likes WHERE post_id = %s", (post_id,))
-            likes_count = count_result[0]['count'] if count_result else 0
+            likes_count = likes.likes_count(dbs, post_id, uncommitted=delta)
             
             return jsonify({'success': True, 'is_liked': is_liked, 'likes_count': likes_count}), 200
+        except likes.PostNotFound:
+            return jsonify({'error': 'Post not found'}), 404
         except Exception as e:
             return jsonify({'error': 'Failed to update like'}), 500
     
@@ -378,29 +471,33 @@ def create_app():
         if request.method == 'OPTIONS':
             return '', 200
         try:
+            dbs = get_db()
             user_id = session.get('user_id')
             data = request.get_json()
-            comment_text = data.get('comment_text', '').strip()
-            
+            comment_text, error = clean_text(data.get('comment_text'), COMMENT_MAX_LENGTH, 'Comment')
+            if error:
+                return jsonify({'error': error}), 400
             if not comment_text:
                 return jsonify({'error': 'Comment text required'}), 400
             
-            db.execute_query("INSERT INTO comments (post_id, user_id, comment_text) VALUES (%s, %s, %s)", 
-                          (post_id, user_id, comment_text))
-            
+            with dbs.transaction():
+                dbs.execute_query("INSERT INTO comments (post_id, user_id, comment_text) VALUES (%s, %s, %s)", 
+                              (post_id, user_id, comment_text))
+                comment_id = dbs.lastrowid
+                counters.adjust_post_counters(dbs, post_id, comments=1)
+            bus.publish_on_commit(dbs, 'comment_added', user_id=user_id, post_id=post_id)
+
             # Get comment with user info
-            comment_result = db.execute_query("""
+            comment_result = dbs.execute_query("""
                 SELECT c.*, u.username, u.profile_pic
                 FROM comments c
                 INNER JOIN users u ON c.user_id = u.id
-                WHERE c.post_id = %s AND c.user_id = %s
-                ORDER BY c.created_at DESC LIMIT 1
-            """, (post_id, user_id))
+                WHERE c.id = %s
+            """, (comment_id,))
             
             if comment_result:
                 comment = comment_result[0]
-                count_result = db.execute_query("SELECT COUNT(*) as count FROM comments WHERE post_id = %s", (post_id,))
-                comments_count = count_result[0]['count'] if count_result else 0
+                comments_count = counters.get_post_counters(dbs, post_id)['comments_count']
                 
                 return jsonify({
                     'success': True,
@@ -408,7 +505,7 @@ def create_app():
                         'id': comment['id'],
                         'username': comment['username'],
                         'comment_text': comment['comment_text'],
-                        'created_at': str(comment['created_at']),
+                        'created_at': comment['created_at'],
                         'profile_pic': (comment['profile_pic'] or 'default.jpg').replace('\\', '/')
                     },
                     'comments_count': comments_count
@@ -429,7 +526,15 @@ def create_app():
             return jsonify({'user': None}), 200
         
         try:
-            result = db.execute_query("""
+            # Served from the session store until a profile change invalidates it
+            cached = session_store.get_user_snapshot(user_id)
+            if cached is not None:
+                return jsonify({'user': cached}), 200
+            # Read before the query: an invalidation after this makes the snapshot write a no-op
+            generation = session_store.user_generation(user_id)
+
+            dbs = get_db()
+            result = dbs.execute_query(f"""
                 SELECT 
                     u.id,
                     u.username,
@@ -437,28 +542,27 @@ def create_app():
                     u.full_name,
                     u.bio,
                     u.profile_pic,
-                    COALESCE((SELECT COUNT(*) FROM follows f1 WHERE f1.following_id = u.id), 0) AS followers_count,
-                    COALESCE((SELECT COUNT(*) FROM follows f2 WHERE f2.follower_id = u.id), 0) AS following_count,
-                    COALESCE((SELECT COUNT(*) FROM posts p WHERE p.user_id = u.id), 0) AS posts_count
+                    {user_stats.STATS_COLUMNS}
                 FROM users u
+                LEFT JOIN user_stats us ON us.user_id = u.id
                 WHERE u.id = %s
             """, (user_id,))
             
             if result and len(result) > 0:
                 user = result[0]
-                return jsonify({
-                    'user': {
-                        'id': user.get('id'),
-                        'username': user.get('username'),
-                        'email': user.get('email'),
-                        'full_name': user.get('full_name'),
-                        'bio': user.get('bio'),
-                        'profile_pic': (user.get('profile_pic') or 'default.jpg').replace('\\', '/'),
-                        'followers_count': int(user.get('followers_count') or 0),
-                        'following_count': int(user.get('following_count') or 0),
-                        'posts_count': int(user.get('posts_count') or 0)
-                    }
-                }), 200
+                profile = {
+                    'id': user.get('id'),
+                    'username': user.get('username'),
+                    'email': user.get('email'),
+                    'full_name': user.get('full_name'),
+                    'bio': user.get('bio'),
+                    'profile_pic': (user.get('profile_pic') or 'default.jpg').replace('\\', '/'),
+                    'followers_count': int(user.get('followers_count') or 0),
+                    'following_count': int(user.get('following_count') or 0),
+                    'posts_count': int(user.get('posts_count') or 0)
+                }
+                session_store.put_user_snapshot(user_id, profile, generation)
+                return jsonify({'user': profile}), 200
             return jsonify({'user': None}), 200
         except Exception as e:
             import traceback
@@ -466,7 +570,8 @@ def create_app():
             traceback.print_exc()
             return jsonify({'user': None}), 200
 
-    # People you may know (users not yet followed)
+    # People you may know: friend-of-friend candidates precomputed by
+    # recommendations.py, or the most-followed accounts for users without any
     @app.route('/api/people-you-may-know', methods=['GET', 'OPTIONS'])
     @login_required
     def people_you_may_know():
@@ -474,41 +579,64 @@ def create_app():
             return '', 200
 
         try:
+            dbs = get_db()
             user_id = session.get('user_id')
             if not user_id:
                 return jsonify({'users': []}), 200
 
-            # Pagination
+            # Stored candidates page by position (one value); the popularity
+            # fallback pages by (followers_count DESC, user_id ASC) (two values)
+            cursor = request.args.get('cursor')
             try:
-                page = int(request.args.get('page', 1))
-                per_page = int(request.args.get('per_page', 12))
-            except:
-                page = 1
-                per_page = 12
-
-            page = max(1, page)
-            per_page = max(1, min(per_page, 50))  # cap per_page
-            offset = (page - 1) * per_page
-
-            query = """
-                SELECT 
-                    u.id, 
-                    u.username, 
-                    u.full_name, 
-                    u.profile_pic, 
-                    u.bio,
-                    COALESCE((SELECT COUNT(*) FROM follows f1 WHERE f1.following_id = u.id), 0) AS followers_count,
-                    COALESCE((SELECT COUNT(*) FROM follows f2 WHERE f2.follower_id = u.id), 0) AS following_count,
-                    COALESCE((SELECT COUNT(*) FROM posts p WHERE p.user_id = u.id), 0) AS posts_count
-                FROM users u
-                WHERE u.id != %s
-                  AND u.id NOT IN (
-                      SELECT following_id FROM follows WHERE follower_id = %s
-                  )
-                ORDER BY followers_count DESC, u.username ASC
-                LIMIT %s OFFSET %s
-            """
-            users = db.execute_query(query, (user_id, user_id, per_page, offset)) or []
+                after_position = decode_cursor(cursor, 1)
+                after = None
+            except CursorError:
+                try:
+                    after = decode_cursor(cursor, 2)
+                except CursorError as e:
+                    return jsonify({'error': str(e)}), 400
+                after_position = None
+            limit = parse_limit(request.args.get('limit', request.args.get('per_page')), 12, 50)
+
+            if after_position or (after is None and recommendations.has_recommendations(dbs, user_id)):
+                start = after_position[0] if after_position else -1
+                users = recommendations.read_recommendations(dbs, user_id, start, limit + 1)
+                users, next_cursor = paginate(users, limit, lambda u: (u['position'],))
+            else:
+                where = ""
+                params = [user_id, user_id]
+                if after:
+                    condition, condition_params = keyset_condition(
+                        [('COALESCE(us.followers_count, 0)', 'desc'), ('u.id', 'asc')], after
+                    )
+                    where = f"AND {condition}"
+                    params.extend(condition_params)
+                params.append(limit + 1)
+
+                query = f"""
+                    SELECT 
+                        u.id, 
+                        u.username, 
+                        u.full_name, 
+                        u.profile_pic, 
+                        u.bio,
+                        COALESCE(us.followers_count, 0) AS followers_count,
+                        COALESCE(us.following_count, 0) AS following_count,
+                        COALESCE(us.posts_count, 0) AS posts_count
+                    FROM users u
+                    LEFT JOIN user_stats us ON us.user_id = u.id
+                    WHERE u.id != %s
+                      AND NOT EXISTS (
+                          SELECT 1 FROM follows f
+                          WHERE f.follower_id = %s AND f.following_id = u.id
+                      )
+                      {where}
+                    ORDER BY COALESCE(us.followers_count, 0) DESC, u.id ASC
+                    LIMIT %s
+                """
+                # Users without a user_stats row yet still appear, with zero counts
+                users = dbs.execute_query(query, tuple(params)) or []
+                users, next_cursor = paginate(users, limit, lambda u: (int(u['followers_count'] or 0), u['id']))
 
             # Normalize paths
             normalized = []
@@ -523,10 +651,11 @@ def create_app():
                     'followers_count': int(u.get('followers_count') or 0),
                     'following_count': int(u.get('following_count') or 0),
                     'posts_count': int(u.get('posts_count') or 0),
+                    'mutual_count': int(u.get('mutual_count') or 0),
                     'is_following': False  # by definition, not followed yet
                 })
 
-            return jsonify({'users': normalized, 'page': page, 'per_page': per_page}), 200
+            return jsonify({'users': normalized, 'next_cursor': next_cursor}), 200
         except Exception as e:
             import traceback
             print(f"Error in people_you_may_know: {e}")
@@ -540,20 +669,20 @@ def create_app():
         if request.method == 'OPTIONS':
             return '', 200
         try:
+            dbs = get_db()
             current_user_id = session.get('user_id')
             if not current_user_id:
                 return jsonify({'user': None}), 200
 
-            query = """
+            query = f"""
                 SELECT 
                     u.id, u.username, u.full_name, u.bio, u.profile_pic,
-                    COALESCE((SELECT COUNT(*) FROM follows f1 WHERE f1.following_id = u.id), 0) AS followers_count,
-                    COALESCE((SELECT COUNT(*) FROM follows f2 WHERE f2.follower_id = u.id), 0) AS following_count,
-                    COALESCE((SELECT COUNT(*) FROM posts p WHERE p.user_id = u.id), 0) AS posts_count
+                    {user_stats.STATS_COLUMNS}
                 FROM users u
+                LEFT JOIN user_stats us ON us.user_id = u.id
                 WHERE u.id = %s
             """
-            result = db.execute_query(query, (target_user_id,))
+            result = dbs.execute_query(query, (target_user_id,))
             if not result:
                 return jsonify({'user': None}), 404
 
@@ -563,7 +692,7 @@ def create_app():
             # determine follow state if viewing someone else
             is_following = False
             if target_user_id != current_user_id:
-                follow_check = db.execute_query(
+                follow_check = dbs.execute_query(
                     "SELECT 1 FROM follows WHERE follower_id = %s AND following_id = %s",
                     (current_user_id, target_user_id)
                 )
@@ -596,40 +725,49 @@ def create_app():
         if request.method == 'OPTIONS':
             return '', 200
         try:
+            dbs = get_db()
             user_id = session.get('user_id')
             if not user_id:
                 return jsonify({'error': 'Not authenticated'}), 401
 
-            bio = request.form.get('bio', '')
+            bio, error = clean_text(request.form.get('bio'), BIO_MAX_LENGTH, 'Bio')
+            if error:
+                return jsonify({'error': error}), 400
             is_private = request.form.get('is_private', '0')
             is_private = 1 if str(is_private) in ['1', 'true', 'True', 'on'] else 0
+            bus.publish_on_commit(
+                dbs, 'profile_updated',
+                user_id=user_id, viewer_ids=user_stats.follower_ids(dbs, user_id)
+            )
 
             profile_pic_path = None
             file = request.files.get('profile_pic')
             if file and file.filename:
-                filename = secure_filename(file.filename)
-                # ensure directory
-                profiles_dir = os.path.join(app.root_path, 'assets', 'images', 'profiles')
-                os.makedirs(profiles_dir, exist_ok=True)
-                unique_name = f"{uuid.uuid4().hex}_{filename}"
-                save_path = os.path.join(profiles_dir, unique_name)
-                file.save(save_path)
-                profile_pic_path = f"profiles/{unique_name}"
+                try:
+                    images.check_image(file.stream)
+                except images.ImageError as e:
+                    return jsonify({'error': str(e)}), 400
+                profile_pic_path = media_store.store_file(dbs, file.stream, secure_filename(file.filename))
 
             # update DB
             if profile_pic_path:
-                db.execute_query(
+                previous = dbs.execute_query("SELECT profile_pic FROM users WHERE id = %s", (user_id,)) or [{}]
+                dbs.execute_query(
                     "UPDATE users SET bio = %s, is_private = %s, profile_pic = %s WHERE id = %s",
                     (bio, is_private, profile_pic_path, user_id)
                 )
+                media_store.release(dbs, previous[0].get('profile_pic'))
+                if not images.variant_paths(profile_pic_path):
+                    media_jobs.enqueue_image(dbs, 'profile', user_id, profile_pic_path)
+                    dbs.on_commit(media_jobs.worker.notify)
             else:
-                db.execute_query(
+                dbs.execute_query(
                     "UPDATE users SET bio = %s, is_private = %s WHERE id = %s",
                     (bio, is_private, user_id)
                 )
 
             # return updated user
-            result = db.execute_query(
+            result = dbs.execute_query(
                 "SELECT id, username, full_name, bio, profile_pic, is_private FROM users WHERE id = %s",
                 (user_id,)
             ) or []
@@ -659,12 +797,15 @@ def create_app():
         if request.method == 'OPTIONS':
             return '', 200
         try:
+            dbs = get_db()
             user_id = session.get('user_id')
             if not user_id:
                 return jsonify({'error': 'Not authenticated'}), 401
 
             kind = (request.form.get('kind') or 'post').lower()
-            caption = request.form.get('caption', '')
+            caption, error = clean_text(request.form.get('caption'), CAPTION_MAX_LENGTH, 'Caption')
+            if error:
+                return jsonify({'error': error}), 400
             location = request.form.get('location', '')
             allow_comments = request.form.get('allow_comments', '1')
             allow_comments = 1 if str(allow_comments) in ['1', 'true', 'True', 'on'] else 0
@@ -673,46 +814,49 @@ def create_app():
             if not file or not file.filename:
                 return jsonify({'error': 'Image is required'}), 400
 
-            filename = secure_filename(file.filename)
-            base_dir = os.path.join(app.root_path, 'assets', 'images')
-            folder = 'posts' if kind == 'post' else 'stories'
-            save_dir = os.path.join(base_dir, folder)
-            os.makedirs(save_dir, exist_ok=True)
-            unique_name = f"{uuid.uuid4().hex}_{filename}"
-            save_path = os.path.join(save_dir, unique_name)
-            file.save(save_path)
+            # Only the header is checked here; the variants are written by a media worker
+            try:
+                images.check_image(file.stream)
+            except images.ImageError as e:
+                return jsonify({'error': str(e)}), 400
 
-            rel_path = f"{folder}/{unique_name}"
+            rel_path = media_store.store_file(dbs, file.stream, secure_filename(file.filename))
+            # Content processed for an earlier upload is served from its variants right away
+            image_status = 'ready' if images.variant_paths(rel_path) else 'processing'
+            if image_status == 'processing':
+                dbs.on_commit(media_jobs.worker.notify)
 
             if kind == 'story':
-                db.execute_query(
-                    "INSERT INTO stories (user_id, image_url, expires_at) VALUES (%s, %s, DATE_ADD(NOW(), INTERVAL 24 HOUR))",
-                    (user_id, rel_path)
-                )
-                new_id = db.execute_query("SELECT LAST_INSERT_ID() AS id")
-                story_id = new_id[0].get('id') if new_id else None
-                story_row = db.execute_query(
-                    "SELECT id, image_url, created_at, expires_at FROM stories WHERE id = %s",
-                    (story_id,)
-                ) or [{}]
+                story_row = stories.create_story(dbs, user_id, rel_path, image_status)
+                if image_status == 'processing':
+                    media_jobs.enqueue_image(dbs, 'story', story_row.get('id'), rel_path)
                 return jsonify({
                     'type': 'story',
                     'story': {
-                        'id': story_row[0].get('id'),
+                        'id': story_row.get('id'),
                         'image_url': normalize_post_image(rel_path),
-                        'created_at': str(story_row[0].get('created_at', '')),
-                        'expires_at': str(story_row[0].get('expires_at', ''))
+                        'image_srcset': post_image_srcset(rel_path),
+                        'image_status': story_row.get('image_status'),
+                        'created_at': story_row.get('created_at'),
+                        'expires_at': story_row.get('expires_at')
                     }
                 }), 201
             else:
-                db.execute_query(
-                    "INSERT INTO posts (user_id, image_url, caption, location, allow_comments) VALUES (%s, %s, %s, %s, %s)",
-                    (user_id, rel_path, caption, location, allow_comments)
+                dbs.execute_query(
+                    "INSERT INTO posts (user_id, image_url, caption, location, allow_comments, image_status) VALUES (%s, %s, %s, %s, %s, %s)",
+                    (user_id, rel_path, caption, location, allow_comments, image_status)
+                )
+                post_id = dbs.lastrowid
+                if image_status == 'processing':
+                    media_jobs.enqueue_image(dbs, 'post', post_id, rel_path)
+                user_stats.adjust_user_stats(dbs, user_id, posts=1)
+                timeline.fan_out_post(dbs, post_id)
+                bus.publish_on_commit(
+                    dbs, 'post_created',
+                    user_id=user_id, viewer_ids=user_stats.follower_ids(dbs, user_id) + [user_id]
                 )
-                new_id = db.execute_query("SELECT LAST_INSERT_ID() AS id")
-                post_id = new_id[0].get('id') if new_id else None
-                post_row = db.execute_query(
-                    "SELECT id, image_url, caption, created_at FROM posts WHERE id = %s",
+                post_row = dbs.execute_query(
+                    "SELECT id, image_url, image_status, caption, created_at FROM posts WHERE id = %s",
                     (post_id,)
                 ) or [{}]
                 return jsonify({
@@ -720,8 +864,10 @@ def create_app():
                     'post': {
                         'id': post_row[0].get('id'),
                         'image_url': normalize_post_image(rel_path),
+                        'image_srcset': post_image_srcset(rel_path),
+                        'image_status': post_row[0].get('image_status'),
                         'caption': post_row[0].get('caption'),
-                        'created_at': str(post_row[0].get('created_at', ''))
+                        'created_at': post_row[0].get('created_at')
                     }
                 }), 201
         except Exception as e:
@@ -737,33 +883,51 @@ def create_app():
         if request.method == 'OPTIONS':
             return '', 200
         try:
+            dbs = get_db()
+            try:
+                before = decode_cursor(request.args.get('cursor'), 2)
+            except CursorError as e:
+                return jsonify({'error': str(e)}), 400
+            limit = parse_limit(request.args.get('limit'), 24, 60)
+
+            where = "p.user_id = %s"
+            params = [target_user_id]
+            if before:
+                condition, condition_params = keyset_condition(
+                    [('p.created_at', 'desc'), ('p.id', 'desc')], before
+                )
+                where += f" AND {condition}"
+                params.extend(condition_params)
+            params.append(limit + 1)
+
             # For now, no privacy enforcement beyond login
-            query = """
+            query = f"""
                 SELECT
                     p.id,
                     p.image_url,
                     p.caption,
                     p.created_at,
-                    (SELECT COUNT(*) FROM likes l WHERE l.post_id = p.id) AS likes_count,
-                    (SELECT COUNT(*) FROM comments c WHERE c.post_id = p.id) AS comments_count
+                    {counters.post_counter_columns('p')}
                 FROM posts p
-                WHERE p.user_id = %s
-                ORDER BY p.created_at DESC
-                LIMIT 60
+                WHERE {where}
+                ORDER BY p.created_at DESC, p.id DESC
+                LIMIT %s
             """
-            posts = db.execute_query(query, (target_user_id,)) or []
+            posts = dbs.execute_query(query, tuple(params)) or []
+            posts, next_cursor = paginate(posts, limit, lambda p: (p['created_at'], p['id']))
             normalized = []
             for p in posts:
                 img = normalize_post_image(p.get('image_url'))
                 normalized.append({
                     'id': p.get('id'),
                     'image_url': img,
+                    'image_srcset': post_image_srcset(p.get('image_url')),
                     'caption': p.get('caption'),
-                    'created_at': str(p.get('created_at', '')),
+                    'created_at': p.get('created_at'),
                     'likes_count': int(p.get('likes_count') or 0),
                     'comments_count': int(p.get('comments_count') or 0)
                 })
-            return jsonify({'posts': normalized}), 200
+            return jsonify({'posts': normalized, 'next_cursor': next_cursor}), 200
         except Exception as e:
             import traceback
             print(f"Error in get_user_posts: {e}")
@@ -776,45 +940,44 @@ def create_app():
         if request.method == 'OPTIONS':
             return '', 200
         try:
+            dbs = get_db()
             user_id = session.get('user_id')
             if not user_id or user_id == target_user_id:
                 return jsonify({'error': 'Invalid operation'}), 400
 
-            # Check if already following
-            existing = db.execute_query(
-                "SELECT 1 FROM follows WHERE follower_id = %s AND following_id = %s",
-                (user_id, target_user_id)
-            )
-            if existing:
-                # Unfollow
-                db.execute_query(
+            with dbs.transaction():
+                # Toggle by affected rows so counters move only when the follow state really changed
+                removed = dbs.execute_query(
                     "DELETE FROM follows WHERE follower_id = %s AND following_id = %s",
                     (user_id, target_user_id)
                 )
-                is_following = False
-            else:
-                # Follow
-                db.execute_query(
-                    "INSERT INTO follows (follower_id, following_id) VALUES (%s, %s)",
-                    (user_id, target_user_id)
-                )
-                is_following = True
+                if removed:
+                    # Unfollow
+                    user_stats.record_follow(dbs, user_id, target_user_id, -removed)
+                    timeline.on_unfollow(dbs, user_id, target_user_id)
+                    is_following = False
+                else:
+                    # Follow
+                    added = dbs.execute_query(
+                        "INSERT IGNORE INTO follows (follower_id, following_id) VALUES (%s, %s)",
+                        (user_id, target_user_id)
+                    )
+                    # INSERT IGNORE also swallows the foreign key error for a missing user
+                    if not added and not dbs.execute_query("SELECT 1 FROM users WHERE id = %s", (target_user_id,)):
+                        return jsonify({'error': 'User not found'}), 404
+                    user_stats.record_follow(dbs, user_id, target_user_id, added)
+                    timeline.on_follow(dbs, user_id, target_user_id)
+                    is_following = True
+            bus.publish_on_commit(dbs, 'followed', follower_id=user_id, following_id=target_user_id)
 
             # Return updated counts
-            counts = db.execute_query(
-                """
-                SELECT 
-                    (SELECT COUNT(*) FROM follows WHERE following_id = %s) AS followers_count,
-                    (SELECT COUNT(*) FROM follows WHERE follower_id = %s) AS following_count
-                """,
-                (target_user_id, target_user_id)
-            ) or [{}]
+            stats = user_stats.get_user_stats(dbs, target_user_id)
 
             return jsonify({
                 'success': True,
                 'is_following': is_following,
-                'followers_count': int(counts[0].get('followers_count') or 0),
-                'following_count': int(counts[0].get('following_count') or 0)
+                'followers_count': stats['followers_count'],
+                'following_count': stats['following_count']
             }), 200
         except Exception as e:
             import traceback
@@ -829,8 +992,9 @@ def create_app():
         if request.method == 'OPTIONS':
             return '', 200
         try:
+            dbs = get_db()
             user_id = session.get('user_id')
-            rows = db.execute_query(
+            rows = dbs.execute_query(
                 """
                 SELECT 
                     u.id,
@@ -858,16 +1022,16 @@ def create_app():
                 (user_id, user_id, user_id)
             ) or []
 
-            followings = []
-            for row in rows:
-                followings.append({
+            followings = [
+                {
                     'id': row.get('id'),
                     'username': row.get('username'),
                     'full_name': row.get('full_name'),
                     'profile_pic': normalize_profile_pic(row.get('profile_pic')),
                     'conversation_id': row.get('conversation_id')
-                })
-
+                }
+                for row in rows
+            ]
             return jsonify({'users': followings}), 200
         except Exception as e:
             import traceback
@@ -882,6 +1046,7 @@ def create_app():
         if request.method == 'OPTIONS':
             return '', 200
         try:
+            dbs = get_db()
             user_id = session.get('user_id')
             data = request.get_json() or {}
             target_user_id = data.get('user_id')
@@ -894,7 +1059,7 @@ def create_app():
                 return jsonify({'error': 'Invalid user'}), 400
 
             # Ensure the target exists
-            target_exists = db.execute_query(
+            target_exists = dbs.execute_query(
                 "SELECT id, username, full_name, profile_pic FROM users WHERE id = %s",
                 (target_user_id,)
             )
@@ -902,7 +1067,7 @@ def create_app():
                 return jsonify({'error': 'User not found'}), 404
 
             # Reuse existing conversation if any
-            existing = db.execute_query(
+            existing = dbs.execute_query(
                 """
                 SELECT cm1.conversation_id
                 FROM conversation_members cm1
@@ -918,39 +1083,13 @@ def create_app():
             if existing:
                 conversation_id = existing[0].get('conversation_id')
             else:
-                # Insert and get id in same connection
-                conn = db.get_connection()
-                cur = conn.cursor(dictionary=True)
-                cur.execute("INSERT INTO conversations () VALUES ()")
-                conversation_id = cur.lastrowid
-                if not conversation_id:
-                    cur.execute("SELECT LAST_INSERT_ID() AS id")
-                    row = cur.fetchone()
-                    conversation_id = row.get('id') if row else None
-                if not conversation_id:
-                    cur.execute("SELECT MAX(id) AS id FROM conversations")
-                    row = cur.fetchone()
-                    conversation_id = row.get('id') if row else None
-                try:
-                    conn.commit()
-                except Exception:
-                    pass
-                try:
-                    cur.close()
-                    conn.close()
-                except Exception:
-                    pass
-                if not conversation_id:
-                    return jsonify({'error': 'Failed to create conversation'}), 500
-
-                db.execute_query(
-                    "INSERT INTO conversation_members (conversation_id, user_id) VALUES (%s, %s)",
-                    (conversation_id, user_id)
-                )
-                db.execute_query(
-                    "INSERT INTO conversation_members (conversation_id, user_id) VALUES (%s, %s)",
-                    (conversation_id, target_user_id)
-                )
+                with dbs.transaction():
+                    dbs.execute_query("INSERT INTO conversations () VALUES ()")
+                    conversation_id = dbs.lastrowid
+                    dbs.execute_many(
+                        "INSERT INTO conversation_members (conversation_id, user_id) VALUES (%s, %s)",
+                        [(conversation_id, user_id), (conversation_id, target_user_id)]
+                    )
 
             payload = build_conversation_payload(conversation_id, user_id)
             if not payload:
@@ -980,25 +1119,19 @@ def create_app():
         if request.method == 'OPTIONS':
             return '', 200
         try:
+            dbs = get_db()
             user_id = session.get('user_id')
-            rows = db.execute_query(
-                "SELECT conversation_id FROM conversation_members WHERE user_id = %s",
-                (user_id,)
-            ) or []
+            try:
+                after = decode_cursor(request.args.get('cursor'), 2)
+            except CursorError as e:
+                return jsonify({'error': str(e)}), 400
+            limit = parse_limit(request.args.get('limit'), 50, 100)
 
-            conversations = []
-            for row in rows:
-                cid = row.get('conversation_id')
-                payload = build_conversation_payload(cid, user_id)
-                if payload:
-                    conversations.append(payload)
-
-            # Sort by last message desc
-            conversations.sort(
-                key=lambda c: c.get('last_message', {}).get('created_at', '') if c.get('last_message') else '',
-                reverse=True
-            )
-            return jsonify({'conversations': conversations}), 200
+            rows = inbox.list_inbox(dbs, user_id, limit=limit + 1, after=after)
+            rows, next_cursor = paginate(rows, limit, lambda r: (r['last_activity_at'], r['conversation_id']))
+            conversations = [format_inbox_entry(row) for row in rows]
+
+            return jsonify({'conversations': conversations, 'next_cursor': next_cursor}), 200
         except Exception as e:
             import traceback
             print(f"Error in list_conversations: {e}")
@@ -1012,76 +1145,112 @@ def create_app():
         if request.method == 'OPTIONS':
             return '', 200
         try:
+            dbs = get_db()
             user_id = session.get('user_id')
-            membership = db.execute_query(
-                "SELECT 1 FROM conversation_members WHERE conversation_id = %s AND user_id = %s",
+            membership = dbs.execute_query(
+                """
+                SELECT COALESCE(
+                    c.last_message_id,
+                    (SELECT MAX(m.id) FROM messages m WHERE m.conversation_id = c.id)
+                ) AS last_message_id
+                FROM conversation_members cm
+                INNER JOIN conversations c ON c.id = cm.conversation_id
+                WHERE cm.conversation_id = %s AND cm.user_id = %s
+                """,
                 (conversation_id, user_id)
             )
             if not membership:
                 return jsonify({'error': 'Conversation not found'}), 404
 
             if request.method == 'GET':
-                messages_rows = db.execute_query(
-                    """
+                try:
+                    after_id = int(request.args['after_id']) if request.args.get('after_id') else None
+                    before_id = int(request.args['before_id']) if request.args.get('before_id') else None
+                    before = decode_cursor(request.args.get('cursor'), 2)
+                except CursorError as e:
+                    return jsonify({'error': str(e)}), 400
+                except ValueError:
+                    return jsonify({'error': 'Invalid message id'}), 400
+                limit = parse_limit(request.args.get('limit'), 100, 100)
+
+                # The newest message id identifies the conversation's state, so a
+                # repeat request with nothing new is answered without reading messages
+                # (MAX(messages.id) stands in until inbox.py has backfilled the pointer)
+                etag = f"m{conversation_id}-{membership[0].get('last_message_id') or 0}-{request.query_string.decode()}"
+                if request.if_none_match.contains_weak(etag):
+                    response = app.response_class(status=304)
+                    response.set_etag(etag, weak=True)
+                    response.headers['Cache-Control'] = 'private, no-cache'
+                    return response
+
+                if after_id is not None:
+                    # Delta for an open chat: only messages newer than the last one shown
+                    messages = fetch_messages_after(dbs, conversation_id, after_id, limit)
+                    response = jsonify({
+                        'messages': messages,
+                        'next_cursor': None
+                    })
+                    response.set_etag(etag, weak=True)
+                    response.headers['Cache-Control'] = 'private, no-cache'
+                    return response
+
+                where = "m.conversation_id = %s"
+                params = [conversation_id]
+                if before:
+                    condition, condition_params = keyset_condition(
+                        [('m.created_at', 'desc'), ('m.id', 'desc')], before
+                    )
+                    where += f" AND {condition}"
+                    params.extend(condition_params)
+                if before_id is not None:
+                    where += " AND m.id < %s"
+                    params.append(before_id)
+                params.append(limit + 1)
+
+                messages_rows = dbs.execute_query(
+                    f"""
                     SELECT m.id, m.sender_id, m.message_text, m.image_url, m.created_at,
                            u.username, u.profile_pic
                     FROM messages m
                     INNER JOIN users u ON m.sender_id = u.id
-                    WHERE m.conversation_id = %s
+                    WHERE {where}
                     ORDER BY m.created_at DESC, m.id DESC
-                    LIMIT 100
+                    LIMIT %s
                     """,
-                    (conversation_id,)
+                    tuple(params)
                 ) or []
+                # next_cursor pages towards older messages
+                messages_rows, next_cursor = paginate(messages_rows, limit, lambda m: (m['created_at'], m['id']))
                 messages_rows.reverse()  # chronological
 
-                messages = []
-                for row in messages_rows:
-                    messages.append({
-                        'id': row.get('id'),
-                        'sender_id': row.get('sender_id'),
-                        'sender_username': row.get('username'),
-                        'message_text': row.get('message_text') or '',
-                        'image_url': row.get('image_url'),
-                        'created_at': str(row.get('created_at', '')),
-                        'profile_pic': normalize_profile_pic(row.get('profile_pic'))
-                    })
+                messages = [format_message(row) for row in messages_rows]
 
                 conversation_payload = build_conversation_payload(conversation_id, user_id)
-                return jsonify({'messages': messages, 'conversation': conversation_payload}), 200
+                response = jsonify({
+                    'messages': messages,
+                    'conversation': conversation_payload,
+                    'next_cursor': next_cursor
+                })
+                response.set_etag(etag, weak=True)
+                response.headers['Cache-Control'] = 'private, no-cache'
+                return response
 
             # POST - send message
             data = request.get_json() or {}
-            message_text = (data.get('message_text') or '').strip()
+            message_text, error = clean_text(data.get('message_text'), MESSAGE_MAX_LENGTH, 'Message')
+            if error:
+                return jsonify({'error': error}), 400
             if not message_text:
                 return jsonify({'error': 'Message text required'}), 400
 
-            conn = db.get_connection()
-            cur = conn.cursor(dictionary=True)
-            cur.execute(
+            dbs.execute_query(
                 "INSERT INTO messages (conversation_id, sender_id, message_text) VALUES (%s, %s, %s)",
                 (conversation_id, user_id, message_text)
             )
-            message_id = cur.lastrowid
-            if not message_id:
-                cur.execute("SELECT LAST_INSERT_ID() AS id")
-                row = cur.fetchone()
-                message_id = row.get('id') if row else None
-            if not message_id:
-                cur.execute("SELECT MAX(id) AS id FROM messages")
-                row = cur.fetchone()
-                message_id = row.get('id') if row else None
-            try:
-                conn.commit()
-            except Exception:
-                pass
-            try:
-                cur.close()
-                conn.close()
-            except Exception:
-                pass
+            message_id = dbs.lastrowid
+            inbox.record_message(dbs, conversation_id, message_id)
 
-            message_row = db.execute_query(
+            message_row = dbs.execute_query(
                 """
                 SELECT m.id, m.sender_id, m.message_text, m.image_url, m.created_at, u.username, u.profile_pic
                 FROM messages m
@@ -1093,16 +1262,9 @@ def create_app():
             if not message_row:
                 return jsonify({'error': 'Failed to send message'}), 500
 
-            row = message_row[0]
-            message_payload = {
-                'id': row.get('id'),
-                'sender_id': row.get('sender_id'),
-                'sender_username': row.get('username'),
-                'message_text': row.get('message_text') or '',
-                'image_url': row.get('image_url'),
-                'created_at': str(row.get('created_at', '')),
-                'profile_pic': normalize_profile_pic(row.get('profile_pic'))
-            }
+            message_payload = format_message(message_row[0])
+            # Push to open streams only once the message is committed
+            dbs.on_commit(lambda: broker.publish(f"conversation:{conversation_id}", message_payload))
 
             return jsonify({'message': message_payload, 'conversation_id': conversation_id}), 201
         except Exception as e:
@@ -1111,59 +1273,134 @@ def create_app():
             traceback.print_exc()
             return jsonify({'error': 'Failed to process message'}), 500
     
-    # Serve assets
+    # Server-Sent Events stream of new messages in a conversation
+    @app.route('/api/messages/conversations/<int:conversation_id>/stream', methods=['GET'])
+    @login_required
+    def conversation_stream(conversation_id):
+        try:
+            dbs = get_db()
+            user_id = session.get('user_id')
+            membership = dbs.execute_query(
+                "SELECT 1 FROM conversation_members WHERE conversation_id = %s AND user_id = %s",
+                (conversation_id, user_id)
+            )
+            if not membership:
+                return jsonify({'error': 'Conversation not found'}), 404
+
+            # EventSource resends the last id it saw when it reconnects
+            try:
+                after_id = int(request.headers.get('Last-Event-ID') or request.args.get('after_id') or 0)
+            except ValueError:
+                return jsonify({'error': 'Invalid after_id'}), 400
+
+            # Subscribe before reading the backlog so nothing sent in between is missed
+            subscription = broker.subscribe(f"conversation:{conversation_id}")
+            try:
+                backlog = fetch_messages_after(dbs, conversation_id, after_id, Config.SSE_BACKLOG_LIMIT) if after_id else []
+            except Exception:
+                subscription.close()
+                raise
+        except Exception as e:
+            print(f"Error opening conversation stream: {e}")
+            return jsonify({'error': 'Failed to open stream'}), 500
+
+        keepalive = Config.SSE_KEEPALIVE_SECONDS
+
+        def format_event(message):
+            return f"id: {message['id']}\nevent: message\ndata: {responses.dumps(message)}\n\n"
+
+        def generate():
+            last_id = after_id
+            try:
+                yield f"retry: {Config.SSE_RETRY_MS}\n\n"
+                for message in backlog:
+                    last_id = max(last_id, message['id'])
+                    yield format_event(message)
+                if len(backlog) >= Config.SSE_BACKLOG_LIMIT:
+                    return  # more to catch up on; the reconnect resumes from last_id
+                while not subscription.overflowed:
+                    message = subscription.get(timeout=keepalive)
+                    if message is None:
+                        yield ": keep-alive\n\n"
+                    elif message['id'] > last_id:
+                        last_id = message['id']
+                        yield format_event(message)
+                # Fell behind: end the stream; the client reconnects with Last-Event-ID
+            finally:
+                subscription.close()
+
+        return Response(generate(), mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        })
+
+    # Health check with connection pool statistics
+    @app.route('/api/health', methods=['GET'])
+    def health():
+        return jsonify({
+            'status': 'ok',
+            'db_pool': db.pool_stats(),
+            'broker': broker.stats(),
+            'password_hasher': hasher.stats(),
+            'sessions': session_store.stats(),
+            'cache': cache.stats(),
+            'like_buffer': likes.buffer.stats(),
+            'counter_shards': counters.hot_posts.stats(),
+            'encoders': responses.encoders()
+        }), 200
+
+    # Serve assets (content-addressed media is cached as immutable)
     @app.route('/assets/<path:filename>')
     def serve_assets(filename):
-        return send_from_directory('assets', filename)
+        return send_static('assets', filename)
     
     # Serve HTML pages
     @app.route('/')
     def index():
-        return send_from_directory('Frontend/html', 'index.html')
+        return send_page('index.html')
     
     @app.route('/login.html')
     def serve_login():
-        return send_from_directory('Frontend/html', 'login.html')
+        return send_page('login.html')
     
     @app.route('/home.html')
     def serve_home():
-        return send_from_directory('Frontend/html', 'home.html')
+        return send_page('home.html')
     
     @app.route('/signup.html')
     def serve_signup():
-        return send_from_directory('Frontend/html', 'signup.html')
+        return send_page('signup.html')
     
     @app.route('/create.html')
     def serve_create():
-        return send_from_directory('Frontend/html', 'create.html')
+        return send_page('create.html')
     
     @app.route('/messages.html')
     def serve_messages():
-        return send_from_directory('Frontend/html', 'messages.html')
+        return send_page('messages.html')
     
     # Serve frontend files
     @app.route('/<path:filename>')
     def serve_frontend(filename):
         if filename.startswith('api/'):
             return {'error': 'Not found'}, 404
-        
-        base_dir = os.path.dirname(__file__)
-        
-        if filename.endswith('.html'):
-            return send_from_directory('Frontend/html', filename.split('/')[-1])
-        elif filename.endswith('.css'):
-            return send_from_directory('Frontend/css', filename.split('/')[-1])
-        elif filename.endswith('.js'):
-            return send_from_directory('Frontend/js', filename.split('/')[-1])
-        elif filename.startswith('assets/'):
-            return send_from_directory('assets', filename.replace('assets/', ''))
-        
-        return {'error': 'Not found'}, 404
+
+        location = frontend_location(filename)
+        if location is None:
+            return {'error': 'Not found'}, 404
+        directory, name = location
+        if directory == 'Frontend/html':
+            return send_page(name)
+        # Unbundled styles and scripts keep their names across edits, so they always revalidate
+        return send_static(directory, name, max_age=None if directory == 'assets' else 0)
     
+    if Config.BACKGROUND_WORKERS:
+        start_background_workers()
     return app
 
 if __name__ == '__main__':
     app = create_app()
+    db.connect()  # warm up the connection pool before accepting requests
     print("Starting Instagram Clone API...")
     print(f"Database: {Config.DB_NAME}")
     print(f"Server running on http://localhost:5000")
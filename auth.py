@@ -2,9 +2,32 @@
 Authentication module for Instagram Clone
 Handles user registration, login, and password hashing
 """
-import bcrypt
 import re
+from concurrent.futures import ThreadPoolExecutor
+from mysql.connector import Error as MySQLError
 from database import db
+from passwords import hasher, needs_rehash, HasherBusy
+from user_stats import ensure_user_stats
+from validation import (
+    sanitize_input, clean_text, validate_username, validate_email, validate_password,
+    FULL_NAME_MAX_LENGTH, BIO_MAX_LENGTH
+)
+
+ER_DUP_ENTRY = 1062
+
+# UNIQUE key on users (see schema.sql) -> message for a value that is taken
+DUPLICATE_KEY_MESSAGES = {
+    'username': "Username already exists",
+    'email': "Email already exists",
+}
+
+# Column defaults (see schema.sql), returned with a new user instead of re-reading the row
+NEW_USER_DEFAULTS = {
+    'profile_pic': 'default.jpg',
+    'is_private': 0,
+}
+
+_DUPLICATE_KEY = re.compile(r"for key '(?:\w+\.)?(?P<key>\w+)'")
 
 class AuthError(Exception):
     """Custom exception for authentication errors"""
@@ -12,18 +35,18 @@ class AuthError(Exception):
 
 def hash_password(password):
     """
-    Hash a password using bcrypt
+    Hash a password using bcrypt (cost Config.BCRYPT_ROUNDS) in the hashing pool
     
     Args:
         password (str): Plain text password
         
     Returns:
         str: Hashed password
+
+    Raises:
+        HasherBusy: If the hashing pool is saturated
     """
-    # Generate salt and hash password
-    salt = bcrypt.gensalt(rounds=12)
-    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
-    return hashed.decode('utf-8')
+    return hasher.hash(password)
 
 def verify_password(password, password_hash):
     """
@@ -35,158 +58,104 @@ def verify_password(password, password_hash):
         
     Returns:
         bool: True if password matches, False otherwise
+
+    Raises:
+        HasherBusy: If the hashing pool is saturated or unavailable
     """
     try:
-        return bcrypt.checkpw(
-            password.encode('utf-8'),
-            password_hash.encode('utf-8')
-        )
-    except Exception as e:
+        return hasher.verify(password, password_hash)
+    except ValueError as e:
+        # Malformed stored hash: no password can match it
         print(f"Error verifying password: {e}")
         return False
 
-def sanitize_input(value):
+def duplicate_key_name(error):
     """
-    Sanitize input to prevent SQL injection and XSS
-    Note: Using parameterized queries is the primary defense,
-    but this adds an extra layer of validation
-    
+    Name of the UNIQUE key a duplicate-entry error was raised on
+
     Args:
-        value: Input value to sanitize
-        
+        error (Exception): Error raised by the INSERT
+
     Returns:
-        str: Sanitized value
+        str: Key name (e.g. 'username'), or None if `error` is not ER_DUP_ENTRY
     """
-    if value is None:
+    if getattr(error, 'errno', None) != ER_DUP_ENTRY:
         return None
-    
-    if not isinstance(value, str):
-        return value
-    
-    # Remove potentially dangerous characters
-    sanitized = value.strip()
-    
-    # Remove SQL injection patterns
-    dangerous_patterns = [
-        r"(\b(SELECT|INSERT|UPDATE|DELETE|DROP|CREATE|ALTER|EXEC|EXECUTE|UNION|SCRIPT)\b)",
-        r"(--|;|/\*|\*/|xp_|sp_)",
-        r"(\bor\b\s+\d+\s*=\s*\d+)",
-        r"(\band\b\s+\d+\s*=\s*\d+)"
-    ]
-    
-    for pattern in dangerous_patterns:
-        sanitized = re.sub(pattern, '', sanitized, flags=re.IGNORECASE)
-    
-    return sanitized
+    # MySQL 8 qualifies the key with the table ('users.username'), 5.7 does not
+    match = _DUPLICATE_KEY.search(getattr(error, 'msg', None) or str(error))
+    return match.group('key') if match else None
 
-def validate_username(username):
+def prepare_user(username, email, password, full_name=None, bio=None):
     """
-    Validate username format
-    
-    Args:
-        username (str): Username to validate
-        
-    Returns:
-        tuple: (is_valid, error_message)
-    """
-    if not username or len(username.strip()) == 0:
-        return False, "Username is required"
-    
-    username = username.strip()
-    
-    if len(username) < 3:
-        return False, "Username must be at least 3 characters"
-    
-    if len(username) > 30:
-        return False, "Username must be 30 characters or less"
-    
-    # Only allow alphanumeric, dots, and underscores
-    if not re.match(r'^[a-zA-Z0-9._]+$', username):
-        return False, "Username can only contain letters, numbers, dots, and underscores"
-    
-    return True, None
+    Validate and sanitize signup fields
 
-def validate_email(email):
-    """
-    Validate email format
-    
-    Args:
-        email (str): Email to validate
-        
     Returns:
-        tuple: (is_valid, error_message)
-    """
-    if not email or len(email.strip()) == 0:
-        return False, "Email is required"
-    
-    email = email.strip().lower()
-    
-    if len(email) > 100:
-        return False, "Email must be 100 characters or less"
-    
-    # Basic email regex
-    email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    if not re.match(email_pattern, email):
-        return False, "Please enter a valid email address"
-    
-    return True, None
+        tuple: (username, email, full_name, bio) ready to insert
 
-def validate_password(password):
-    """
-    Validate password strength
-    
-    Args:
-        password (str): Password to validate
-        
-    Returns:
-        tuple: (is_valid, error_message)
+    Raises:
+        AuthError: If a field is invalid
     """
-    if not password or len(password) == 0:
-        return False, "Password is required"
+    is_valid, error = validate_username(username)
+    if not is_valid:
+        raise AuthError(error)
     
-    if len(password) < 8:
-        return False, "Password must be at least 8 characters"
+    is_valid, error = validate_email(email)
+    if not is_valid:
+        raise AuthError(error)
     
-    if len(password) > 128:
-        return False, "Password is too long"
+    is_valid, error = validate_password(password)
+    if not is_valid:
+        raise AuthError(error)
     
-    return True, None
+    username = sanitize_input(username)
+    email = sanitize_input(email).lower()
+    full_name, error = clean_text(full_name, FULL_NAME_MAX_LENGTH, 'Full name')
+    if error:
+        raise AuthError(error)
+    bio, error = clean_text(bio, BIO_MAX_LENGTH, 'Bio')
+    if error:
+        raise AuthError(error)
+    return username, email, full_name or None, bio or None
 
-def check_username_exists(username):
-    """
-    Check if username already exists in database
-    
-    Args:
-        username (str): Username to check
-        
-    Returns:
-        bool: True if exists, False otherwise
+def insert_user(dbs, username, email, password_hash, full_name=None, bio=None):
     """
-    try:
-        query = "SELECT id FROM users WHERE username = %s"
-        result = db.execute_query(query, (username,))
-        return len(result) > 0
-    except Exception as e:
-        print(f"Error checking username: {e}")
-        return False
+    Insert one user row and its counters, relying on the UNIQUE keys for duplicates
 
-def check_email_exists(email):
-    """
-    Check if email already exists in database
-    
     Args:
-        email (str): Email to check
-        
+        dbs: DatabaseSession (lastrowid must come from the same connection)
+        username, email, password_hash, full_name, bio: Prepared column values
+
     Returns:
-        bool: True if exists, False otherwise
+        dict: User data including id
+
+    Raises:
+        AuthError: If the username or email is taken or the insert fails
     """
     try:
-        query = "SELECT id FROM users WHERE email = %s"
-        result = db.execute_query(query, (email,))
-        return len(result) > 0
-    except Exception as e:
-        print(f"Error checking email: {e}")
-        return False
+        dbs.execute_query(
+            """
+            INSERT INTO users (username, email, password_hash, full_name, bio)
+            VALUES (%s, %s, %s, %s, %s)
+            """,
+            (username, email, password_hash, full_name, bio)
+        )
+    except MySQLError as e:
+        message = DUPLICATE_KEY_MESSAGES.get(duplicate_key_name(e))
+        if message:
+            raise AuthError(message)
+        raise AuthError(f"Failed to create user: {str(e)}")
+    
+    user_id = dbs.lastrowid
+    ensure_user_stats(dbs, user_id)
+    user = {
+        'id': user_id,
+        'username': username,
+        'email': email,
+        'full_name': full_name,
+        'bio': bio,
+    }
+    user.update(NEW_USER_DEFAULTS)
+    return user
 
 def create_user(username, email, password, full_name=None, bio=None):
     """
@@ -205,60 +174,57 @@ def create_user(username, email, password, full_name=None, bio=None):
     Raises:
         AuthError: If validation fails or user creation fails
     """
-    # Validate inputs
-    is_valid, error = validate_username(username)
-    if not is_valid:
-        raise AuthError(error)
-    
-    is_valid, error = validate_email(email)
-    if not is_valid:
-        raise AuthError(error)
-    
-    is_valid, error = validate_password(password)
-    if not is_valid:
-        raise AuthError(error)
+    username, email, full_name, bio = prepare_user(username, email, password, full_name, bio)
     
-    # Sanitize inputs
-    username = sanitize_input(username)
-    email = sanitize_input(email).lower()
-    full_name = sanitize_input(full_name) if full_name else None
-    bio = sanitize_input(bio) if bio else None
-    
-    # Check if username or email already exists
-    if check_username_exists(username):
-        raise AuthError("Username already exists")
-    
-    if check_email_exists(email):
-        raise AuthError("Email already exists")
-    
-    # Hash password
+    # Hash password (HasherBusy propagates so the caller can answer 503)
     password_hash = hash_password(password)
     
-    # Insert user into database using parameterized query (prevents SQL injection)
-    try:
-        query = """
-            INSERT INTO users (username, email, password_hash, full_name, bio)
-            VALUES (%s, %s, %s, %s, %s)
-        """
-        db.execute_query(query, (username, email, password_hash, full_name, bio))
-        
-        # Get the created user
-        query = "SELECT id, username, email, full_name, bio, profile_pic, is_private, created_at FROM users WHERE username = %s"
-        result = db.execute_query(query, (username,))
-        
-        if result:
-            return result[0]
-        else:
-            raise AuthError("Failed to retrieve created user")
-            
-    except Exception as e:
-        error_msg = str(e).lower()
-        if 'duplicate' in error_msg or 'unique' in error_msg:
-            if 'username' in error_msg:
-                raise AuthError("Username already exists")
-            elif 'email' in error_msg:
-                raise AuthError("Email already exists")
-        raise AuthError(f"Failed to create user: {str(e)}")
+    # One INSERT: the UNIQUE keys on username and email reject duplicates
+    with db.session() as dbs:
+        return insert_user(dbs, username, email, password_hash, full_name, bio)
+
+def create_users(users_data):
+    """
+    Create many users in one session (admin imports, seeding)
+
+    Passwords are hashed concurrently in the hashing pool, then every row is
+    inserted on one connection and committed once. Each row runs in its own
+    savepoint, so an invalid or duplicate entry is reported and skipped
+    without undoing the others.
+
+    Args:
+        users_data (list): Dicts with username, email, password and
+            optionally full_name and bio
+
+    Returns:
+        tuple: (list of created user dicts, list of (username, error message))
+    """
+    prepared = []
+    errors = []
+    for data in users_data:
+        try:
+            fields = prepare_user(
+                data.get('username'), data.get('email'), data.get('password'),
+                data.get('full_name'), data.get('bio')
+            )
+            prepared.append((fields, data['password']))
+        except AuthError as e:
+            errors.append((data.get('username'), str(e)))
+    
+    # Keep every pool worker busy instead of hashing one password at a time
+    with ThreadPoolExecutor(max_workers=max(1, hasher.workers)) as executor:
+        hashes = list(executor.map(hash_password, [password for _, password in prepared]))
+    
+    created = []
+    with db.session() as dbs:
+        for (fields, _), password_hash in zip(prepared, hashes):
+            username, email, full_name, bio = fields
+            try:
+                with dbs.transaction():
+                    created.append(insert_user(dbs, username, email, password_hash, full_name, bio))
+            except AuthError as e:
+                errors.append((username, str(e)))
+    return created, errors
 
 def authenticate_user(username_or_email, password):
     """
@@ -293,13 +259,36 @@ def authenticate_user(username_or_email, password):
         
         # Verify password
         if verify_password(password, user['password_hash']):
+            if needs_rehash(user['password_hash']):
+                upgrade_password_hash(user['id'], password, user['password_hash'])
             # Remove password hash from returned data
             del user['password_hash']
             return user
         
         return None
         
+    except HasherBusy:
+        raise
     except Exception as e:
         print(f"Error authenticating user: {e}")
         return None
 
+def upgrade_password_hash(user_id, password, old_hash):
+    """
+    Re-hash a password with the current cost after a successful login
+
+    Failures are logged and ignored; the old hash keeps working.
+
+    Args:
+        user_id (int): User who just logged in
+        password (str): The verified plain text password
+        old_hash (str): Hash it was verified against
+    """
+    try:
+        # Only replace the hash that was verified, in case the password changed meanwhile
+        db.execute_query(
+            "UPDATE users SET password_hash = %s WHERE id = %s AND password_hash = %s",
+            (hash_password(password), user_id, old_hash)
+        )
+    except Exception as e:
+        print(f"Error upgrading password hash: {e}")
@@ -0,0 +1,97 @@
+"""
+Micro-benchmark for validation.py
+
+Times the validators and sanitizers per call against the previous
+implementation (patterns passed as strings to re.match / re.sub on every
+call), so a change to validation.py can be checked for regressions:
+
+    python bench_validation.py [iterations]
+"""
+import re
+import sys
+import timeit
+
+import validation
+
+SAMPLES = {
+    'username': 'traveler_123',
+    'email': 'Traveler.123@Example.com',
+    'login': "johndoe' OR 1=1 --",
+    'caption': 'Sunset over the bay\r\nselect your favourite shot; more tomorrow \U0001F305',
+}
+
+
+def legacy_sanitize_input(value):
+    """sanitize_input as it was in auth.py before validation.py"""
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        return value
+    sanitized = value.strip()
+    dangerous_patterns = [
+        r"(\b(SELECT|INSERT|UPDATE|DELETE|DROP|CREATE|ALTER|EXEC|EXECUTE|UNION|SCRIPT)\b)",
+        r"(--|;|/\*|\*/|xp_|sp_)",
+        r"(\bor\b\s+\d+\s*=\s*\d+)",
+        r"(\band\b\s+\d+\s*=\s*\d+)"
+    ]
+    for pattern in dangerous_patterns:
+        sanitized = re.sub(pattern, '', sanitized, flags=re.IGNORECASE)
+    return sanitized
+
+
+def legacy_validate_username(username):
+    """validate_username as it was in auth.py before validation.py"""
+    if not username or len(username.strip()) == 0:
+        return False, "Username is required"
+    username = username.strip()
+    if len(username) < 3 or len(username) > 30:
+        return False, "Length"
+    if not re.match(r'^[a-zA-Z0-9._]+$', username):
+        return False, "Characters"
+    return True, None
+
+
+def legacy_validate_email(email):
+    """validate_email as it was in auth.py before validation.py"""
+    if not email or len(email.strip()) == 0:
+        return False, "Email is required"
+    email = email.strip().lower()
+    if len(email) > 100:
+        return False, "Length"
+    if not re.match(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', email):
+        return False, "Format"
+    return True, None
+
+
+CASES = [
+    ('sanitize_input', legacy_sanitize_input, validation.sanitize_input, SAMPLES['login']),
+    ('validate_username', legacy_validate_username, validation.validate_username, SAMPLES['username']),
+    ('validate_email', legacy_validate_email, validation.validate_email, SAMPLES['email']),
+    ('clean_text', None, lambda value: validation.clean_text(value, validation.CAPTION_MAX_LENGTH), SAMPLES['caption']),
+]
+
+
+def per_call_ns(fn, value, iterations):
+    """Best of five runs, in nanoseconds per call"""
+    runs = timeit.repeat(lambda: fn(value), number=iterations, repeat=5)
+    return min(runs) / iterations * 1e9
+
+
+def run(iterations=100000):
+    """Print per-call timings; returns {name: (legacy_ns or None, current_ns)}"""
+    results = {}
+    print(f"{'function':<20}{'before (ns)':>14}{'after (ns)':>14}{'speedup':>10}")
+    for name, legacy, current, value in CASES:
+        after = per_call_ns(current, value, iterations)
+        before = per_call_ns(legacy, value, iterations) if legacy else None
+        if before is not None:
+            assert legacy(value) == current(value), f"{name}: output differs from the previous implementation"
+            print(f"{name:<20}{before:>14.0f}{after:>14.0f}{before / after:>9.1f}x")
+        else:
+            print(f"{name:<20}{'-':>14}{after:>14.0f}{'-':>10}")
+        results[name] = (before, after)
+    return results
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,196 @@
+"""
+Frontend bundle build
+
+For every page in Frontend/html this script:
+- concatenates the page's local stylesheets and scripts (in document order)
+  and minifies them;
+- writes them under a content fingerprint, e.g.
+  Frontend/css/bundles/home.3f9a1c2b7d.css, next to .gz and .br copies
+  (.br only when the `brotli` package is installed);
+- writes a copy of the page into Frontend/html/bundles that loads the bundle
+  instead of the separate files;
+- records everything in Frontend/manifest.json, which static_files.py reads to
+  serve the bundled pages and the precompressed bytes.
+
+Run it after changing anything in Frontend (python build_frontend.py). Without
+a manifest the app serves the source files as before. `rjsmin` and `rcssmin`
+are used when installed; otherwise a conservative whitespace/comment
+minifier is applied.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    from rjsmin import jsmin
+except ImportError:
+    jsmin = None
+
+try:
+    from rcssmin import cssmin
+except ImportError:
+    cssmin = None
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+FRONTEND_DIR = os.path.join(ROOT_DIR, 'Frontend')
+MANIFEST_PATH = os.path.join(FRONTEND_DIR, 'manifest.json')
+
+# Bundle kind -> (source folder, output folder), relative to Frontend/
+BUNDLE_FOLDERS = {
+    'css': ('css', 'css/bundles'),
+    'js': ('js', 'js/bundles'),
+}
+PAGES_OUTPUT = 'html/bundles'
+
+_STYLESHEET_TAG = re.compile(r'[ \t]*<link rel="stylesheet" href="\.\./css/(?P<name>[\w.-]+\.css)">[ \t]*\n?')
+_SCRIPT_TAG = re.compile(r'[ \t]*<script src="\.\./js/(?P<name>[\w.-]+\.js)"></script>[ \t]*\n?')
+
+
+def minify_css(source):
+    """Minify CSS with rcssmin, or strip comments and collapse whitespace"""
+    if cssmin is not None:
+        return cssmin(source)
+    source = re.sub(r'/\*.*?\*/', '', source, flags=re.S)
+    source = re.sub(r'\s+', ' ', source)
+    # Spaces before ':' are kept: `a :hover` and `a:hover` are different selectors
+    source = re.sub(r'\s*([{};,>])\s*', r'\1', source)
+    source = re.sub(r':\s+', ':', source)
+    return source.replace(';}', '}').strip()
+
+
+def minify_js(source):
+    """
+    Minify JavaScript with rjsmin, or drop indentation, blank lines and
+    whole-line // comments (lines inside template literals are left alone)
+    """
+    if jsmin is not None:
+        return jsmin(source)
+    lines = []
+    in_template = False
+    for line in source.splitlines():
+        stripped = line.strip()
+        if in_template:
+            lines.append(line)
+        elif stripped and not stripped.startswith('//'):
+            lines.append(stripped)
+        if len(re.findall(r'(?<!\\)`', line)) % 2:
+            in_template = not in_template
+    return '\n'.join(lines) + '\n'
+
+
+def fingerprint(data):
+    """Short content hash used in bundle file names"""
+    return hashlib.sha256(data).hexdigest()[:10]
+
+
+def write_bundle(kind, page, content):
+    """
+    Write one fingerprinted bundle and its precompressed copies
+
+    Returns:
+        tuple: (path relative to Frontend/, list of encodings written)
+    """
+    data = content.encode('utf-8')
+    rel_path = f"{BUNDLE_FOLDERS[kind][1]}/{page}.{fingerprint(data)}.{kind}"
+    path = os.path.join(FRONTEND_DIR, rel_path)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+    encodings = []
+    # mtime=0 keeps the .gz bytes stable across builds
+    with open(path + '.gz', 'wb') as f:
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    encodings.append('gzip')
+    if brotli is not None:
+        with open(path + '.br', 'wb') as f:
+            f.write(brotli.compress(data, quality=11))
+        encodings.append('br')
+    return rel_path, encodings
+
+
+def _replace_tags(pattern, html, replacement):
+    """Replace the first tag matching `pattern` with `replacement` and remove the others"""
+    matches = list(pattern.finditer(html))
+    for match in reversed(matches[1:]):
+        html = html[:match.start()] + html[match.end():]
+    first = matches[0]
+    return html[:first.start()] + replacement + html[first.end():]
+
+
+def build_page(page_file):
+    """
+    Bundle one page's stylesheets and scripts and write the rewritten page
+
+    Returns:
+        dict: Manifest entry {'css': path, 'js': path, 'files': {path: encodings}}
+    """
+    page = os.path.splitext(page_file)[0]
+    with open(os.path.join(FRONTEND_DIR, 'html', page_file), 'r', encoding='utf-8') as f:
+        html = f.read()
+
+    entry = {'files': {}}
+    for kind, pattern in (('css', _STYLESHEET_TAG), ('js', _SCRIPT_TAG)):
+        names = [m.group('name') for m in pattern.finditer(html)]
+        if not names:
+            continue
+        source_dir = os.path.join(FRONTEND_DIR, BUNDLE_FOLDERS[kind][0])
+        parts = []
+        for name in names:
+            with open(os.path.join(source_dir, name), 'r', encoding='utf-8') as f:
+                parts.append(f.read())
+        if kind == 'css':
+            content = minify_css('\n'.join(parts))
+        else:
+            # Each file stays its own statement list even if one lacks a trailing semicolon
+            content = minify_js(';\n'.join(parts))
+        rel_path, encodings = write_bundle(kind, page, content)
+        entry[kind] = rel_path
+        entry['files'][rel_path] = encodings
+
+        # Replace the first tag with the bundle and drop the rest
+        if kind == 'css':
+            tag = f'    <link rel="stylesheet" href="/{rel_path}">\n'
+        else:
+            tag = f'    <script src="/{rel_path}"></script>\n'
+        html = _replace_tags(pattern, html, tag)
+
+    with open(os.path.join(FRONTEND_DIR, PAGES_OUTPUT, page_file), 'w', encoding='utf-8') as f:
+        f.write(html)
+    return entry
+
+
+def build():
+    """Rebuild every bundle and the manifest; returns the manifest"""
+    for folder in [out for _, out in BUNDLE_FOLDERS.values()] + [PAGES_OUTPUT]:
+        path = os.path.join(FRONTEND_DIR, folder)
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+
+    manifest = {'pages': {}, 'files': {}}
+    for page_file in sorted(os.listdir(os.path.join(FRONTEND_DIR, 'html'))):
+        if not page_file.endswith('.html'):
+            continue
+        entry = build_page(page_file)
+        manifest['files'].update(entry.pop('files'))
+        manifest['pages'][page_file] = entry
+
+    with open(MANIFEST_PATH, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+if __name__ == "__main__":
+    print("Building frontend bundles...")
+    result = build()
+    for path in sorted(result['files']):
+        size = os.path.getsize(os.path.join(FRONTEND_DIR, path))
+        print(f"  {path} ({size} bytes, {', '.join(result['files'][path])})")
+    print(f"Wrote {len(result['pages'])} pages and {MANIFEST_PATH}")
@@ -0,0 +1,262 @@
+"""
+Read-through response cache with event-driven invalidation
+
+Handlers cache per-viewer payloads (the home feed, story rings) under keys
+built by Cache.key(namespace, scope, *parts). Every scope, e.g. `viewer:42`,
+has a generation number that is part of the key. Invalidating a scope
+deletes its generation, so all keys built from the old one become
+unreachable at once and age out of the backend. No key scan is needed.
+
+Backends:
+- MemoryBackend (default): in-process LRU with per-entry TTL and a size bound.
+- RedisBackend (Config.CACHE_BACKEND='redis'): any server speaking the redis
+  protocol, shared by every app process. Needs the `redis` package.
+
+Writes announce themselves on the invalidation bus after they commit
+(bus.publish_on_commit). Modules that cache something subscribe to the events
+that make it stale:
+
+    post_liked       user_id, post_id
+    comment_added    user_id, post_id
+    followed         follower_id, following_id   (follow or unfollow)
+    post_created     user_id, viewer_ids         (author and followers)
+    story_created    user_id, viewer_ids
+    profile_updated  user_id, viewer_ids         (followers: avatars and names)
+
+Counts shown to other viewers (likes, comments) may lag by up to the entry
+TTL. Only the acting viewer's own entries are invalidated.
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from config import Config
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+class MemoryBackend:
+    """In-process LRU cache with per-entry expiry"""
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries or Config.CACHE_MAX_ENTRIES
+        self._entries = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+        self._evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, ttl, only_if_absent=False):
+        with self._lock:
+            if only_if_absent:
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] > time.monotonic():
+                    return False
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+            return True
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': 'memory',
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'evictions': self._evictions,
+            }
+
+
+class RedisBackend:
+    """Cache stored in redis (or a compatible server), values pickled"""
+
+    def __init__(self, url=None):
+        if redis is None:
+            raise RuntimeError("CACHE_BACKEND=redis needs the `redis` package")
+        self.url = url or Config.CACHE_REDIS_URL
+        self._client = redis.Redis.from_url(self.url)
+
+    def get(self, key):
+        data = self._client.get(key)
+        return pickle.loads(data) if data is not None else None
+
+    def set(self, key, value, ttl, only_if_absent=False):
+        # redis expiries are whole seconds; round up so short TTLs still cache
+        return bool(self._client.set(key, pickle.dumps(value), ex=max(1, int(ttl + 0.999)), nx=only_if_absent))
+
+    def delete(self, *keys):
+        if keys:
+            self._client.delete(*keys)
+
+    def stats(self):
+        return {'backend': 'redis', 'url': self.url}
+
+
+class Cache:
+    """Namespaced, generation-scoped cache with hit/miss counters"""
+
+    def __init__(self, backend, prefix=None):
+        self.backend = backend
+        self.prefix = Config.CACHE_KEY_PREFIX if prefix is None else prefix
+        self._lock = threading.Lock()
+        self._stats = {}  # namespace -> {'hits', 'misses', 'errors'}
+
+    def _count(self, namespace, field):
+        with self._lock:
+            counters = self._stats.setdefault(namespace, {'hits': 0, 'misses': 0, 'errors': 0})
+            counters[field] += 1
+
+    def generation(self, scope):
+        """Current generation of `scope`, starting a new one if it has none"""
+        key = f"{self.prefix}gen:{scope}"
+        current = self.backend.get(key)
+        if current is None:
+            # A fresh value never matches keys built before an invalidation
+            self.backend.set(key, time.time_ns(), Config.CACHE_GENERATION_TTL, only_if_absent=True)
+            current = self.backend.get(key)
+        return current
+
+    def key(self, namespace, scope, *parts):
+        """
+        Build a cache key for `namespace` (e.g. 'feed') in `scope` (e.g. 'viewer:42')
+
+        Returns:
+            str: Key, or None if the backend is unreachable (callers then skip the cache)
+        """
+        try:
+            generation = self.generation(scope)
+        except Exception as e:
+            print(f"Error reading cache generation: {e}")
+            self._count(namespace, 'errors')
+            return None
+        suffix = ':'.join(str(part) for part in parts)
+        return f"{self.prefix}{namespace}:{scope}:{generation}:{suffix}"
+
+    def get(self, key):
+        """Return the cached value for `key`, or None"""
+        if key is None:
+            return None
+        namespace = key[len(self.prefix):].split(':', 1)[0]
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            print(f"Error reading cache: {e}")
+            self._count(namespace, 'errors')
+            return None
+        self._count(namespace, 'hits' if value is not None else 'misses')
+        return value
+
+    def set(self, key, value, ttl):
+        """Cache `value` under `key` for `ttl` seconds (values must not be mutated afterwards)"""
+        if key is None or value is None or ttl <= 0:
+            return
+        try:
+            self.backend.set(key, value, ttl)
+        except Exception as e:
+            print(f"Error writing cache: {e}")
+
+    def get_or_load(self, key, loader, ttl):
+        """Return the cached value for `key`, or call `loader()` and cache its result"""
+        value = self.get(key)
+        if value is None:
+            value = loader()
+            self.set(key, value, ttl)
+        return value
+
+    def invalidate(self, *scopes):
+        """Make every key built in `scopes` unreachable"""
+        try:
+            self.backend.delete(*(f"{self.prefix}gen:{scope}" for scope in scopes))
+        except Exception as e:
+            print(f"Error invalidating cache: {e}")
+
+    def stats(self):
+        """Return per-namespace hit/miss/error counters and backend statistics"""
+        with self._lock:
+            namespaces = {name: dict(counters) for name, counters in self._stats.items()}
+        for counters in namespaces.values():
+            lookups = counters['hits'] + counters['misses']
+            counters['hit_rate'] = round(counters['hits'] / lookups, 3) if lookups else None
+        return {'namespaces': namespaces, **self.backend.stats()}
+
+
+class InvalidationBus:
+    """In-process event dispatch from writes to the caches they make stale"""
+
+    def __init__(self):
+        self._handlers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, event, handler):
+        """Call `handler(**data)` whenever `event` is published"""
+        with self._lock:
+            self._handlers.setdefault(event, []).append(handler)
+
+    def publish(self, event, **data):
+        """Run every handler for `event`; a failing handler does not stop the others"""
+        with self._lock:
+            handlers = list(self._handlers.get(event, ()))
+        for handler in handlers:
+            try:
+                handler(**data)
+            except Exception as e:
+                print(f"Error handling {event} invalidation: {e}")
+
+    def publish_on_commit(self, dbs, event, **data):
+        """Publish `event` once the session's work has committed"""
+        dbs.on_commit(lambda: self.publish(event, **data))
+
+
+def viewer_scope(user_id):
+    """Scope holding everything cached for one viewer"""
+    return f"viewer:{user_id}"
+
+
+def _invalidate_viewers(*fields):
+    """Handler invalidating the viewers named by `fields` of an event (ids or lists of ids)"""
+    def handler(**data):
+        viewer_ids = []
+        for field in fields:
+            value = data.get(field)
+            viewer_ids.extend(value if isinstance(value, (list, tuple, set)) else [value])
+        cache.invalidate(*(viewer_scope(user_id) for user_id in viewer_ids if user_id is not None))
+    return handler
+
+
+def create_backend():
+    """Backend selected by Config.CACHE_BACKEND"""
+    if Config.CACHE_BACKEND == 'redis':
+        return RedisBackend()
+    return MemoryBackend()
+
+
+# Global cache and bus instances
+cache = Cache(create_backend())
+bus = InvalidationBus()
+
+bus.subscribe('post_liked', _invalidate_viewers('user_id'))
+bus.subscribe('comment_added', _invalidate_viewers('user_id'))
+bus.subscribe('followed', _invalidate_viewers('follower_id'))
+bus.subscribe('post_created', _invalidate_viewers('viewer_ids'))
+bus.subscribe('story_created', _invalidate_viewers('viewer_ids'))
+bus.subscribe('profile_updated', _invalidate_viewers('user_id', 'viewer_ids'))
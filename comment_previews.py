@@ -0,0 +1,50 @@
+"""
+Latest-comments previews for feed posts
+
+The feed shows the newest few comments under each post. Instead of loading
+every comment of every post and discarding the rest in Python, each post gets
+its own `ORDER BY created_at DESC LIMIT n` branch of a UNION ALL, which MySQL
+answers with a short backward scan of the (post_id, created_at, id) index.
+At most `per_post` rows per post ever leave the database.
+"""
+from config import Config
+
+
+def latest_comments(dbs, post_ids, per_post=None):
+    """
+    Fetch the newest comments of several posts
+
+    Args:
+        dbs: Database or DatabaseSession
+        post_ids (list): Posts to preview
+        per_post (int, optional): Comments per post (defaults to Config.FEED_COMMENT_PREVIEWS)
+
+    Returns:
+        dict: post_id -> list of comment rows, newest first
+    """
+    per_post = Config.FEED_COMMENT_PREVIEWS if per_post is None else per_post
+    post_ids = list(dict.fromkeys(post_ids))
+    if not post_ids or per_post <= 0:
+        return {}
+
+    branch = """
+        (SELECT c.id, c.post_id, c.comment_text, c.created_at, u.username
+         FROM comments c
+         INNER JOIN users u ON c.user_id = u.id
+         WHERE c.post_id = %s
+         ORDER BY c.created_at DESC, c.id DESC
+         LIMIT %s)
+    """
+    query = " UNION ALL ".join([branch] * len(post_ids))
+    params = []
+    for pid in post_ids:
+        params.extend((pid, per_post))
+
+    rows = dbs.execute_query(query, tuple(params)) or []
+
+    by_post = {}
+    for row in rows:
+        by_post.setdefault(row['post_id'], []).append(row)
+    for items in by_post.values():
+        items.sort(key=lambda r: (r['created_at'], r['id']), reverse=True)
+    return by_post
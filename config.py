@@ -14,6 +14,101 @@ class Config:
     DB_PASSWORD = os.getenv('DB_PASSWORD', '')
     DB_NAME = os.getenv('DB_NAME', 'instagram_clone')
     DB_PORT = int(os.getenv('DB_PORT', 3306))
+
+    # Connection pool configuration
+    DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', 2))
+    DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', 20))
+    DB_POOL_IDLE_TIMEOUT = int(os.getenv('DB_POOL_IDLE_TIMEOUT', 300))        # seconds before an idle connection is closed
+    DB_POOL_CHECKOUT_TIMEOUT = int(os.getenv('DB_POOL_CHECKOUT_TIMEOUT', 10))  # seconds to wait for a free connection
+    DB_POOL_PING_INTERVAL = int(os.getenv('DB_POOL_PING_INTERVAL', 30))       # ping connections idle longer than this on checkout
+
+    # Home timeline configuration
+    TIMELINE_BACKFILL_LIMIT = int(os.getenv('TIMELINE_BACKFILL_LIMIT', 200))  # posts copied per account on follow/rebuild
+    FEED_COMMENT_PREVIEWS = int(os.getenv('FEED_COMMENT_PREVIEWS', 3))         # newest comments shown under each feed post
+
+    # Real-time messaging (Server-Sent Events)
+    SSE_KEEPALIVE_SECONDS = int(os.getenv('SSE_KEEPALIVE_SECONDS', 15))  # comment sent on idle streams to keep proxies from closing them
+    SSE_RETRY_MS = int(os.getenv('SSE_RETRY_MS', 3000))                  # client reconnect delay after a dropped stream
+    SSE_BACKLOG_LIMIT = int(os.getenv('SSE_BACKLOG_LIMIT', 200))         # missed messages replayed per reconnect
+
+    # Image ingestion (see images.py)
+    IMAGE_THUMB_WIDTH = int(os.getenv('IMAGE_THUMB_WIDTH', 320))
+    IMAGE_FEED_WIDTH = int(os.getenv('IMAGE_FEED_WIDTH', 1080))
+    IMAGE_FULL_WIDTH = int(os.getenv('IMAGE_FULL_WIDTH', 2048))
+    IMAGE_WEBP_QUALITY = int(os.getenv('IMAGE_WEBP_QUALITY', 80))
+    IMAGE_WEBP_METHOD = int(os.getenv('IMAGE_WEBP_METHOD', 4))            # 0 (fast) - 6 (smallest files)
+    IMAGE_MAX_PIXELS = int(os.getenv('IMAGE_MAX_PIXELS', 50_000_000))     # reject larger uploads before decoding
+
+    # Background threads (see start_background_workers() in app.py)
+    BACKGROUND_WORKERS = os.getenv('BACKGROUND_WORKERS', 'True').lower() == 'true'  # create_app() starts the *_IN_APP workers
+
+    # Background media processing (see media_jobs.py)
+    MEDIA_WORKER_IN_APP = os.getenv('MEDIA_WORKER_IN_APP', 'True').lower() == 'true'  # run the dispatcher inside app.py
+    MEDIA_WORKER_PROCESSES = int(os.getenv('MEDIA_WORKER_PROCESSES', os.cpu_count() or 2))
+    MEDIA_JOB_POLL_SECONDS = int(os.getenv('MEDIA_JOB_POLL_SECONDS', 5))     # queue check interval when idle
+    MEDIA_JOB_MAX_ATTEMPTS = int(os.getenv('MEDIA_JOB_MAX_ATTEMPTS', 3))
+    MEDIA_JOB_STALE_SECONDS = int(os.getenv('MEDIA_JOB_STALE_SECONDS', 600)) # running jobs older than this are retried
+    MEDIA_GC_GRACE_SECONDS = int(os.getenv('MEDIA_GC_GRACE_SECONDS', 3600))  # unreferenced blobs are kept this long
+    MEDIA_GC_IN_APP = os.getenv('MEDIA_GC_IN_APP', 'True').lower() == 'true'  # collect unreferenced blobs from app.py
+    MEDIA_GC_INTERVAL = int(os.getenv('MEDIA_GC_INTERVAL', 600))             # seconds between collections
+
+    # Response cache (see cache.py)
+    CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'memory')                     # 'memory' (per process) or 'redis' (shared)
+    CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    CACHE_KEY_PREFIX = os.getenv('CACHE_KEY_PREFIX', 'ig:')
+    CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 20000))           # memory backend size bound
+    CACHE_GENERATION_TTL = int(os.getenv('CACHE_GENERATION_TTL', 86400))     # must exceed every entry TTL
+    CACHE_FEED_TTL = int(os.getenv('CACHE_FEED_TTL', 30))                    # other users' like/comment counts may lag this long
+
+    # Hot-post counter sharding (see counters.py)
+    COUNTER_SHARDS = int(os.getenv('COUNTER_SHARDS', 16))                   # shard rows per hot post
+    COUNTER_HOT_THRESHOLD = int(os.getenv('COUNTER_HOT_THRESHOLD', 50))     # updates within COUNTER_HOT_WINDOW that make a post hot
+    COUNTER_HOT_WINDOW = float(os.getenv('COUNTER_HOT_WINDOW', 10))         # seconds
+    COUNTER_HOT_HOLD = float(os.getenv('COUNTER_HOT_HOLD', 300))            # seconds a post stays sharded after turning hot
+    COUNTER_FOLD_IN_APP = os.getenv('COUNTER_FOLD_IN_APP', 'True').lower() == 'true'  # fold shards into posts from app.py
+    COUNTER_FOLD_INTERVAL = float(os.getenv('COUNTER_FOLD_INTERVAL', 5))    # seconds between folds
+
+    # Likes (see likes.py)
+    LIKE_WRITE_BEHIND = os.getenv('LIKE_WRITE_BEHIND', 'False').lower() == 'true'  # buffer likes_count updates in process
+    LIKE_FLUSH_INTERVAL = float(os.getenv('LIKE_FLUSH_INTERVAL', 2))        # seconds between batched counter writes
+
+    # People you may know (see recommendations.py)
+    RECOMMENDATION_TOP_K = int(os.getenv('RECOMMENDATION_TOP_K', 100))             # candidates stored per user
+    RECOMMENDATION_BLOCK_USERS = int(os.getenv('RECOMMENDATION_BLOCK_USERS', 1000))  # users scored and written per transaction
+    RECOMMENDATION_BLOCK_PAIRS = int(os.getenv('RECOMMENDATION_BLOCK_PAIRS', 2_000_000))  # friend-of-friend pairs in memory per block
+    RECOMMENDATION_REFRESH_IN_APP = os.getenv('RECOMMENDATION_REFRESH_IN_APP', 'False').lower() == 'true'  # recompute from app.py
+    RECOMMENDATION_REFRESH_INTERVAL = int(os.getenv('RECOMMENDATION_REFRESH_INTERVAL', 3600))  # seconds between runs
+
+    # Stories (see stories.py)
+    STORY_TTL_HOURS = int(os.getenv('STORY_TTL_HOURS', 24))
+    STORY_CACHE_SECONDS = int(os.getenv('STORY_CACHE_SECONDS', 300))          # upper bound on how long a viewer's rings are cached
+    STORY_SWEEPER_IN_APP = os.getenv('STORY_SWEEPER_IN_APP', 'True').lower() == 'true'  # purge expired stories from app.py
+    STORY_PURGE_INTERVAL = int(os.getenv('STORY_PURGE_INTERVAL', 300))       # seconds between purges
+    STORY_PURGE_BATCH = int(os.getenv('STORY_PURGE_BATCH', 500))             # rows deleted per transaction
+
+    # Static file serving (see static_files.py)
+    STATIC_MAX_AGE = int(os.getenv('STATIC_MAX_AGE', 3600))                  # seconds for assets that are not content-addressed
+    STATIC_OFFLOAD = os.getenv('STATIC_OFFLOAD', '').lower()                 # '', 'x-sendfile' or 'x-accel-redirect'
+    STATIC_ACCEL_PREFIX = os.getenv('STATIC_ACCEL_PREFIX', '/protected')     # nginx internal location mapped to the app root
+    USE_FRONTEND_BUNDLES = os.getenv('USE_FRONTEND_BUNDLES', 'True').lower() == 'true'  # serve build_frontend.py output when built
+
+    # API response compression (see responses.py)
+    COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', 1024))          # smaller JSON bodies are sent as-is
+    COMPRESS_GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', 6))
+    COMPRESS_BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', 5))
+
+    # Password hashing (see passwords.py)
+    BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))                    # existing hashes are upgraded on login when this changes
+    BCRYPT_WORKERS = int(os.getenv('BCRYPT_WORKERS', os.cpu_count() or 2)) # 0 hashes in the calling thread
+    BCRYPT_MAX_PENDING = int(os.getenv('BCRYPT_MAX_PENDING', 64))          # queued + running hashes before new ones wait
+    BCRYPT_QUEUE_TIMEOUT = float(os.getenv('BCRYPT_QUEUE_TIMEOUT', 2))     # seconds to wait for a slot before answering 503
+    
+    # Server-side sessions (see server_sessions.py)
+    SESSION_STORE_PATH = os.getenv('SESSION_STORE_PATH', 'sessions.sqlite3')   # SQLite file shared by all app processes
+    SESSION_LIFETIME = int(os.getenv('SESSION_LIFETIME', 86400))               # seconds
+    SESSION_TOUCH_INTERVAL = int(os.getenv('SESSION_TOUCH_INTERVAL', 300))     # extend a session's expiry at most this often
+    SESSION_SNAPSHOT_TTL = int(os.getenv('SESSION_SNAPSHOT_TTL', 600))         # cached profiles expire even if never invalidated
+    SESSION_STORE_POOL_SIZE = int(os.getenv('SESSION_STORE_POOL_SIZE', 8))     # idle SQLite connections kept open
     
     # Flask configuration
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
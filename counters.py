@@ -0,0 +1,343 @@
+"""
+Denormalized post counters
+
+`posts.likes_count` and `posts.comments_count` are kept in step with the
+`likes` and `comments` tables by adjusting them in the same transaction as
+the write that changes them, so read paths can select the columns instead of
+running COUNT(*) per post. reconcile_post_counters() repairs any drift
+(e.g. rows removed by ON DELETE CASCADE when a user is deleted).
+
+A post that receives more than Config.COUNTER_HOT_THRESHOLD updates within
+Config.COUNTER_HOT_WINDOW seconds is promoted to sharded mode for
+Config.COUNTER_HOT_HOLD seconds. Its updates then land on one of
+Config.COUNTER_SHARDS rows in `post_counter_shards`, picked at random, instead
+of all serializing on the single `posts` row lock, so like throughput on a
+viral post scales with the number of writers. get_post_counters() adds the
+shards to the base counts, and list queries select post_counter_columns()
+instead of the bare columns so they do the same. fold_counter_shards(), run
+every Config.COUNTER_FOLD_INTERVAL seconds by ShardFolder, moves them into
+`posts`, which keeps the shard table small.
+Promotion is decided per process; a post may be sharded in one process and
+not in another without affecting correctness.
+
+Functions take `dbs`, anything with an execute_query() method: the global
+`db` or a request-scoped DatabaseSession.
+"""
+import random
+import threading
+import time
+
+from config import Config
+from database import db
+
+
+class HotPostTracker:
+    """Counts counter updates per post and reports which posts are hot"""
+
+    # Posts tracked at once before entries from past windows are pruned
+    MAX_TRACKED = 10000
+
+    def __init__(self, threshold=None, window=None, hold=None):
+        self.threshold = threshold or Config.COUNTER_HOT_THRESHOLD
+        self.window = window or Config.COUNTER_HOT_WINDOW
+        self.hold = hold or Config.COUNTER_HOT_HOLD
+        self._counts = {}     # post_id -> (window start, updates in window)
+        self._hot_until = {}  # post_id -> monotonic time it stops being sharded
+        self._lock = threading.Lock()
+        self._promotions = 0
+
+    def record(self, post_id):
+        """Count one update to `post_id`; returns True if it should go to a shard"""
+        now = time.monotonic()
+        with self._lock:
+            hot_until = self._hot_until.get(post_id)
+            if hot_until is not None:
+                if hot_until > now:
+                    return True
+                del self._hot_until[post_id]
+
+            start, count = self._counts.get(post_id, (now, 0))
+            if now - start >= self.window:
+                start, count = now, 0
+            count += 1
+            if count >= self.threshold:
+                self._counts.pop(post_id, None)
+                self._hot_until[post_id] = now + self.hold
+                self._promotions += 1
+                return True
+            self._counts[post_id] = (start, count)
+            if len(self._counts) > self.MAX_TRACKED:
+                self._counts = {
+                    pid: entry for pid, entry in self._counts.items()
+                    if now - entry[0] < self.window
+                }
+            return False
+
+    def stats(self):
+        """Return the number of hot posts and promotions so far"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                'hot_posts': sum(1 for until in self._hot_until.values() if until > now),
+                'tracked_posts': len(self._counts),
+                'promotions': self._promotions,
+            }
+
+
+hot_posts = HotPostTracker()
+
+
+def adjust_post_counters(dbs, post_id, likes=0, comments=0):
+    """
+    Apply a delta to a post's like/comment counters
+
+    Hot posts take the delta on a random shard row (see the module docstring).
+
+    Args:
+        dbs: Database or DatabaseSession (use the session that made the write)
+        post_id (int): Post to update
+        likes (int): Change in likes_count
+        comments (int): Change in comments_count
+    """
+    if not likes and not comments:
+        return 0
+    if hot_posts.record(post_id):
+        return add_to_shard(dbs, post_id, likes, comments)
+    return update_post_row(dbs, post_id, likes, comments)
+
+
+def add_to_shard(dbs, post_id, likes=0, comments=0):
+    """Add a delta to a random shard row of `post_id` (never locks the posts row)"""
+    return dbs.execute_query(
+        """
+        INSERT INTO post_counter_shards (post_id, shard, likes_delta, comments_delta)
+        VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            likes_delta = likes_delta + VALUES(likes_delta),
+            comments_delta = comments_delta + VALUES(comments_delta)
+        """,
+        (post_id, random.randrange(Config.COUNTER_SHARDS), likes, comments)
+    )
+
+
+def update_post_row(dbs, post_id, likes=0, comments=0):
+    """
+    Add a delta to the counters on the posts row itself
+
+    Returns:
+        int: 1 if the post exists (the row is then locked until commit), else 0
+    """
+    # Clamp at zero so a stray double-decrement cannot underflow the UNSIGNED columns
+    return dbs.execute_query(
+        """
+        UPDATE posts
+        SET likes_count = GREATEST(CAST(likes_count AS SIGNED) + %s, 0),
+            comments_count = GREATEST(CAST(comments_count AS SIGNED) + %s, 0)
+        WHERE id = %s
+        """,
+        (likes, comments, post_id)
+    )
+
+
+def post_counter_columns(alias='p'):
+    """
+    SELECT-list SQL for likes_count and comments_count including unfolded shards
+
+    Each sum is a primary-key range read of at most Config.COUNTER_SHARDS rows,
+    and usually finds none.
+
+    Args:
+        alias (str): Alias of `posts` in the query
+
+    Returns:
+        str: "<likes expr> AS likes_count, <comments expr> AS comments_count"
+    """
+    return ", ".join(
+        f"GREATEST({alias}.{column} + COALESCE(("
+        f"SELECT SUM(s.{delta}) FROM post_counter_shards s WHERE s.post_id = {alias}.id"
+        f"), 0), 0) AS {column}"
+        for column, delta in (('likes_count', 'likes_delta'), ('comments_count', 'comments_delta'))
+    )
+
+
+def get_post_counters(dbs, post_id):
+    """
+    Read a post's counters, including shards not yet folded into `posts`
+
+    Returns:
+        dict: {'likes_count': int, 'comments_count': int}
+    """
+    rows = dbs.execute_query(
+        """
+        SELECT p.likes_count + COALESCE(SUM(s.likes_delta), 0) AS likes_count,
+               p.comments_count + COALESCE(SUM(s.comments_delta), 0) AS comments_count
+        FROM posts p
+        LEFT JOIN post_counter_shards s ON s.post_id = p.id
+        WHERE p.id = %s
+        GROUP BY p.id
+        """,
+        (post_id,)
+    ) or [{}]
+    return {
+        'likes_count': max(int(rows[0].get('likes_count') or 0), 0),
+        'comments_count': max(int(rows[0].get('comments_count') or 0), 0)
+    }
+
+
+def fold_counter_shards(dbs=db, batch_size=500):
+    """
+    Move shard deltas into `posts` and delete the folded shard rows
+
+    The shard rows are locked while they are folded, so a concurrent update to
+    the same shard waits and lands in a new row instead of being lost.
+
+    Args:
+        dbs: Database (each batch runs in its own session)
+        batch_size (int): Shard rows folded per transaction
+
+    Returns:
+        int: Number of posts updated
+    """
+    folded = 0
+    while True:
+        with dbs.session() as session:
+            rows = session.execute_query(
+                """
+                SELECT post_id, shard, likes_delta, comments_delta
+                FROM post_counter_shards
+                ORDER BY post_id, shard
+                LIMIT %s
+                FOR UPDATE
+                """,
+                (batch_size,)
+            ) or []
+            if not rows:
+                return folded
+            totals = {}
+            for row in rows:
+                likes, comments = totals.get(row['post_id'], (0, 0))
+                totals[row['post_id']] = (likes + row['likes_delta'], comments + row['comments_delta'])
+            session.execute_many(
+                """
+                UPDATE posts
+                SET likes_count = GREATEST(CAST(likes_count AS SIGNED) + %s, 0),
+                    comments_count = GREATEST(CAST(comments_count AS SIGNED) + %s, 0)
+                WHERE id = %s
+                """,
+                [(likes, comments, post_id) for post_id, (likes, comments) in totals.items()]
+            )
+            session.execute_many(
+                "DELETE FROM post_counter_shards WHERE post_id = %s AND shard = %s",
+                [(row['post_id'], row['shard']) for row in rows]
+            )
+        folded += len(totals)
+        if len(rows) < batch_size:
+            return folded
+
+
+class ShardFolder:
+    """Background thread running fold_counter_shards every few seconds"""
+
+    def __init__(self, interval=None):
+        self.interval = interval or Config.COUNTER_FOLD_INTERVAL
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the fold thread (no-op if running)"""
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name='counter-folder', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the fold thread"""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            try:
+                fold_counter_shards()
+            except Exception as e:
+                print(f"Error folding counter shards: {e}")
+
+
+# Global folder instance (started by app.py)
+folder = ShardFolder()
+
+
+def reconcile_post_counters(dbs=db, batch_size=1000):
+    """
+    Recount likes and comments and fix posts whose counters drifted
+
+    Walks posts in id ranges of `batch_size` so no single statement locks
+    the whole table. Each range runs in one transaction that first locks the
+    range's shard rows (FOR UPDATE, which also blocks new ones) and deletes
+    them, since the recount already includes every like and comment they
+    stood for. A shard written after that commit belongs to a later like, so
+    nothing is counted twice.
+
+    Deltas waiting in the likes.py write-behind buffer are not visible here.
+    Flush it first (stop the app, or run with LIKE_WRITE_BEHIND=False), or they
+    are added on top of the recount when it flushes.
+
+    Args:
+        dbs: Database (each range runs in its own session)
+        batch_size (int): Post ids per range
+
+    Returns:
+        int: Number of posts whose counters were corrected
+    """
+    bounds = dbs.execute_query("SELECT MIN(id) AS lo, MAX(id) AS hi FROM posts") or [{}]
+    lo, hi = bounds[0].get('lo'), bounds[0].get('hi')
+    if lo is None:
+        return 0
+
+    fixed = 0
+    start = int(lo)
+    while start <= int(hi):
+        end = start + batch_size
+        with dbs.session() as session:
+            session.execute_query(
+                "SELECT post_id FROM post_counter_shards WHERE post_id >= %s AND post_id < %s FOR UPDATE",
+                (start, end)
+            )
+            session.execute_query(
+                "DELETE FROM post_counter_shards WHERE post_id >= %s AND post_id < %s",
+                (start, end)
+            )
+            fixed += session.execute_query(
+                """
+                UPDATE posts p
+                LEFT JOIN (
+                    SELECT post_id, COUNT(*) AS c FROM likes
+                    WHERE post_id >= %s AND post_id < %s
+                    GROUP BY post_id
+                ) l ON l.post_id = p.id
+                LEFT JOIN (
+                    SELECT post_id, COUNT(*) AS c FROM comments
+                    WHERE post_id >= %s AND post_id < %s
+                    GROUP BY post_id
+                ) c ON c.post_id = p.id
+                SET p.likes_count = COALESCE(l.c, 0),
+                    p.comments_count = COALESCE(c.c, 0)
+                WHERE p.id >= %s AND p.id < %s
+                  AND (p.likes_count <> COALESCE(l.c, 0) OR p.comments_count <> COALESCE(c.c, 0))
+                """,
+                (start, end, start, end, start, end)
+            ) or 0
+        start = end
+    return fixed
+
+
+if __name__ == "__main__":
+    if Config.LIKE_WRITE_BEHIND:
+        print("Warning: LIKE_WRITE_BEHIND is on; stop the app first so its buffered likes are flushed")
+    print("Reconciling post counters...")
+    count = reconcile_post_counters()
+    print(f"Corrected counters on {count} posts")
@@ -1,15 +1,477 @@
 """
 Database connection and utility functions
 """
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
 import mysql.connector
 from mysql.connector import Error
+from mysql.connector.errors import PoolError
 from config import Config
 
+
+class PooledConnection:
+    """Proxy around a pooled MySQL connection; close() returns it to the pool."""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def close(self):
+        """Hand the underlying connection back to the pool instead of closing it."""
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.release(conn)
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise PoolError("Connection has already been returned to the pool")
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of MySQL connections.
+
+    Keeps between `min_size` and `max_size` connections open, pings connections
+    that sat idle longer than `ping_interval` on checkout, and closes idle
+    connections above `min_size` once they exceed `idle_timeout`.
+    """
+
+    def __init__(self, factory, min_size=2, max_size=10, idle_timeout=300,
+                 checkout_timeout=10, ping_interval=30):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self._factory = factory
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self.ping_interval = ping_interval
+
+        self._cond = threading.Condition()
+        self._idle = deque()  # (conn, last_used) pairs, most recently used on the right
+        self._size = 0        # open connections, idle + in use
+        self._closed = False
+        self._reaper = None
+
+        self._stats = {
+            'borrows': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+            'timeouts': 0,
+            'created': 0,
+            'closed': 0,
+            'health_check_failures': 0,
+        }
+
+    # -- lifecycle -----------------------------------------------------------
+
+    def warm_up(self):
+        """Open connections until `min_size` are available."""
+        while True:
+            with self._cond:
+                if self._closed or self._size >= self.min_size:
+                    break
+                self._size += 1
+            try:
+                conn = self._create()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+        self._start_reaper()
+
+    def close_all(self):
+        """Close every idle connection and refuse further checkouts."""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._close(conn)
+
+    def reopen(self):
+        """Allow checkouts again after close_all()."""
+        with self._cond:
+            self._closed = False
+
+    # -- checkout / release ---------------------------------------------------
+
+    def acquire(self, timeout=None):
+        """
+        Borrow a healthy connection, waiting up to `timeout` seconds.
+
+        Raises:
+            PoolError: If the pool is closed or no connection frees up in time
+        """
+        timeout = self.checkout_timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        self._start_reaper()
+
+        while True:
+            conn = None
+            create = False
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise PoolError("Connection pool is closed")
+                    if self._idle:
+                        conn, last_used = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        create = True
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolError(
+                            f"Timed out after {timeout}s waiting for a database connection "
+                            f"(pool size {self.max_size})"
+                        )
+                    self._cond.wait(remaining)
+
+            if create:
+                try:
+                    conn = self._create()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._is_healthy(conn, last_used):
+                self._discard(conn)
+                continue
+
+            waited = time.monotonic() - started
+            with self._cond:
+                self._stats['borrows'] += 1
+                self._stats['wait_time_total'] += waited
+                self._stats['wait_time_max'] = max(self._stats['wait_time_max'], waited)
+            return conn
+
+    def release(self, conn, discard=False):
+        """Return a borrowed connection; broken or discarded ones are closed."""
+        if not discard:
+            try:
+                if conn.in_transaction:
+                    conn.rollback()
+            except Exception:
+                discard = True
+
+        if discard or self._closed:
+            self._discard(conn)
+            return
+
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Context manager that borrows a connection and always returns it."""
+        conn = self.acquire(timeout)
+        broken = False
+        try:
+            yield conn
+        except Error:
+            broken = not self._still_connected(conn)
+            raise
+        finally:
+            self.release(conn, discard=broken)
+
+    # -- maintenance ----------------------------------------------------------
+
+    def reap_idle(self):
+        """Close connections above `min_size` that have been idle too long."""
+        now = time.monotonic()
+        expired = []
+        with self._cond:
+            # Oldest idle connections sit on the left of the deque
+            while self._idle and self._size > self.min_size:
+                conn, last_used = self._idle[0]
+                if now - last_used < self.idle_timeout:
+                    break
+                self._idle.popleft()
+                self._size -= 1
+                expired.append(conn)
+        for conn in expired:
+            self._close(conn)
+        return len(expired)
+
+    def stats(self):
+        """Return a snapshot of pool usage and borrow wait-time statistics."""
+        with self._cond:
+            snapshot = dict(self._stats)
+            snapshot['size'] = self._size
+            snapshot['idle'] = len(self._idle)
+            snapshot['in_use'] = self._size - len(self._idle)
+            snapshot['min_size'] = self.min_size
+            snapshot['max_size'] = self.max_size
+        borrows = snapshot['borrows']
+        snapshot['wait_time_avg'] = snapshot['wait_time_total'] / borrows if borrows else 0.0
+        return snapshot
+
+    # -- internals ------------------------------------------------------------
+
+    def _create(self):
+        conn = self._factory()
+        with self._cond:
+            self._stats['created'] += 1
+        return conn
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._stats['closed'] += 1
+
+    def _discard(self, conn):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+        self._close(conn)
+
+    def _is_healthy(self, conn, last_used):
+        if time.monotonic() - last_used < self.ping_interval:
+            return True
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            with self._cond:
+                self._stats['health_check_failures'] += 1
+            return False
+
+    @staticmethod
+    def _still_connected(conn):
+        try:
+            return conn.is_connected()
+        except Exception:
+            return False
+
+    def _start_reaper(self):
+        if self._reaper is not None or self.idle_timeout <= 0:
+            return
+        with self._cond:
+            if self._reaper is not None:
+                return
+            self._reaper = threading.Thread(target=self._reap_loop, name='db-pool-reaper', daemon=True)
+        self._reaper.start()
+
+    def _reap_loop(self):
+        interval = max(1, min(self.idle_timeout, 60))
+        while True:
+            time.sleep(interval)
+            try:
+                self.reap_idle()
+            except Exception as e:
+                print(f"Error reaping idle connections: {e}")
+
+
+def _run_query(conn, query, params=None):
+    """
+    Execute one statement on `conn`.
+
+    Returns:
+        tuple: (rows for statements that return a result set, otherwise the
+        affected row count; the cursor's lastrowid)
+    """
+    cursor = conn.cursor(dictionary=True, buffered=False)
+    try:
+        if params:
+            cursor.execute(query, params)
+        else:
+            cursor.execute(query)
+
+        if cursor.with_rows:
+            rows = cursor.fetchall()
+            return ([dict(row) for row in rows] if rows else []), cursor.lastrowid
+        return cursor.rowcount, cursor.lastrowid
+    finally:
+        try:
+            cursor.close()
+        except:
+            pass
+
+
+def _run_many(conn, query, params_list):
+    """Execute `query` once per parameter tuple on `conn` and return the affected row count."""
+    cursor = conn.cursor(dictionary=True, buffered=False)
+    try:
+        cursor.executemany(query, params_list)
+        return cursor.rowcount
+    finally:
+        try:
+            cursor.close()
+        except:
+            pass
+
+
+class DatabaseSession:
+    """
+    Unit of work pinned to a single pooled connection.
+
+    Every statement runs on the same connection inside one transaction, so
+    `lastrowid` is always from this session's last INSERT and reads see the
+    session's own uncommitted writes. Call close() to commit (or roll back)
+    and hand the connection back to the pool.
+    """
+
+    def __init__(self, database):
+        self._db = database
+        self._conn = None
+        self._savepoints = 0
+        self._after_commit = []
+        self.lastrowid = None
+
+    def _connection(self):
+        if self._conn is None:
+            conn = self._db.pool.acquire()
+            try:
+                conn.autocommit = False
+            except Exception:
+                self._db.pool.release(conn, discard=True)
+                raise
+            self._conn = conn
+        return self._conn
+
+    def execute_query(self, query, params=None):
+        """Execute a query on the session's connection (same return contract as Database.execute_query)."""
+        try:
+            result, lastrowid = _run_query(self._connection(), query, params)
+        except Exception as e:
+            print(f"Error executing query: {e}")
+            import traceback
+            traceback.print_exc()
+            raise
+        if not isinstance(result, list):
+            self.lastrowid = lastrowid
+        return result
+
+    def execute_many(self, query, params_list):
+        """Execute a query multiple times with different parameters on the session's connection."""
+        try:
+            return _run_many(self._connection(), query, params_list)
+        except Exception as e:
+            print(f"Error executing batch query: {e}")
+            import traceback
+            traceback.print_exc()
+            raise
+
+    @contextmanager
+    def transaction(self):
+        """
+        Group statements so they succeed or fail together.
+
+        Implemented with a savepoint, so a failure inside the block only undoes
+        the block's statements and leaves earlier work in the session intact.
+        """
+        conn = self._connection()
+        self._savepoints += 1
+        name = f"sp_{self._savepoints}"
+        _run_query(conn, f"SAVEPOINT {name}")
+        try:
+            yield self
+        except Exception:
+            _run_query(conn, f"ROLLBACK TO SAVEPOINT {name}")
+            raise
+        else:
+            _run_query(conn, f"RELEASE SAVEPOINT {name}")
+
+    def on_commit(self, callback):
+        """Run `callback()` once the session's work is committed (skipped on rollback)."""
+        self._after_commit.append(callback)
+
+    def _run_after_commit(self):
+        callbacks, self._after_commit = self._after_commit, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Error in after-commit callback: {e}")
+
+    def commit(self):
+        """Commit the work done so far; the session stays usable."""
+        if self._conn is not None:
+            self._conn.commit()
+        self._run_after_commit()
+
+    def rollback(self):
+        """Discard uncommitted work; the session stays usable."""
+        if self._conn is not None:
+            self._conn.rollback()
+        self._after_commit = []
+
+    def close(self, commit=True):
+        """Commit or roll back, then return the connection to the pool."""
+        conn, self._conn = self._conn, None
+        if conn is None:
+            if commit:
+                self._run_after_commit()
+            self._after_commit = []
+            return
+        broken = False
+        try:
+            if commit:
+                conn.commit()
+            else:
+                conn.rollback()
+        except Exception:
+            broken = True
+            if commit:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+                raise
+        finally:
+            try:
+                conn.autocommit = True
+            except Exception:
+                broken = True
+            self._db.pool.release(conn, discard=broken)
+        if commit:
+            self._run_after_commit()
+        self._after_commit = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(commit=exc_type is None)
+
+
 class Database:
-    """Database connection handler (fresh connection per query)."""
-    
+    """Database connection handler backed by a shared connection pool."""
+
     def __init__(self):
         self._connection_logged = False
+        self.pool = ConnectionPool(
+            self._new_connection,
+            min_size=Config.DB_POOL_MIN_SIZE,
+            max_size=Config.DB_POOL_MAX_SIZE,
+            idle_timeout=Config.DB_POOL_IDLE_TIMEOUT,
+            checkout_timeout=Config.DB_POOL_CHECKOUT_TIMEOUT,
+            ping_interval=Config.DB_POOL_PING_INTERVAL
+        )
 
     def _new_connection(self):
         """Create and return a new MySQL connection."""
@@ -29,76 +491,57 @@ class Database:
             print(f"Successfully connected to MySQL database '{Config.DB_NAME}'")
             self._connection_logged = True
         return conn
-    
+
+    def connect(self):
+        """Open the pool's minimum connections. Returns True on success."""
+        try:
+            self.pool.reopen()
+            self.pool.warm_up()
+            with self.pool.connection():
+                pass
+            return True
+        except Exception as e:
+            print(f"Error connecting to MySQL: {e}")
+            return False
+
+    def disconnect(self):
+        """Close all idle pooled connections."""
+        self.pool.close_all()
+
     def execute_query(self, query, params=None):
-        """Execute a query with a fresh connection each time."""
-        conn = None
-        cursor = None
+        """Execute a query on a pooled connection."""
         try:
-            conn = self._new_connection()
-            cursor = conn.cursor(dictionary=True, buffered=False)
-            
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
-            
-            if query.strip().upper().startswith('SELECT'):
-                rows = cursor.fetchall()
-                return [dict(row) for row in rows] if rows else []
-            else:
-                return cursor.rowcount
+            with self.pool.connection() as conn:
+                result, _ = _run_query(conn, query, params)
+                return result
         except Exception as e:
             print(f"Error executing query: {e}")
             import traceback
             traceback.print_exc()
             raise
-        finally:
-            if cursor:
-                try:
-                    cursor.close()
-                except:
-                    pass
-            if conn:
-                try:
-                    conn.close()
-                except:
-                    pass
-    
+
     def execute_many(self, query, params_list):
-        """Execute a query multiple times with different parameters (fresh connection)."""
-        conn = None
-        cursor = None
+        """Execute a query multiple times with different parameters on a pooled connection."""
         try:
-            conn = self._new_connection()
-            cursor = conn.cursor(dictionary=True, buffered=False)
-            cursor.executemany(query, params_list)
-            return cursor.rowcount
+            with self.pool.connection() as conn:
+                return _run_many(conn, query, params_list)
         except Exception as e:
             print(f"Error executing batch query: {e}")
             import traceback
             traceback.print_exc()
             raise
-        finally:
-            if cursor:
-                try:
-                    cursor.close()
-                except:
-                    pass
-            if conn:
-                try:
-                    conn.close()
-                except:
-                    pass
-    
+
+    def session(self):
+        """Start a unit of work that pins one pooled connection until closed."""
+        return DatabaseSession(self)
+
     def get_connection(self):
-        """For compatibility; returns a new connection."""
-        return self._new_connection()
-    
-    def get_cursor(self):
-        """For compatibility; returns a cursor on a new connection."""
-        conn = self._new_connection()
-        return conn.cursor(dictionary=True, buffered=False)
+        """Borrow a pooled connection; calling close() on it returns it to the pool."""
+        return PooledConnection(self.pool, self.pool.acquire())
+
+    def pool_stats(self):
+        """Return connection pool statistics."""
+        return self.pool.stats()
 
 # Global database instance
 db = Database()
@@ -0,0 +1,147 @@
+"""
+Image ingestion: decode uploads once and write resized WebP variants
+
+Every uploaded post, story or profile picture is decoded a single time,
+rotated according to its EXIF orientation, stripped of metadata (EXIF, GPS,
+ICC extras) and written as a small set of width-bounded WebP files:
+
+    <key>_thumb.webp   profile grids, avatars
+    <key>_feed.webp    feed and story viewers
+    <key>_full.webp    full-screen view; the path stored in the database
+
+The stored path always names the `full` variant, so the other sizes can be
+derived from it (see variant_paths) without another column.
+
+Uploads are only checked in the request (check_image reads the header, not
+the pixels); the decoding and encoding run in media_jobs.py worker processes
+through ingest_file.
+"""
+import os
+import re
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from config import Config
+
+# Root that stored image paths (posts/..., stories/..., profiles/...) are relative to
+IMAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets', 'images')
+
+# Variant name -> maximum width in pixels, smallest first
+VARIANTS = {
+    'thumb': Config.IMAGE_THUMB_WIDTH,
+    'feed': Config.IMAGE_FEED_WIDTH,
+    'full': Config.IMAGE_FULL_WIDTH
+}
+
+_VARIANT_PATH = re.compile(r'^(?P<prefix>.*)_full\.webp$')
+
+
+class ImageError(Exception):
+    """Raised when an upload cannot be decoded as an image"""
+    pass
+
+
+def check_image(stream):
+    """
+    Check that an upload looks like a supported image without decoding it
+
+    Reads only the file header, then rewinds `stream` so it can be saved.
+
+    Raises:
+        ImageError: If the data is not a supported image or is too large
+    """
+    try:
+        with Image.open(stream) as image:
+            if image.width * image.height > Config.IMAGE_MAX_PIXELS:
+                raise ImageError("Image dimensions are too large")
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        raise ImageError("Unsupported or corrupt image") from e
+    finally:
+        stream.seek(0)
+
+
+def ingest_image(source, dest_dir, key):
+    """
+    Decode an image and write its WebP variants into `dest_dir`
+
+    Args:
+        source: Path or binary file object (e.g. a werkzeug FileStorage stream)
+        dest_dir (str): Directory to write variants into (created if missing)
+        key (str): File name stem shared by the variants
+
+    Returns:
+        dict: Variant name -> file name written, e.g. {'full': '<key>_full.webp', ...}
+
+    Raises:
+        ImageError: If the data is not a supported image or is too large
+    """
+    try:
+        with Image.open(source) as original:
+            if original.width * original.height > Config.IMAGE_MAX_PIXELS:
+                raise ImageError("Image dimensions are too large")
+            image = ImageOps.exif_transpose(original)
+            image.load()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        raise ImageError("Unsupported or corrupt image") from e
+
+    # Keep transparency where there is any; everything else becomes plain RGB
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+
+    os.makedirs(dest_dir, exist_ok=True)
+    written = {}
+    for name, max_width in VARIANTS.items():
+        variant = image
+        if image.width > max_width:
+            height = max(1, round(image.height * max_width / image.width))
+            variant = image.resize((max_width, height), Image.LANCZOS)
+        file_name = f"{key}_{name}.webp"
+        # Saving without exif=/icc_profile= drops the original metadata
+        variant.save(
+            os.path.join(dest_dir, file_name),
+            'WEBP',
+            quality=Config.IMAGE_WEBP_QUALITY,
+            method=Config.IMAGE_WEBP_METHOD
+        )
+        written[name] = file_name
+    return written
+
+
+def ingest_file(source_path):
+    """
+    Write the variants of a stored original next to it
+
+    Args:
+        source_path (str): Original upload relative to IMAGES_DIR, e.g. 'posts/<key>_IMG_1.JPEG'
+
+    Returns:
+        str: Stored path of the full variant, e.g. 'posts/<key>_IMG_1_full.webp'
+    """
+    folder, file_name = os.path.split(source_path)
+    key = os.path.splitext(file_name)[0]
+    full_path = f"{folder}/{key}_full.webp"
+    # Content-addressed originals (media_store.py) may already have been processed
+    if os.path.exists(os.path.join(IMAGES_DIR, full_path)):
+        return full_path
+    variants = ingest_image(
+        os.path.join(IMAGES_DIR, source_path),
+        os.path.join(IMAGES_DIR, folder),
+        key
+    )
+    return f"{folder}/{variants['full']}"
+
+
+def variant_paths(path):
+    """
+    Derive every variant path from a stored `<key>_full.webp` path
+
+    Returns:
+        dict: Variant name -> path, or None for images stored before ingestion
+    """
+    if not path:
+        return None
+    match = _VARIANT_PATH.match(str(path))
+    if not match:
+        return None
+    prefix = match.group('prefix')
+    return {name: f"{prefix}_{name}.webp" for name in VARIANTS}
@@ -0,0 +1,124 @@
+"""
+Direct-message inbox queries
+
+Each conversation keeps a pointer to its newest message
+(`conversations.last_message_id`) and each membership row keeps the time of
+the conversation's latest activity (`conversation_members.last_activity_at`).
+Both are updated when a message is sent, so a user's inbox - other member,
+last message and ordering - comes from one indexed query instead of two
+queries per conversation.
+
+Functions take `dbs`, anything with an execute_query() method: the global
+`db` or a request-scoped DatabaseSession.
+"""
+from database import db
+from pagination import keyset_condition
+
+INBOX_QUERY = """
+    SELECT
+        cm.conversation_id,
+        cm.last_activity_at,
+        ou.id AS other_id,
+        ou.username AS other_username,
+        ou.full_name AS other_full_name,
+        ou.profile_pic AS other_profile_pic,
+        lm.id AS last_message_id,
+        lm.sender_id AS last_sender_id,
+        lm.message_text AS last_message_text,
+        lm.image_url AS last_image_url,
+        lm.created_at AS last_created_at,
+        su.username AS last_sender_username
+    FROM conversation_members cm
+    INNER JOIN conversations c ON c.id = cm.conversation_id
+    LEFT JOIN users ou ON ou.id = COALESCE(
+        (SELECT MIN(om.user_id) FROM conversation_members om
+         WHERE om.conversation_id = cm.conversation_id AND om.user_id <> cm.user_id),
+        cm.user_id
+    )
+    LEFT JOIN messages lm ON lm.id = c.last_message_id
+    LEFT JOIN users su ON su.id = lm.sender_id
+    WHERE {where}
+    ORDER BY cm.last_activity_at DESC, cm.conversation_id DESC
+    LIMIT %s
+"""
+
+
+def list_inbox(dbs, user_id, limit=50, after=None):
+    """
+    Read a page of a user's conversations, most recently active first
+
+    Args:
+        dbs: Database or DatabaseSession
+        user_id (int): Inbox owner
+        limit (int): Max conversations to return
+        after (tuple, optional): (last_activity_at, conversation_id) of the last
+            conversation already shown
+
+    Returns:
+        list: Inbox rows (see INBOX_QUERY for columns)
+    """
+    where = "cm.user_id = %s"
+    params = [user_id]
+    if after:
+        condition, condition_params = keyset_condition(
+            [('cm.last_activity_at', 'desc'), ('cm.conversation_id', 'desc')], after
+        )
+        where += f" AND {condition}"
+        params.extend(condition_params)
+    params.append(limit)
+    return dbs.execute_query(INBOX_QUERY.format(where=where), tuple(params)) or []
+
+
+def get_inbox_entry(dbs, conversation_id, user_id):
+    """Read one conversation as it appears in `user_id`'s inbox, or None if not a member"""
+    rows = dbs.execute_query(
+        INBOX_QUERY.format(where="cm.user_id = %s AND cm.conversation_id = %s"),
+        (user_id, conversation_id, 1)
+    ) or []
+    return rows[0] if rows else None
+
+
+def record_message(dbs, conversation_id, message_id):
+    """Point the conversation at its new last message and bump every member's activity time"""
+    dbs.execute_query(
+        "UPDATE conversations SET last_message_id = %s WHERE id = %s",
+        (message_id, conversation_id)
+    )
+    dbs.execute_query(
+        """
+        UPDATE conversation_members cm
+        INNER JOIN messages m ON m.id = %s
+        SET cm.last_activity_at = m.created_at
+        WHERE cm.conversation_id = %s
+        """,
+        (message_id, conversation_id)
+    )
+
+
+def rebuild_inbox(dbs=db):
+    """Recompute last_message_id and last_activity_at for every conversation (for existing data)"""
+    dbs.execute_query(
+        """
+        UPDATE conversations c
+        SET c.last_message_id = (
+            SELECT m.id FROM messages m
+            WHERE m.conversation_id = c.id
+            ORDER BY m.created_at DESC, m.id DESC
+            LIMIT 1
+        )
+        """
+    )
+    return dbs.execute_query(
+        """
+        UPDATE conversation_members cm
+        INNER JOIN conversations c ON c.id = cm.conversation_id
+        LEFT JOIN messages m ON m.id = c.last_message_id
+        SET cm.last_activity_at = COALESCE(m.created_at, c.created_at)
+        """
+    )
+
+
+if __name__ == "__main__":
+    print("Rebuilding inbox pointers...")
+    count = rebuild_inbox()
+    print(f"Updated {count} conversation memberships")
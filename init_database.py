@@ -6,6 +6,12 @@ import mysql.connector
 from mysql.connector import Error
 from config import Config
 
+# MySQL errors raised when re-running an index/column change that is already in place
+ALREADY_APPLIED_ERRORS = {
+    1060,  # ER_DUP_FIELDNAME: duplicate column name
+    1061,  # ER_DUP_KEYNAME: duplicate key name
+}
+
 def read_sql_file(file_path):
     """Read SQL file content"""
     with open(file_path, 'r', encoding='utf-8') as file:
@@ -25,6 +31,9 @@ def execute_sql_file(connection, sql_content):
                 cursor.execute(statement)
                 print(f"Executed: {statement[:50]}...")
             except Error as e:
+                if e.errno in ALREADY_APPLIED_ERRORS:
+                    print(f"Already applied: {statement[:50]}...")
+                    continue
                 print(f"Error executing statement: {e}")
                 print(f"Statement: {statement[:100]}...")
     
@@ -0,0 +1,217 @@
+"""
+Likes: idempotent like/unlike with optional write-behind counters
+
+like_post() and unlike_post() are safe to repeat: the row change is an
+INSERT IGNORE or DELETE, and `posts.likes_count` moves by the number of rows
+actually affected, in the same transaction. A double tap or a retried request
+therefore never double-counts, and no SELECT-then-write race is possible.
+like_post() checks the post exists before INSERT IGNORE (which would
+otherwise swallow the foreign key error) and raises PostNotFound. The check
+also takes the post row's lock in the mode the rest of the like needs. When the
+count goes on the posts row, the like starts with that UPDATE and takes the
+exclusive lock before the insert's foreign key check. Two concurrent likes
+then queue instead of both holding a shared lock and deadlocking on the
+upgrade. It is one statement fewer, and a duplicate like reverts the count.
+Hot posts (sharded counters) and write-behind never write the posts row, so
+they only take a shared lock and likes on them still run in parallel.
+
+With Config.LIKE_WRITE_BEHIND enabled, counter deltas are not written per
+like. They are added to an in-process LikeCounterBuffer after the like
+commits, and flushed every Config.LIKE_FLUSH_INTERVAL seconds as one batched
+UPDATE per post. A like storm on a hot post then costs one counter write per
+interval instead of one per like. Deltas still in the buffer when the
+process dies are lost; counters.reconcile_post_counters() repairs them.
+
+Functions take `dbs`, anything with an execute_query() method: the global
+`db` or a request-scoped DatabaseSession.
+"""
+import threading
+
+from config import Config
+from database import db
+import counters
+
+
+class PostNotFound(Exception):
+    """Raised when liking a post that does not exist"""
+
+
+class LikeCounterBuffer:
+    """Pending likes_count deltas per post, flushed to MySQL in batches"""
+
+    def __init__(self, interval=None):
+        self.interval = interval or Config.LIKE_FLUSH_INTERVAL
+        self._pending = {}  # post_id -> delta
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._stats = {
+            'buffered': 0,
+            'flushes': 0,
+            'rows_written': 0,
+        }
+
+    def add(self, post_id, delta):
+        """Record a committed like (+1) or unlike (-1) for the next flush"""
+        if not delta:
+            return
+        with self._lock:
+            self._pending[post_id] = self._pending.get(post_id, 0) + delta
+            self._stats['buffered'] += 1
+
+    def pending(self, post_id):
+        """Delta not yet written for `post_id` (added to counts read from MySQL)"""
+        with self._lock:
+            return self._pending.get(post_id, 0)
+
+    def flush(self, dbs=db):
+        """
+        Write every pending delta in one transaction
+
+        Returns:
+            int: Number of posts updated
+        """
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        batch = {post_id: delta for post_id, delta in batch.items() if delta}
+        if not batch:
+            return 0
+        try:
+            with dbs.session() as session:
+                session.execute_many(
+                    "UPDATE posts SET likes_count = GREATEST(CAST(likes_count AS SIGNED) + %s, 0) WHERE id = %s",
+                    [(delta, post_id) for post_id, delta in batch.items()]
+                )
+        except Exception:
+            # Put the deltas back so the next flush retries them
+            with self._lock:
+                for post_id, delta in batch.items():
+                    self._pending[post_id] = self._pending.get(post_id, 0) + delta
+            raise
+        with self._lock:
+            self._stats['flushes'] += 1
+            self._stats['rows_written'] += len(batch)
+        return len(batch)
+
+    def start(self):
+        """Start the flush thread (no-op if running)"""
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name='like-flusher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the flush thread after a final flush"""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error flushing like counters: {e}")
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"Error flushing like counters: {e}")
+
+    def stats(self):
+        """Return buffer counters and the number of posts with pending deltas"""
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot['pending_posts'] = len(self._pending)
+        snapshot['enabled'] = Config.LIKE_WRITE_BEHIND
+        return snapshot
+
+
+def _apply_delta(dbs, post_id, delta):
+    if not delta:
+        return
+    if Config.LIKE_WRITE_BEHIND:
+        dbs.on_commit(lambda: buffer.add(post_id, delta))
+    else:
+        counters.adjust_post_counters(dbs, post_id, likes=delta)
+
+
+def like_post(dbs, user_id, post_id):
+    """
+    Like a post (no-op if already liked)
+
+    Args:
+        dbs: DatabaseSession
+        user_id (int): User liking the post
+        post_id (int): Post to like
+
+    Returns:
+        bool: True if a like was added
+
+    Raises:
+        PostNotFound: If `post_id` does not exist
+    """
+    with dbs.transaction():
+        if Config.LIKE_WRITE_BEHIND or counters.hot_posts.record(post_id):
+            # Nothing below writes the posts row, so a shared lock is enough
+            if not dbs.execute_query("SELECT id FROM posts WHERE id = %s LOCK IN SHARE MODE", (post_id,)):
+                raise PostNotFound(post_id)
+            added = _insert_like(dbs, user_id, post_id)
+            if added and Config.LIKE_WRITE_BEHIND:
+                dbs.on_commit(lambda: buffer.add(post_id, added))
+            elif added:
+                counters.add_to_shard(dbs, post_id, likes=added)
+        else:
+            # Count first: the UPDATE takes the exclusive row lock before the insert's FK check
+            if not counters.update_post_row(dbs, post_id, likes=1):
+                raise PostNotFound(post_id)
+            added = _insert_like(dbs, user_id, post_id)
+            if not added:
+                counters.update_post_row(dbs, post_id, likes=-1)
+    return bool(added)
+
+
+def _insert_like(dbs, user_id, post_id):
+    return dbs.execute_query(
+        "INSERT IGNORE INTO likes (user_id, post_id) VALUES (%s, %s)",
+        (user_id, post_id)
+    )
+
+
+def unlike_post(dbs, user_id, post_id):
+    """
+    Remove a like (no-op if not liked)
+
+    Returns:
+        bool: True if a like was removed
+    """
+    with dbs.transaction():
+        removed = dbs.execute_query(
+            "DELETE FROM likes WHERE user_id = %s AND post_id = %s",
+            (user_id, post_id)
+        )
+        _apply_delta(dbs, post_id, -removed)
+    return bool(removed)
+
+
+def likes_count(dbs, post_id, uncommitted=0):
+    """
+    Current like count, including deltas still waiting in the buffer
+
+    Args:
+        dbs: Database or DatabaseSession
+        post_id (int): Post to count
+        uncommitted (int): Change made by `dbs` that has not committed yet
+            (already in likes_count unless write-behind is enabled)
+    """
+    count = counters.get_post_counters(dbs, post_id)['likes_count']
+    if Config.LIKE_WRITE_BEHIND:
+        count += buffer.pending(post_id) + uncommitted
+    return max(count, 0)
+
+
+# Global buffer instance (flushed by a thread app.py starts when LIKE_WRITE_BEHIND is set)
+buffer = LikeCounterBuffer()
+
@@ -0,0 +1,265 @@
+"""
+Background image processing queue
+
+Upload requests only check the image header, save the original file and
+enqueue a row in `media_jobs`; the post/story is served from the original
+until a worker has written the resized variants (images.ingest_file) and
+pointed the row at them with image_status = 'ready'.
+
+The queue lives in MySQL, so no external broker is needed: a dispatcher
+thread claims queued jobs in batches and hands them to a pool of worker
+processes, so decoding and encoding use every core without holding up
+request threads. Several dispatchers (the app and `python media_jobs.py`)
+can share the queue; each claim is tagged with its own token.
+"""
+import multiprocessing
+import os
+import socket
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from cache import bus
+from config import Config
+from database import db
+import images
+import server_sessions  # drops cached /api/user/me profiles on profile_updated
+import user_stats
+
+# Where each target type keeps its image, and whether it has an image_status column
+TARGETS = {
+    'post': ('posts', 'image_url', True),
+    'story': ('stories', 'image_url', True),
+    'profile': ('users', 'profile_pic', False),
+}
+
+
+def enqueue_image(dbs, target_type, target_id, source_path):
+    """
+    Queue the variants of an uploaded original for generation
+
+    Args:
+        dbs: Database or DatabaseSession (use the session that stored the row)
+        target_type (str): 'post', 'story' or 'profile'
+        target_id (int): posts.id, stories.id or users.id
+        source_path (str): Original upload relative to images.IMAGES_DIR
+    """
+    if target_type not in TARGETS:
+        raise ValueError(f"Unknown media target: {target_type}")
+    return dbs.execute_query(
+        "INSERT INTO media_jobs (target_type, target_id, source_path) VALUES (%s, %s, %s)",
+        (target_type, target_id, source_path)
+    )
+
+
+def claim_jobs(dbs, token, limit):
+    """Mark up to `limit` queued jobs as running under `token` and return them"""
+    claimed = dbs.execute_query(
+        """
+        UPDATE media_jobs
+        SET status = 'running', claimed_by = %s, claimed_at = NOW(), attempts = attempts + 1
+        WHERE status = 'queued'
+        ORDER BY id
+        LIMIT %s
+        """,
+        (token, limit)
+    )
+    if not claimed:
+        return []
+    return dbs.execute_query(
+        """
+        SELECT id, target_type, target_id, source_path, attempts
+        FROM media_jobs
+        WHERE status = 'running' AND claimed_by = %s
+        ORDER BY id
+        """,
+        (token,)
+    ) or []
+
+
+def complete_job(job, full_path):
+    """
+    Point every row showing the original at its variants, finish the job and
+    remove the original once no other job still needs it
+
+    Identical uploads share one stored original (media_store.py), so several
+    posts, stories or profile pictures (each with its own job) may show the
+    same path. They are all repointed in one transaction; other queued jobs
+    for the path have nothing left to do and are finished with this one.
+    """
+    source_path = job['source_path']
+    with db.session() as dbs:
+        profile_ids = [row['id'] for row in dbs.execute_query(
+            "SELECT id FROM users WHERE profile_pic = %s",
+            (source_path,)
+        ) or []]
+        # Rows whose image changed again while the job was queued no longer
+        # show the original and are left alone
+        for table, column, has_status in TARGETS.values():
+            status_sql = ", image_status = 'ready'" if has_status else ""
+            dbs.execute_query(
+                f"UPDATE {table} SET {column} = %s{status_sql} WHERE {column} = %s",
+                (full_path, source_path)
+            )
+        dbs.execute_query(
+            """
+            UPDATE media_jobs SET status = 'done', last_error = NULL
+            WHERE id = %s OR (source_path = %s AND status = 'queued')
+            """,
+            (job['id'], source_path)
+        )
+        # A job another dispatcher is running still reads the original; the
+        # last one to finish removes it
+        still_needed = dbs.execute_query(
+            "SELECT 1 FROM media_jobs WHERE source_path = %s AND status = 'running' AND id <> %s LIMIT 1",
+            (source_path, job['id'])
+        )
+        # Cached profiles, feeds and story rings still name the original, which is removed below
+        for user_id in profile_ids:
+            bus.publish_on_commit(
+                dbs, 'profile_updated',
+                user_id=user_id, viewer_ids=user_stats.follower_ids(dbs, user_id)
+            )
+    if still_needed:
+        return
+    try:
+        os.remove(os.path.join(images.IMAGES_DIR, source_path))
+    except OSError:
+        pass
+
+
+def fail_job(job, error):
+    """Requeue a failed job, or give up once it has used all its attempts"""
+    message = str(error)[:500]
+    if job['attempts'] < Config.MEDIA_JOB_MAX_ATTEMPTS:
+        db.execute_query(
+            "UPDATE media_jobs SET status = 'queued', claimed_by = NULL, last_error = %s WHERE id = %s",
+            (message, job['id'])
+        )
+        return
+    table, column, has_status = TARGETS[job['target_type']]
+    with db.session() as dbs:
+        dbs.execute_query(
+            "UPDATE media_jobs SET status = 'failed', last_error = %s WHERE id = %s",
+            (message, job['id'])
+        )
+        if has_status:
+            # The original stays in place and keeps being served
+            dbs.execute_query(
+                f"UPDATE {table} SET image_status = 'failed' WHERE id = %s AND {column} = %s",
+                (job['target_id'], job['source_path'])
+            )
+
+
+def requeue_stale_jobs(dbs=db, stale_seconds=None):
+    """Release jobs whose dispatcher died mid-run (failing those out of attempts)"""
+    stale_seconds = Config.MEDIA_JOB_STALE_SECONDS if stale_seconds is None else stale_seconds
+    return dbs.execute_query(
+        """
+        UPDATE media_jobs
+        SET status = IF(attempts >= %s, 'failed', 'queued'), claimed_by = NULL
+        WHERE status = 'running' AND claimed_at < NOW() - INTERVAL %s SECOND
+        """,
+        (Config.MEDIA_JOB_MAX_ATTEMPTS, stale_seconds)
+    )
+
+
+class MediaWorker:
+    """Dispatcher thread feeding claimed media jobs to a process pool"""
+
+    def __init__(self, processes=None, poll_interval=None):
+        self.processes = processes or Config.MEDIA_WORKER_PROCESSES
+        self.poll_interval = Config.MEDIA_JOB_POLL_SECONDS if poll_interval is None else poll_interval
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._inflight = 0
+        self._executor = None
+        self._thread = None
+
+    def start(self):
+        """Start the process pool and the dispatcher thread (no-op if running)"""
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        # spawn: children import only images/config, never the pool or its threads
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+        self._thread = threading.Thread(target=self._run, name='media-dispatcher', daemon=True)
+        self._thread.start()
+
+    def stop(self, wait=True):
+        """Stop claiming jobs; with `wait`, let running jobs finish first"""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._wake.set()
+        self._thread.join()
+        self._executor.shutdown(wait=wait)
+        self._thread = None
+        self._executor = None
+
+    def notify(self):
+        """Wake the dispatcher now instead of at the next poll (call after enqueueing)"""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wake.clear()
+            try:
+                requeue_stale_jobs()
+                claimed = self._dispatch()
+            except Exception as e:
+                print(f"Error dispatching media jobs: {e}")
+                claimed = 0
+            if not claimed:
+                self._wake.wait(self.poll_interval)
+
+    def _dispatch(self):
+        with self._lock:
+            capacity = self.processes * 2 - self._inflight
+        if capacity <= 0:
+            return 0
+        jobs = claim_jobs(db, f"{self.name}:{uuid.uuid4().hex[:12]}", capacity)
+        for job in jobs:
+            with self._lock:
+                self._inflight += 1
+            future = self._executor.submit(images.ingest_file, job['source_path'])
+            future.add_done_callback(lambda f, job=job: self._finish(job, f))
+        return len(jobs)
+
+    def _finish(self, job, future):
+        try:
+            try:
+                complete_job(job, future.result())
+            except Exception as e:
+                print(f"Media job {job['id']} failed: {e}")
+                fail_job(job, e)
+        except Exception as e:
+            print(f"Error recording media job {job['id']}: {e}")
+        finally:
+            with self._lock:
+                self._inflight -= 1
+            self._wake.set()
+
+
+# Global worker instance (started by app.py or by running this module)
+worker = MediaWorker()
+
+
+if __name__ == "__main__":
+    import time
+
+    db.connect()
+    print(f"Processing media jobs with {worker.processes} processes (Ctrl+C to stop)...")
+    worker.start()
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        print("Stopping, waiting for running jobs...")
+        worker.stop()
+        db.disconnect()
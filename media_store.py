@@ -0,0 +1,317 @@
+"""
+Content-addressed media store
+
+Uploaded images are stored once per distinct content under
+assets/images/media/<aa>/<sha256><ext>, where <aa> is the first two hex
+digits of the hash. The `media` table keeps one row per stored content with
+a reference count: every posts/stories/users row that points at a blob holds
+one reference. Identical uploads (reposts, the same picture used as a post
+and a story) share the file and, once processed, its WebP variants
+(<sha256>_<variant>.webp next to the original).
+
+A stored path never changes content, so it can be cached forever. Blobs
+whose reference count drops to zero are removed by collect_garbage() rather
+than inline, after a grace period. The `media` row lock keeps uploads and the
+collector apart: store_file() takes its reference with a conditional UPDATE
+(which waits for a collector deleting that row), and collect_garbage() deletes
+the row and unlinks its files in one transaction. An upload therefore either
+holds a reference before the row is deleted, or finds the row gone and stores
+its own copy. The MediaCollector thread started by app.py runs the collector
+every Config.MEDIA_GC_INTERVAL seconds; `python media_store.py` also recounts
+references first.
+"""
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+
+from config import Config
+from database import db
+import images
+
+MEDIA_FOLDER = 'media'
+TMP_FOLDER = 'tmp'
+
+_MEDIA_PATH = re.compile(r'^media/[0-9a-f]{2}/(?P<digest>[0-9a-f]{64})')
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+def blob_path(digest, ext):
+    """Stored path (relative to images.IMAGES_DIR) of the blob for `digest`"""
+    return f"{MEDIA_FOLDER}/{digest[:2]}/{digest}{ext}"
+
+
+def digest_of(path):
+    """Return the content hash named by a stored media path, or None for other paths"""
+    match = _MEDIA_PATH.match(str(path or '').replace('\\', '/'))
+    return match.group('digest') if match else None
+
+
+def is_media_path(path):
+    """True if `path` points into the content-addressed store (immutable content)"""
+    return digest_of(path) is not None
+
+
+def store_file(dbs, source, filename):
+    """
+    Store an upload by content hash and take a reference to it
+
+    Known content is referenced with a conditional UPDATE, whose row lock
+    holds off collect_garbage until the session ends. If the row is gone
+    (collected meanwhile, or never stored) the upload is stored as new content.
+    New content stays in a temp file until the session commits, so a request
+    that rolls back leaves no blob without a `media` row (temp files it leaves
+    behind are removed by collect_garbage). Store the file before registering
+    any on_commit callback that reads it, such as waking the media worker.
+
+    Args:
+        dbs: DatabaseSession that writes the referencing row (on_commit is used)
+        source: Path or binary file object to copy from
+        filename (str): Original file name, used only for the extension of new blobs
+
+    Returns:
+        str: Stored path. This names the full WebP variant when the same content
+            was already processed (see images.variant_paths), otherwise the original.
+    """
+    tmp_dir = os.path.join(images.IMAGES_DIR, MEDIA_FOLDER, TMP_FOLDER)
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    # Hash while copying to a temp file so the upload is read only once
+    hasher = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    keep_tmp = False
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            if isinstance(source, (str, os.PathLike)):
+                with open(source, 'rb') as src:
+                    size = _copy_hashing(src, out, hasher)
+            else:
+                size = _copy_hashing(source, out, hasher)
+        digest = hasher.hexdigest()
+
+        # Content seen before keeps the path (and extension) it was first stored under
+        taken = dbs.execute_query("UPDATE media SET ref_count = ref_count + 1 WHERE sha256 = %s", (digest,))
+        if taken:
+            original = dbs.execute_query("SELECT path FROM media WHERE sha256 = %s", (digest,))[0]['path']
+        else:
+            ext = os.path.splitext(filename or '')[1].lower() or '.bin'
+            original = blob_path(digest, ext)
+            # A concurrent first upload of the same content may have inserted the row
+            dbs.execute_query(
+                """
+                INSERT INTO media (sha256, path, size_bytes, ref_count) VALUES (%s, %s, %s, 1)
+                ON DUPLICATE KEY UPDATE ref_count = ref_count + 1
+                """,
+                (digest, original, size)
+            )
+
+        processed = f"{os.path.splitext(original)[0]}_full.webp"
+        if os.path.exists(os.path.join(images.IMAGES_DIR, processed)):
+            path = processed
+        else:
+            path = original
+            final_path = os.path.join(images.IMAGES_DIR, original)
+            if not os.path.exists(final_path):
+                keep_tmp = True
+                dbs.on_commit(lambda: _promote(tmp_path, final_path))
+    finally:
+        if not keep_tmp and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
+
+
+def _promote(tmp_path, final_path):
+    """Move a committed upload into place (a concurrent identical upload may have won)"""
+    if os.path.exists(final_path):
+        os.remove(tmp_path)
+        return
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    os.replace(tmp_path, final_path)
+
+
+def _copy_hashing(src, out, hasher):
+    size = 0
+    while True:
+        chunk = src.read(_CHUNK_SIZE)
+        if not chunk:
+            return size
+        hasher.update(chunk)
+        out.write(chunk)
+        size += len(chunk)
+
+
+def add_ref(dbs, path):
+    """Take another reference to an already stored path (no-op for non-media paths)"""
+    digest = digest_of(path)
+    if digest is None:
+        return 0
+    return dbs.execute_query("UPDATE media SET ref_count = ref_count + 1 WHERE sha256 = %s", (digest,))
+
+
+def release(dbs, path):
+    """Drop one reference to a stored path (no-op for non-media paths)"""
+    digest = digest_of(path)
+    if digest is None:
+        return 0
+    return dbs.execute_query(
+        "UPDATE media SET ref_count = GREATEST(CAST(ref_count AS SIGNED) - 1, 0) WHERE sha256 = %s",
+        (digest,)
+    )
+
+
+def release_many(dbs, paths):
+    """
+    Drop one reference per entry in `paths` (non-media paths are skipped)
+
+    Returns:
+        int: Media rows updated
+    """
+    counts = {}
+    for path in paths:
+        digest = digest_of(path)
+        if digest is not None:
+            counts[digest] = counts.get(digest, 0) + 1
+    if not counts:
+        return 0
+    return dbs.execute_many(
+        "UPDATE media SET ref_count = GREATEST(CAST(ref_count AS SIGNED) - %s, 0) WHERE sha256 = %s",
+        [(count, digest) for digest, count in counts.items()]
+    )
+
+
+def reconcile_media_refs(dbs=db):
+    """
+    Recount references from posts, stories and users (repairs drift, e.g. cascaded deletes)
+
+    Returns:
+        int: Media rows whose ref_count changed
+    """
+    return dbs.execute_query(
+        """
+        UPDATE media m
+        LEFT JOIN (
+            SELECT SUBSTRING(image_url, 10, 64) AS sha256, COUNT(*) AS c
+            FROM (
+                SELECT image_url FROM posts WHERE image_url LIKE 'media/%'
+                UNION ALL
+                SELECT image_url FROM stories WHERE image_url LIKE 'media/%'
+                UNION ALL
+                SELECT profile_pic FROM users WHERE profile_pic LIKE 'media/%'
+            ) refs
+            GROUP BY SUBSTRING(image_url, 10, 64)
+        ) r ON r.sha256 = m.sha256
+        SET m.ref_count = COALESCE(r.c, 0)
+        WHERE m.ref_count <> COALESCE(r.c, 0)
+        """
+    )
+
+
+def collect_garbage(dbs=db, grace_seconds=None):
+    """
+    Delete blobs and variants that nothing has referenced for `grace_seconds`,
+    and temp files left by uploads whose transaction rolled back
+
+    Each row is deleted and its files unlinked in one transaction, so an
+    upload's reference UPDATE on that row waits until the files are gone and
+    then stores the content again.
+
+    Args:
+        dbs: Database (each blob is removed in its own session)
+        grace_seconds (int): Minimum time without references (Config.MEDIA_GC_GRACE_SECONDS)
+
+    Returns:
+        int: Number of blobs removed
+    """
+    grace_seconds = Config.MEDIA_GC_GRACE_SECONDS if grace_seconds is None else grace_seconds
+    rows = dbs.execute_query(
+        """
+        SELECT sha256, path FROM media
+        WHERE ref_count = 0 AND updated_at < NOW() - INTERVAL %s SECOND
+        """,
+        (grace_seconds,)
+    ) or []
+    removed = 0
+    for row in rows:
+        with dbs.session() as session:
+            # Re-check under the delete so a reference taken meanwhile keeps the blob
+            deleted = session.execute_query(
+                "DELETE FROM media WHERE sha256 = %s AND ref_count = 0",
+                (row['sha256'],)
+            )
+            if not deleted:
+                continue
+            # Unlink while the deleted row is still locked, before uploads can see it gone
+            stem = os.path.splitext(row['path'])[0]
+            candidates = [row['path']] + [f"{stem}_{name}.webp" for name in images.VARIANTS]
+            for candidate in candidates:
+                try:
+                    os.remove(os.path.join(images.IMAGES_DIR, candidate))
+                except OSError:
+                    pass
+        removed += 1
+    _remove_stale_temp_files(grace_seconds)
+    return removed
+
+
+def _remove_stale_temp_files(grace_seconds):
+    tmp_dir = os.path.join(images.IMAGES_DIR, MEDIA_FOLDER, TMP_FOLDER)
+    cutoff = time.time() - grace_seconds
+    try:
+        entries = list(os.scandir(tmp_dir))
+    except OSError:
+        return
+    for entry in entries:
+        try:
+            if entry.is_file() and entry.stat().st_mtime <= cutoff:
+                os.remove(entry.path)
+        except OSError:
+            pass
+
+
+class MediaCollector:
+    """Background thread running collect_garbage periodically"""
+
+    def __init__(self, interval=None):
+        self.interval = interval or Config.MEDIA_GC_INTERVAL
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the collector thread (no-op if running)"""
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name='media-collector', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the collector thread"""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            try:
+                collect_garbage()
+            except Exception as e:
+                print(f"Error collecting unreferenced media: {e}")
+
+
+# Global collector instance (started by app.py)
+collector = MediaCollector()
+
+
+if __name__ == "__main__":
+    print("Reconciling media reference counts...")
+    count = reconcile_media_refs()
+    print(f"Corrected {count} media rows")
+    print("Removing unreferenced media...")
+    count = collect_garbage()
+    print(f"Removed {count} blobs")
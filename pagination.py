@@ -0,0 +1,114 @@
+"""
+Keyset (cursor) pagination helpers
+
+List endpoints page by the sort key of the last row they returned instead of
+LIMIT/OFFSET, so every page costs an index seek plus `limit` rows no matter
+how deep the client has scrolled. The sort key is handed to the client as an
+opaque `next_cursor` string and sent back as `?cursor=`.
+"""
+import base64
+import json
+from datetime import datetime
+
+
+class CursorError(ValueError):
+    """Raised when a client sends a malformed or tampered cursor"""
+    pass
+
+
+def encode_cursor(*values):
+    """
+    Encode the sort-key values of a row into an opaque cursor string
+
+    Args:
+        *values: Sort-key values (datetimes, ints, strings)
+
+    Returns:
+        str: URL-safe cursor
+    """
+    payload = [{'dt': v.isoformat()} if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    """
+    Decode a cursor produced by encode_cursor()
+
+    Args:
+        cursor (str): Cursor from the client, or None/empty for the first page
+        size (int): Number of sort-key values the caller expects
+
+    Returns:
+        tuple: Sort-key values, or None when no cursor was given
+
+    Raises:
+        CursorError: If the cursor cannot be decoded or has the wrong shape
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        values = tuple(
+            datetime.fromisoformat(v['dt']) if isinstance(v, dict) else v
+            for v in payload
+        )
+    except Exception:
+        raise CursorError("Invalid cursor")
+    if len(values) != size or any(isinstance(v, (dict, list)) for v in values):
+        raise CursorError("Invalid cursor")
+    return values
+
+
+def keyset_condition(columns, values):
+    """
+    Build the WHERE condition selecting rows after `values` in sort order
+
+    Args:
+        columns (list): (column_sql, 'asc' | 'desc') pairs, in ORDER BY order
+        values (tuple): Sort-key values of the last row already returned
+
+    Returns:
+        tuple: (sql, params) e.g. for [('p.created_at', 'desc'), ('p.id', 'desc')]:
+            "(p.created_at < %s OR (p.created_at = %s AND p.id < %s))"
+    """
+    clauses = []
+    params = []
+    for i, (column, direction) in enumerate(columns):
+        parts = []
+        for prev_column, _ in columns[:i]:
+            parts.append(f"{prev_column} = %s")
+        op = '<' if direction.lower() == 'desc' else '>'
+        parts.append(f"{column} {op} %s")
+        clauses.append(parts[0] if len(parts) == 1 else f"({' AND '.join(parts)})")
+        params.extend(values[:i])
+        params.append(values[i])
+    return f"({' OR '.join(clauses)})", params
+
+
+def parse_limit(value, default, maximum):
+    """Parse a client `limit` parameter, clamped to 1..maximum"""
+    try:
+        limit = int(value) if value not in (None, '') else default
+    except (TypeError, ValueError):
+        limit = default
+    return max(1, min(limit, maximum))
+
+
+def paginate(rows, limit, key):
+    """
+    Trim a result fetched with LIMIT limit + 1 and compute the next cursor
+
+    Args:
+        rows (list): Rows in sort order, up to limit + 1 of them
+        limit (int): Page size requested by the client
+        key (callable): Returns the sort-key tuple of a row
+
+    Returns:
+        tuple: (rows for this page, next_cursor or None on the last page)
+    """
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    return page, encode_cursor(*key(page[-1]))
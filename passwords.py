@@ -0,0 +1,160 @@
+"""
+Password hashing off the request threads
+
+bcrypt is deliberately slow (~250 ms per hash at cost 12), so signups and
+logins run it in a pool of worker processes instead of the Flask thread that
+received the request. The pool is bounded: at most Config.BCRYPT_MAX_PENDING
+hashes may be queued or running, and a request that cannot get a slot within
+Config.BCRYPT_QUEUE_TIMEOUT seconds gets HasherBusy (served as 503) rather
+than tying up a thread that feed requests need.
+
+If a worker dies (killed for memory, for example), the pool is broken for
+good. The hasher then replaces it and retries the operation once. If that
+fails too, it raises HasherBusy, so the request gets a 503 rather than a
+failure that looks like a wrong password.
+
+The work factor comes from Config.BCRYPT_ROUNDS. Hashes made with another
+cost are upgraded transparently on the next successful login (see
+needs_rehash and auth.authenticate_user).
+"""
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import bcrypt
+
+from config import Config
+
+
+class HasherBusy(Exception):
+    """Raised when the hashing pool is saturated or its workers keep dying"""
+    pass
+
+
+def _hashpw(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds))
+
+
+def _checkpw(password, password_hash):
+    return bcrypt.checkpw(password, password_hash)
+
+
+class PasswordHasher:
+    """Bounded process pool running bcrypt, with queue-depth statistics"""
+
+    def __init__(self, workers=None, max_pending=None, queue_timeout=None):
+        self.workers = Config.BCRYPT_WORKERS if workers is None else workers
+        self.max_pending = max_pending or Config.BCRYPT_MAX_PENDING
+        self.queue_timeout = Config.BCRYPT_QUEUE_TIMEOUT if queue_timeout is None else queue_timeout
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._stats = {
+            'pending': 0,
+            'pending_max': 0,
+            'completed': 0,
+            'rejected': 0,
+            'pool_restarts': 0,
+            'wait_time_total': 0.0,
+            'run_time_total': 0.0,
+        }
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # spawn: workers import only bcrypt, not the app, the pool or its threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+
+    def _discard_executor(self, executor):
+        """Drop a broken pool so the next call starts a fresh one"""
+        with self._lock:
+            if self._executor is not executor:
+                return  # another thread already replaced it
+            self._executor = None
+            self._stats['pool_restarts'] += 1
+        executor.shutdown(wait=False)
+
+    def _submit(self, fn, *args):
+        for attempt in range(2):
+            executor = self._get_executor()
+            try:
+                return executor.submit(fn, *args).result()
+            except BrokenProcessPool as e:
+                print(f"Password hashing pool broke, restarting it: {e}")
+                self._discard_executor(executor)
+        raise HasherBusy("Password hashing workers are unavailable")
+
+    def _run(self, fn, *args):
+        start = time.monotonic()
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self._stats['rejected'] += 1
+            raise HasherBusy("Too many password operations in progress")
+        try:
+            with self._lock:
+                self._stats['pending'] += 1
+                self._stats['pending_max'] = max(self._stats['pending_max'], self._stats['pending'])
+                self._stats['wait_time_total'] += time.monotonic() - start
+            run_start = time.monotonic()
+            if self.workers:
+                result = self._submit(fn, *args)
+            else:
+                result = fn(*args)  # BCRYPT_WORKERS=0: hash inline (scripts, tests)
+            with self._lock:
+                self._stats['completed'] += 1
+                self._stats['run_time_total'] += time.monotonic() - run_start
+            return result
+        finally:
+            with self._lock:
+                self._stats['pending'] -= 1
+            self._slots.release()
+
+    def hash(self, password, rounds=None):
+        """Return the bcrypt hash of `password` (str) as a str"""
+        rounds = Config.BCRYPT_ROUNDS if rounds is None else rounds
+        return self._run(_hashpw, password.encode('utf-8'), rounds).decode('utf-8')
+
+    def verify(self, password, password_hash):
+        """Return True if `password` matches `password_hash`"""
+        return self._run(_checkpw, password.encode('utf-8'), password_hash.encode('utf-8'))
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def stats(self):
+        """Return queue depth and timing counters"""
+        with self._lock:
+            snapshot = dict(self._stats)
+        snapshot['workers'] = self.workers
+        snapshot['max_pending'] = self.max_pending
+        completed = snapshot['completed'] or 1
+        snapshot['avg_wait_ms'] = round(snapshot.pop('wait_time_total') / completed * 1000, 2)
+        snapshot['avg_run_ms'] = round(snapshot.pop('run_time_total') / completed * 1000, 2)
+        return snapshot
+
+
+def hash_rounds(password_hash):
+    """Return the cost factor stored in a bcrypt hash ($2b$<cost>$...), or None"""
+    parts = (password_hash or '').split('$')
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+
+def needs_rehash(password_hash):
+    """True if the hash was made with a different cost than Config.BCRYPT_ROUNDS"""
+    return hash_rounds(password_hash) != Config.BCRYPT_ROUNDS
+
+
+# Global hasher instance
+hasher = PasswordHasher()
@@ -5,12 +5,17 @@ Populates the Instagram Clone database with users, posts, stories, likes, commen
 """
 import os
 import random
-import shutil
 from datetime import datetime, timedelta
 from pathlib import Path
 from config import Config
 from database import db
-from auth import create_user, hash_password
+from auth import create_users as auth_create_users, hash_password
+from timeline import rebuild_all_timelines
+from counters import reconcile_post_counters
+from user_stats import reconcile_user_stats
+from inbox import rebuild_inbox
+from recommendations import compute_recommendations
+from media_store import store_file
 
 # Test users to save
 test_users = []
@@ -201,18 +206,11 @@ def generate_comment():
     ]
     return random.choice(comments)
 
-def copy_image_to_assets(source_path, destination_folder, subfolder, new_filename):
-    """Copy image to assets folder in organized subfolders"""
+def copy_image_to_assets(source_path):
+    """Store image in the content-addressed media store (once per distinct content) and return its path"""
     try:
-        # Create organized folder structure: assets/images/posts/, assets/images/profiles/, etc.
-        full_destination = os.path.join(destination_folder, subfolder)
-        os.makedirs(full_destination, exist_ok=True)
-        
-        dest_path = os.path.join(full_destination, new_filename)
-        shutil.copy2(source_path, dest_path)
-        
-        # Return relative path from assets/images/
-        return os.path.join(subfolder, new_filename)
+        with db.session() as session:
+            return store_file(session, source_path, os.path.basename(source_path))
     except Exception as e:
         print(f"Error copying image: {e}")
         return None
@@ -239,28 +237,21 @@ def create_users():
         {"username": "desert_nomad", "email": "desert@example.com", "full_name": "Oliver Desert", "bio": "Desert wanderer 🏜️"},
     ]
     
-    created_users = []
+    # Use a simple password for all users (you can change this)
+    password = "Test1234!"
+    users, errors = auth_create_users([dict(user_data, password=password) for user_data in users_data])
     
-    for user_data in users_data:
-        try:
-            # Use a simple password for all users (you can change this)
-            password = "Test1234!"
-            user = create_user(
-                username=user_data["username"],
-                email=user_data["email"],
-                password=password,
-                full_name=user_data["full_name"],
-                bio=user_data["bio"]
-            )
-            created_users.append({
-                "id": user["id"],
-                "username": user["username"],
-                "email": user["email"],
-                "password": password
-            })
-            print(f"Created user: {user_data['username']}")
-        except Exception as e:
-            print(f"Error creating user {user_data['username']}: {e}")
+    created_users = []
+    for user in users:
+        created_users.append({
+            "id": user["id"],
+            "username": user["username"],
+            "email": user["email"],
+            "password": password
+        })
+        print(f"Created user: {user['username']}")
+    for username, error in errors:
+        print(f"Error creating user {username}: {error}")
     
     # Save first 3 as test users
     if len(created_users) >= 3:
@@ -286,15 +277,7 @@ def assign_profile_pictures(users, profile_pics_folder):
     for i, user in enumerate(users):
         if i < len(profile_pics):
             pic_path = profile_pics[i]
-            filename = f"profile_{user['id']}_{os.path.basename(pic_path)}"
-            
-            # Copy to assets/images/profiles/
-            copied = copy_image_to_assets(
-                pic_path,
-                "assets/images",
-                "profiles",
-                filename
-            )
+            copied = copy_image_to_assets(pic_path)
             
             if copied:
                 # Update user profile picture
@@ -339,14 +322,7 @@ def create_posts(users, images_folder):
             print(f"Processing image {i+1}/{max_posts}: {os.path.basename(image_path)}")
             caption, hashtag_list = generate_caption_and_hashtags(image_path)
             
-            # Copy image to assets/images/posts/
-            filename = f"post_{user['id']}_{posts_created + 1}_{os.path.basename(image_path)}"
-            copied = copy_image_to_assets(
-                image_path,
-                "assets/images",
-                "posts",
-                filename
-            )
+            copied = copy_image_to_assets(image_path)
             
             if not copied:
                 continue
@@ -473,14 +449,7 @@ def create_stories(users, images_folder):
         try:
             user = random.choice(users)
             
-            # Copy image to assets/images/stories/
-            filename = f"story_{user['id']}_{stories_created + 1}_{os.path.basename(image_path)}"
-            copied = copy_image_to_assets(
-                image_path,
-                "assets/images",
-                "stories",
-                filename
-            )
+            copied = copy_image_to_assets(image_path)
             
             if not copied:
                 continue
@@ -767,6 +736,12 @@ def clear_database():
     try:
         # Clear in order to respect foreign key constraints
         tables_to_clear = [
+            'user_recommendations',
+            'timeline_entries',
+            'post_counter_shards',
+            'user_stats',
+            'media_jobs',
+            'media',
             'messages',
             'conversation_members',
             'conversations',
@@ -875,7 +850,19 @@ def main():
         # Step 8: Create conversations and messages (DMs)
         create_conversations_and_messages(users)
         
-        # Step 9: Save test users
+        # Step 9: Build home timelines and sync denormalized counters with the generated rows
+        print("Building home timelines...")
+        rebuild_all_timelines(db)
+        print("Reconciling post counters...")
+        reconcile_post_counters(db)
+        print("Computing user stats...")
+        reconcile_user_stats(db)
+        print("Building inbox pointers...")
+        rebuild_inbox(db)
+        print("Computing people-you-may-know candidates...")
+        compute_recommendations(db)
+        
+        # Step 10: Save test users
         save_test_users()
         
         print("\n" + "=" * 60)
@@ -0,0 +1,103 @@
+"""
+In-process publish/subscribe broker
+
+Used to push new direct messages to open Server-Sent Events streams instead
+of having every open chat poll the database. Subscribers get a bounded
+queue; a subscriber that falls too far behind is marked as overflowed and its
+stream is closed, and the client reconnects with the last event id it saw to
+fetch the gap from the database.
+
+The broker lives in process memory, so publishers and subscribers must be
+served by the same process (the threaded Flask server in app.py).
+"""
+import queue
+import threading
+
+
+class Subscription:
+    """A subscriber's view of one topic"""
+
+    def __init__(self, broker, topic, maxsize):
+        self._broker = broker
+        self.topic = topic
+        self._queue = queue.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def _deliver(self, message):
+        try:
+            self._queue.put_nowait(message)
+            return True
+        except queue.Full:
+            self.overflowed = True
+            return False
+
+    def get(self, timeout=None):
+        """Wait up to `timeout` seconds for the next message; returns None on timeout"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        """Stop receiving messages"""
+        self._broker.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class Broker:
+    """Thread-safe topic broker fanning messages out to subscription queues"""
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._topics = {}
+        self._stats = {'published': 0, 'delivered': 0, 'dropped': 0}
+
+    def subscribe(self, topic):
+        """Start receiving messages published to `topic`"""
+        subscription = Subscription(self, topic, self.queue_size)
+        with self._lock:
+            self._topics.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Stop delivering to `subscription`"""
+        with self._lock:
+            subscribers = self._topics.get(subscription.topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._topics[subscription.topic]
+
+    def publish(self, topic, message):
+        """
+        Deliver `message` to every current subscriber of `topic`
+
+        Returns:
+            int: Number of subscribers that received it
+        """
+        with self._lock:
+            subscribers = list(self._topics.get(topic, ()))
+        delivered = sum(1 for s in subscribers if s._deliver(message))
+        with self._lock:
+            self._stats['published'] += 1
+            self._stats['delivered'] += delivered
+            self._stats['dropped'] += len(subscribers) - delivered
+        return delivered
+
+    def stats(self):
+        """Return delivery counters and the number of open subscriptions"""
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot['topics'] = len(self._topics)
+            snapshot['subscriptions'] = sum(len(s) for s in self._topics.values())
+        return snapshot
+
+
+# Global broker instance
+broker = Broker()
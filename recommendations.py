@@ -0,0 +1,344 @@
+"""
+People you may know: friend-of-friend candidates computed in a batch job
+
+compute_recommendations() reads the whole `follows` graph once, scores every
+account two hops away from each user by its number of mutual connections
+(accounts the user follows that follow it) and stores the best
+Config.RECOMMENDATION_TOP_K per user in `user_recommendations`, ranked by
+mutual count, then follower count, then id. Accounts the user already
+follows, and the user themselves, are never candidates.
+
+The graph is held as CSR adjacency arrays (edges sorted by follower, with an
+offset per user). With numpy installed, a block of users is scored at once:
+the second hop is expanded with array indexing and mutual counts come from
+one np.unique over (user, candidate) keys. Without numpy the same ranking is
+computed with a Counter per user, which is fine for small installs.
+
+/api/people-you-may-know serves the stored rows by position (an index seek
+per page) and filters out accounts followed since the last run. Users with
+no stored candidates get the most-followed accounts instead. Run
+`python recommendations.py` from cron, or set RECOMMENDATION_REFRESH_IN_APP.
+"""
+import heapq
+import threading
+import time
+from array import array
+from collections import Counter
+
+from config import Config
+from database import db
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class FollowGraph:
+    """The follows table as CSR adjacency over dense user indices"""
+
+    def __init__(self, user_ids, sources, targets):
+        """
+        Args:
+            user_ids (list): Every user id, ascending (index -> id)
+            sources (array): Follower index of each edge, ascending
+            targets (array): Followed index of each edge
+        """
+        self.user_ids = user_ids
+        n = len(user_ids)
+        self.targets = targets
+        self.offsets = array('q', [0] * (n + 1))
+        for source in sources:
+            self.offsets[source + 1] += 1
+        for i in range(n):
+            self.offsets[i + 1] += self.offsets[i]
+        self.followers = array('q', [0] * n)
+        for target in targets:
+            self.followers[target] += 1
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def following(self, index):
+        """Indices of the accounts user `index` follows, ascending"""
+        return self.targets[self.offsets[index]:self.offsets[index + 1]]
+
+
+def load_follow_graph(dbs=db, batch_size=50000):
+    """
+    Read users and follows into a FollowGraph
+
+    Follows are read in keyset pages over the primary key, so no single
+    result set holds the whole table, and edges arrive sorted by follower.
+
+    Args:
+        dbs: Database or DatabaseSession
+        batch_size (int): Follows rows per query
+
+    Returns:
+        FollowGraph
+    """
+    user_ids = [row['id'] for row in dbs.execute_query("SELECT id FROM users ORDER BY id") or []]
+    index = {user_id: i for i, user_id in enumerate(user_ids)}
+    sources = array('q')
+    targets = array('q')
+    after = (0, 0)
+    while True:
+        rows = dbs.execute_query(
+            """
+            SELECT follower_id, following_id FROM follows
+            WHERE (follower_id, following_id) > (%s, %s)
+            ORDER BY follower_id, following_id
+            LIMIT %s
+            """,
+            (after[0], after[1], batch_size)
+        ) or []
+        for row in rows:
+            source = index.get(row['follower_id'])
+            target = index.get(row['following_id'])
+            # Users created after the id list was read are picked up next run
+            if source is not None and target is not None:
+                sources.append(source)
+                targets.append(target)
+        if len(rows) < batch_size:
+            return FollowGraph(user_ids, sources, targets)
+        after = (rows[-1]['follower_id'], rows[-1]['following_id'])
+
+
+def _blocks(graph, max_users, max_pairs, hop_sizes):
+    """Split user indices into [lo, hi) ranges of bounded size and second-hop work"""
+    lo = 0
+    n = len(graph)
+    while lo < n:
+        hi = lo
+        pairs = 0
+        while hi < n and hi - lo < max_users and (hi == lo or pairs + hop_sizes[hi] <= max_pairs):
+            pairs += hop_sizes[hi]
+            hi += 1
+        yield lo, hi
+        lo = hi
+
+
+def _score_python(graph, lo, hi, top_k):
+    """Ranked (user index, candidate index, mutual count) rows for users lo..hi-1"""
+    rows = []
+    for u in range(lo, hi):
+        following = graph.following(u)
+        if not len(following):
+            continue
+        mutuals = Counter()
+        for f in following:
+            mutuals.update(graph.following(f))
+        excluded = set(following)
+        excluded.add(u)
+        best = heapq.nsmallest(
+            top_k,
+            ((c, count) for c, count in mutuals.items() if c not in excluded),
+            key=lambda item: (-item[1], -graph.followers[item[0]], item[0])
+        )
+        rows.extend((u, c, count) for c, count in best)
+    return rows
+
+
+def _score_numpy(arrays, lo, hi, top_k):
+    """Vectorized _score_python over the CSR arrays in `arrays`"""
+    offsets, targets, followers, out_degree = arrays
+    n = len(followers)
+    start, end = offsets[lo], offsets[hi]
+    if start == end:
+        return []
+
+    # First hop: the block's edges are contiguous in CSR order
+    hop_users = np.repeat(np.arange(lo, hi, dtype=np.int64), out_degree[lo:hi])
+    hop_friends = targets[start:end]
+
+    # Second hop: expand every friend's own following list
+    lengths = out_degree[hop_friends]
+    total = int(lengths.sum())
+    if total == 0:
+        return []
+    owners = np.repeat(hop_users, lengths)
+    firsts = np.repeat(offsets[hop_friends] - (np.cumsum(lengths) - lengths), lengths)
+    candidates = targets[firsts + np.arange(total, dtype=np.int64)]
+
+    keys = owners * n + candidates
+    keep = (owners != candidates) & ~np.isin(keys, hop_users * n + hop_friends)
+    keys, mutual = np.unique(keys[keep], return_counts=True)
+    owners, candidates = keys // n, keys % n
+
+    # Rank within each user: mutual count desc, followers desc, id asc
+    order = np.lexsort((candidates, -followers[candidates], -mutual, owners))
+    owners, candidates, mutual = owners[order], candidates[order], mutual[order]
+    position = np.arange(len(owners)) - np.searchsorted(owners, owners, side='left')
+    top = position < top_k
+    return list(zip(owners[top].tolist(), candidates[top].tolist(), mutual[top].tolist()))
+
+
+def compute_recommendations(dbs=db, top_k=None):
+    """
+    Recompute and store the top candidates of every user
+
+    Each block of users is replaced in its own transaction, so the endpoint
+    sees either a user's old list or their new one.
+
+    Args:
+        dbs: Database (each block runs in its own session)
+        top_k (int, optional): Candidates kept per user (defaults to Config.RECOMMENDATION_TOP_K)
+
+    Returns:
+        dict: users, edges, rows written, engine ('numpy' or 'python') and seconds taken
+    """
+    top_k = top_k or Config.RECOMMENDATION_TOP_K
+    started = time.monotonic()
+    graph = load_follow_graph(dbs)
+
+    out_degree = [graph.offsets[i + 1] - graph.offsets[i] for i in range(len(graph))]
+    if np is not None:
+        arrays = (
+            np.frombuffer(graph.offsets, dtype=np.int64),
+            np.frombuffer(graph.targets, dtype=np.int64),
+            np.frombuffer(graph.followers, dtype=np.int64),
+            np.array(out_degree, dtype=np.int64),
+        )
+        hop_sizes = np.bincount(
+            np.repeat(np.arange(len(graph), dtype=np.int64), arrays[3]),
+            weights=arrays[3][arrays[1]],
+            minlength=len(graph)
+        ).astype(np.int64).tolist()
+    else:
+        hop_sizes = [sum(out_degree[f] for f in graph.following(u)) for u in range(len(graph))]
+
+    written = 0
+    for lo, hi in _blocks(graph, Config.RECOMMENDATION_BLOCK_USERS, Config.RECOMMENDATION_BLOCK_PAIRS, hop_sizes):
+        if np is not None:
+            scored = _score_numpy(arrays, lo, hi, top_k)
+        else:
+            scored = _score_python(graph, lo, hi, top_k)
+
+        rows = []
+        position = 0
+        previous = None
+        for u, c, mutual in scored:
+            position = position + 1 if u == previous else 0
+            previous = u
+            rows.append((graph.user_ids[u], position, graph.user_ids[c], int(mutual)))
+
+        block_ids = graph.user_ids[lo:hi]
+        with dbs.session() as session:
+            placeholders = ','.join(['%s'] * len(block_ids))
+            session.execute_query(
+                f"DELETE FROM user_recommendations WHERE user_id IN ({placeholders})",
+                tuple(block_ids)
+            )
+            if rows:
+                session.execute_many(
+                    """
+                    INSERT INTO user_recommendations (user_id, position, candidate_id, mutual_count)
+                    VALUES (%s, %s, %s, %s)
+                    """,
+                    rows
+                )
+        written += len(rows)
+
+    return {
+        'users': len(graph),
+        'edges': len(graph.targets),
+        'rows': written,
+        'engine': 'numpy' if np is not None else 'python',
+        'seconds': round(time.monotonic() - started, 3),
+    }
+
+
+def read_recommendations(dbs, user_id, after_position, limit):
+    """
+    One page of a user's stored candidates, skipping accounts followed since the last run
+
+    Args:
+        dbs: Database or DatabaseSession
+        user_id (int): Viewer
+        after_position (int): Position of the last row already returned, or -1
+        limit (int): Rows to return
+
+    Returns:
+        list: Rows with position, mutual_count and the candidate's profile and stats
+    """
+    return dbs.execute_query(
+        """
+        SELECT
+            r.position,
+            r.mutual_count,
+            u.id,
+            u.username,
+            u.full_name,
+            u.profile_pic,
+            u.bio,
+            us.followers_count,
+            us.following_count,
+            us.posts_count
+        FROM user_recommendations r
+        INNER JOIN users u ON u.id = r.candidate_id
+        LEFT JOIN user_stats us ON us.user_id = r.candidate_id
+        WHERE r.user_id = %s
+          AND r.position > %s
+          AND NOT EXISTS (
+              SELECT 1 FROM follows f
+              WHERE f.follower_id = r.user_id AND f.following_id = r.candidate_id
+          )
+        ORDER BY r.position
+        LIMIT %s
+        """,
+        (user_id, after_position, limit)
+    ) or []
+
+
+def has_recommendations(dbs, user_id):
+    """True if the batch job stored any candidates for `user_id`"""
+    return bool(dbs.execute_query(
+        "SELECT 1 FROM user_recommendations WHERE user_id = %s LIMIT 1",
+        (user_id,)
+    ))
+
+
+class RecommendationRefresher:
+    """Background thread running compute_recommendations periodically"""
+
+    def __init__(self, interval=None):
+        self.interval = interval or Config.RECOMMENDATION_REFRESH_INTERVAL
+        self._stopping = threading.Event()
+        self._thread = None
+        self.last_run = None
+
+    def start(self):
+        """Start the refresher thread (no-op if running)"""
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name='recommendation-refresher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the refresher thread"""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                self.last_run = compute_recommendations()
+            except Exception as e:
+                print(f"Error computing recommendations: {e}")
+            self._stopping.wait(self.interval)
+
+
+# Global refresher instance (started by app.py when RECOMMENDATION_REFRESH_IN_APP is set)
+refresher = RecommendationRefresher()
+
+
+if __name__ == "__main__":
+    print("Computing people-you-may-know candidates...")
+    result = compute_recommendations()
+    print(f"Stored {result['rows']} candidates for {result['users']} users "
+          f"from {result['edges']} follows in {result['seconds']}s ({result['engine']})")
@@ -0,0 +1,129 @@
+"""
+API response encoding: fast JSON and compression
+
+- FastJSONProvider replaces Flask's JSON provider, so jsonify() uses orjson
+  and writes datetimes natively as ISO 8601. Handlers pass row values
+  straight through instead of calling str() on every timestamp.
+- compress_response() runs after every /api request and gzip- or
+  brotli-encodes JSON bodies above Config.COMPRESS_MIN_BYTES when the client
+  accepts it. Streamed bodies are left alone.
+
+orjson and brotli are in requirements.txt. The imports still fall back to
+the standard json module and gzip-only compression so the app runs where no
+wheel is available; encoders() reports which are in use (see /api/health).
+"""
+import datetime
+import decimal
+import gzip
+import json
+
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+from config import Config
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies are only compressed for these media types (images and SSE are left alone)
+COMPRESSIBLE_TYPES = {'application/json'}
+
+
+def _default(value):
+    """Encode values the JSON encoders do not handle on their own"""
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, bytes):
+        return value.decode('utf-8', 'replace')
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value):
+    """Serialize `value` to a JSON string (orjson when available)"""
+    if orjson is not None:
+        return orjson.dumps(value, default=_default, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+    return json.dumps(value, default=_default, ensure_ascii=False, separators=(',', ':'))
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by dumps() above"""
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj), mimetype='application/json')
+
+
+def encoders():
+    """Return which JSON encoder and compressions are active"""
+    return {
+        'json': 'orjson' if orjson is not None else 'json',
+        'compression': ['br', 'gzip'] if brotli is not None else ['gzip'],
+    }
+
+
+def _choose_encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress_response(response):
+    """after_request hook: compress JSON bodies the client can decode"""
+    if (
+        response.mimetype not in COMPRESSIBLE_TYPES
+        or response.status_code < 200
+        or response.status_code in (204, 304)
+        or 'Content-Encoding' in response.headers
+        or request.method == 'HEAD'
+        or response.is_streamed
+    ):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = _choose_encoding()
+    if encoding is None:
+        return response
+
+    body = response.get_data()
+    if len(body) < Config.COMPRESS_MIN_BYTES:
+        return response
+    if encoding == 'br':
+        body = brotli.compress(body, quality=Config.COMPRESS_BROTLI_QUALITY)
+    else:
+        body = gzip.compress(body, compresslevel=Config.COMPRESS_GZIP_LEVEL)
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_app(app):
+    """Install the JSON provider and the compression hook on `app`"""
+    app.json_provider_class = FastJSONProvider
+    app.json = FastJSONProvider(app)
+
+    @app.after_request
+    def compress_api_response(response):
+        if not request.path.startswith('/api/'):
+            return response
+        return compress_response(response)
@@ -128,3 +128,118 @@ CREATE TABLE IF NOT EXISTS messages (
     FOREIGN KEY (sender_id) REFERENCES users(id) ON DELETE CASCADE
 );
 
+
+-- 10. Home timelines (fan-out on write, see timeline.py)
+CREATE TABLE IF NOT EXISTS timeline_entries (
+    owner_id BIGINT UNSIGNED NOT NULL,   -- whose home feed this row belongs to
+    post_id BIGINT UNSIGNED NOT NULL,
+    author_id BIGINT UNSIGNED NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP, -- copy of posts.created_at
+    PRIMARY KEY (owner_id, post_id),
+    FOREIGN KEY (owner_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (post_id) REFERENCES posts(id) ON DELETE CASCADE,
+    FOREIGN KEY (author_id) REFERENCES users(id) ON DELETE CASCADE,
+    INDEX idx_owner_created (owner_id, created_at, post_id),
+    INDEX idx_owner_author (owner_id, author_id)
+);
+
+-- 11. Per-user counters (see user_stats.py)
+CREATE TABLE IF NOT EXISTS user_stats (
+    user_id BIGINT UNSIGNED PRIMARY KEY,
+    followers_count INT UNSIGNED NOT NULL DEFAULT 0,
+    following_count INT UNSIGNED NOT NULL DEFAULT 0,
+    posts_count INT UNSIGNED NOT NULL DEFAULT 0,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    INDEX idx_followers (followers_count DESC, user_id) -- people-you-may-know ordering
+);
+
+-- 12. Background image processing queue (see media_jobs.py)
+CREATE TABLE IF NOT EXISTS media_jobs (
+    id BIGINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+    target_type ENUM('post', 'story', 'profile') NOT NULL,
+    target_id BIGINT UNSIGNED NOT NULL,         -- posts.id, stories.id or users.id
+    source_path VARCHAR(500) NOT NULL,          -- original upload, relative to assets/images
+    status ENUM('queued', 'running', 'done', 'failed') NOT NULL DEFAULT 'queued',
+    attempts TINYINT UNSIGNED NOT NULL DEFAULT 0,
+    claimed_by VARCHAR(64) NULL,                -- dispatcher that is processing the job
+    claimed_at TIMESTAMP NULL,
+    last_error VARCHAR(500) NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_status_id (status, id)
+);
+
+-- 13. Content-addressed media blobs (see media_store.py)
+CREATE TABLE IF NOT EXISTS media (
+    sha256 CHAR(64) PRIMARY KEY,
+    path VARCHAR(255) NOT NULL,                 -- original blob, relative to assets/images
+    size_bytes BIGINT UNSIGNED NOT NULL,
+    ref_count INT UNSIGNED NOT NULL DEFAULT 0,  -- posts/stories/users rows pointing at it
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_unreferenced (ref_count, updated_at)
+);
+
+-- 14. Counter shards for hot posts (see counters.py)
+CREATE TABLE IF NOT EXISTS post_counter_shards (
+    post_id BIGINT UNSIGNED NOT NULL,
+    shard TINYINT UNSIGNED NOT NULL,
+    likes_delta INT NOT NULL DEFAULT 0,          -- pending change to posts.likes_count
+    comments_delta INT NOT NULL DEFAULT 0,       -- pending change to posts.comments_count
+    PRIMARY KEY (post_id, shard),
+    FOREIGN KEY (post_id) REFERENCES posts(id) ON DELETE CASCADE
+);
+
+-- 15. Precomputed "people you may know" candidates (see recommendations.py)
+CREATE TABLE IF NOT EXISTS user_recommendations (
+    user_id BIGINT UNSIGNED NOT NULL,
+    position SMALLINT UNSIGNED NOT NULL,         -- 0 = best candidate
+    candidate_id BIGINT UNSIGNED NOT NULL,
+    mutual_count INT UNSIGNED NOT NULL,          -- accounts user_id follows that follow candidate_id
+    computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, position),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (candidate_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- 16. Timelines already seeded from follows and posts (see timeline.py)
+CREATE TABLE IF NOT EXISTS timeline_seeds (
+    owner_id BIGINT UNSIGNED PRIMARY KEY,
+    seeded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (owner_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- Changes to the tables above, applied in order. init_database.py reports
+-- statements that were already applied (duplicate index or column) and moves on.
+
+-- Keyset pagination: profile grids page by (user_id, created_at, id)
+CREATE INDEX idx_posts_user_created ON posts (user_id, created_at, id);
+
+-- Keyset pagination: conversations page by (conversation_id, created_at, id)
+CREATE INDEX idx_messages_conversation_created ON messages (conversation_id, created_at, id);
+
+-- Inbox: each conversation points at its newest message, and each membership
+-- carries the conversation's latest activity so inboxes sort from an index
+ALTER TABLE conversations ADD COLUMN last_message_id BIGINT UNSIGNED NULL;
+ALTER TABLE conversation_members ADD COLUMN last_activity_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP;
+CREATE INDEX idx_members_inbox ON conversation_members (user_id, last_activity_at, conversation_id);
+
+-- Feed comment previews read the newest comments per post from this index
+CREATE INDEX idx_comments_post_created ON comments (post_id, created_at, id);
+
+-- Message deltas: after_id / before_id fetches walk (conversation_id, id)
+CREATE INDEX idx_messages_conversation_id ON messages (conversation_id, id);
+
+-- Uploads are served from the original file until the media worker has
+-- written the resized variants and flips the row to 'ready'
+ALTER TABLE posts ADD COLUMN image_status ENUM('processing', 'ready', 'failed') NOT NULL DEFAULT 'ready';
+ALTER TABLE stories ADD COLUMN image_status ENUM('processing', 'ready', 'failed') NOT NULL DEFAULT 'ready';
+
+-- Story rings: live stories per author are read by (user_id, expires_at)
+CREATE INDEX idx_stories_user_expires ON stories (user_id, expires_at);
+
+-- Finished media jobs repoint every row still showing a shared original
+CREATE INDEX idx_posts_image_url ON posts (image_url(100));
+CREATE INDEX idx_stories_image_url ON stories (image_url(100));
+CREATE INDEX idx_users_profile_pic ON users (profile_pic(100));
+CREATE INDEX idx_media_jobs_source ON media_jobs (source_path(100), status);
@@ -0,0 +1,371 @@
+"""
+Server-side sessions with a cached profile of the logged-in user
+
+Flask's default session lives entirely in the signed cookie. This module
+keeps the session data in a SQLite file (Config.SESSION_STORE_PATH) instead
+and puts only a signed random id in the cookie, so a session can be revoked
+and its contents never reach the browser.
+
+The same file caches one profile snapshot per user (the /api/user/me payload),
+so the pages that load the current user on every visit are answered without
+MySQL. Snapshots are dropped by invalidate_user() after anything that changes
+them commits (profile edits, follows and new posts, through cache.bus; a
+processed profile picture, from media_jobs.py) and in any case after
+Config.SESSION_SNAPSHOT_TTL seconds. Like cache.py's scopes, every user has a
+generation that invalidate_user() bumps. A request reads it before loading
+the profile from MySQL and passes it to put_user_snapshot(), which drops the
+write if the user was invalidated in between, so a stale profile is never
+cached.
+
+SQLite is used because it needs no extra service and is shared by every app
+and worker process on the host. The file and schema are created once, when
+create_app() installs the store or on its first use, not on import. Requests
+then borrow connections from a small pool
+(Config.SESSION_STORE_POOL_SIZE idle connections kept open). Run
+`python server_sessions.py` periodically to delete expired rows.
+"""
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+
+from cache import bus
+from config import Config
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    sid TEXT PRIMARY KEY,
+    user_id INTEGER,
+    data TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions (user_id);
+CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions (expires_at);
+CREATE TABLE IF NOT EXISTS user_snapshots (
+    user_id INTEGER PRIMARY KEY,
+    data TEXT NOT NULL,
+    cached_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS user_generations (
+    user_id INTEGER PRIMARY KEY,
+    generation INTEGER NOT NULL
+);
+"""
+
+
+class SessionStore:
+    """SQLite-backed session rows and user profile snapshots"""
+
+    def __init__(self, path=None):
+        path = path or Config.SESSION_STORE_PATH
+        self.path = path if os.path.isabs(path) else os.path.join(ROOT_DIR, path)
+        self.pool_size = Config.SESSION_STORE_POOL_SIZE
+        self._idle = []
+        self._lock = threading.Lock()
+        self._opened = False
+        self._stats = {
+            'snapshot_hits': 0,
+            'snapshot_misses': 0,
+            'invalidations': 0,
+            'stale_snapshots_dropped': 0,
+        }
+
+    def open(self):
+        """Create the SQLite file and schema (a no-op after the first call)"""
+        with self._lock:
+            if self._opened:
+                return
+            conn = self._connect()
+            try:
+                # WAL is a property of the file, so it only needs setting once
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+            finally:
+                conn.close()
+            self._opened = True
+
+    def _connect(self):
+        # Pooled connections move between threads, but only one uses each at a time
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        """Borrow a pooled connection, opening one if none is idle"""
+        self.open()
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            conn = self._connect()
+        try:
+            yield conn
+        finally:
+            with self._lock:
+                if len(self._idle) < self.pool_size:
+                    self._idle.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+
+    def close(self):
+        """Close the idle connections"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    # -- sessions ------------------------------------------------------------
+
+    def load(self, sid):
+        """
+        Return (data, expires_at) for a live session, or None
+
+        Args:
+            sid (str): Session id from the cookie
+        """
+        with self._connection() as conn:
+            row = conn.execute(
+                "SELECT data, expires_at FROM sessions WHERE sid = ? AND expires_at > ?",
+                (sid, time.time())
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def save(self, sid, data, expires_at):
+        """Write a session's data and expiry"""
+        with self._connection() as conn:
+            conn.execute(
+                """
+                INSERT INTO sessions (sid, user_id, data, expires_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT (sid) DO UPDATE SET
+                    user_id = excluded.user_id, data = excluded.data, expires_at = excluded.expires_at
+                """,
+                (sid, data.get('user_id'), json.dumps(data), expires_at)
+            )
+
+    def touch(self, sid, expires_at):
+        """Extend a session without rewriting its data"""
+        with self._connection() as conn:
+            conn.execute(
+                "UPDATE sessions SET expires_at = ? WHERE sid = ?",
+                (expires_at, sid)
+            )
+
+    def delete(self, sid):
+        """Remove a session (logout, id rotation)"""
+        with self._connection() as conn:
+            conn.execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+
+    # -- profile snapshots ---------------------------------------------------
+
+    def get_user_snapshot(self, user_id):
+        """Return the cached profile dict for `user_id`, or None if missing or too old"""
+        with self._connection() as conn:
+            row = conn.execute(
+                "SELECT data FROM user_snapshots WHERE user_id = ? AND cached_at > ?",
+                (user_id, time.time() - Config.SESSION_SNAPSHOT_TTL)
+            ).fetchone()
+        self._count('snapshot_hits' if row else 'snapshot_misses')
+        return json.loads(row[0]) if row else None
+
+    def user_generation(self, user_id):
+        """Return the snapshot generation of `user_id` (read it before loading the profile)"""
+        with self._connection() as conn:
+            row = conn.execute(
+                "SELECT generation FROM user_generations WHERE user_id = ?",
+                (user_id,)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def put_user_snapshot(self, user_id, profile, generation):
+        """
+        Cache the profile dict for `user_id` unless it was invalidated since
+
+        Args:
+            user_id (int): User the profile belongs to
+            profile (dict): /api/user/me payload
+            generation (int): user_generation(user_id) read before the profile was loaded
+
+        Returns:
+            bool: True if the snapshot was written
+        """
+        with self._connection() as conn:
+            # One statement, so an invalidation cannot slip between the check and the write
+            written = conn.execute(
+                """
+                INSERT OR REPLACE INTO user_snapshots (user_id, data, cached_at)
+                SELECT ?, ?, ?
+                WHERE COALESCE((SELECT generation FROM user_generations WHERE user_id = ?), 0) = ?
+                """,
+                (user_id, json.dumps(profile), time.time(), user_id, generation)
+            ).rowcount
+        if not written:
+            self._count('stale_snapshots_dropped')
+        return bool(written)
+
+    def invalidate_user(self, *user_ids):
+        """Drop the cached profiles of `user_ids` (call after the change commits)"""
+        with self._connection() as conn:
+            for user_id in user_ids:
+                if user_id is None:
+                    continue
+                try:
+                    # Bump first: a snapshot written after the delete then fails its generation check
+                    conn.execute(
+                        """
+                        INSERT INTO user_generations (user_id, generation) VALUES (?, 1)
+                        ON CONFLICT (user_id) DO UPDATE SET generation = generation + 1
+                        """,
+                        (user_id,)
+                    )
+                    conn.execute("DELETE FROM user_snapshots WHERE user_id = ?", (user_id,))
+                    self._count('invalidations')
+                except sqlite3.Error as e:
+                    print(f"Error invalidating user snapshot: {e}")
+
+    # -- maintenance ---------------------------------------------------------
+
+    def purge_expired(self):
+        """
+        Delete expired sessions and snapshots past their TTL
+
+        Returns:
+            tuple: (sessions deleted, snapshots deleted)
+        """
+        now = time.time()
+        with self._connection() as conn:
+            sessions = conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,)).rowcount
+            snapshots = conn.execute(
+                "DELETE FROM user_snapshots WHERE cached_at <= ?",
+                (now - Config.SESSION_SNAPSHOT_TTL,)
+            ).rowcount
+        return sessions, snapshots
+
+    def stats(self):
+        """Return snapshot hit/miss and invalidation counters"""
+        with self._lock:
+            return dict(self._stats)
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    """Session dict that remembers its id and whether it changed"""
+
+    def __init__(self, initial=None, sid=None, expires_at=None):
+        def on_update(session):
+            session.modified = True
+
+        super().__init__(initial, on_update)
+        self.new = sid is None
+        self.sid = sid or secrets.token_urlsafe(32)
+        self.expires_at = expires_at
+        self.modified = False
+        self.rotate = False
+
+    def regenerate(self):
+        """Issue a new id when the response is saved (call on login against session fixation)"""
+        self.rotate = True
+        self.modified = True
+
+
+class ServerSessionInterface(SessionInterface):
+    """Flask session interface storing sessions in a SessionStore"""
+
+    salt = 'server-session'
+
+    def __init__(self, store):
+        self.store = store
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt=self.salt)
+
+    def open_session(self, app, request):
+        if not app.secret_key:
+            return None
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = self._signer(app).unsign(cookie).decode('utf-8')
+            except BadSignature:
+                sid = None
+            if sid:
+                try:
+                    stored = self.store.load(sid)
+                except sqlite3.Error as e:
+                    print(f"Error loading session: {e}")
+                    stored = None
+                if stored is not None:
+                    data, expires_at = stored
+                    return ServerSession(data, sid=sid, expires_at=expires_at)
+        return ServerSession()
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            if session.modified:
+                if not session.new:
+                    self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if session.rotate and not session.new:
+            self.store.delete(session.sid)
+            session.sid = secrets.token_urlsafe(32)
+
+        now = time.time()
+        expires_at = now + app.permanent_session_lifetime.total_seconds()
+        if session.modified:
+            self.store.save(session.sid, dict(session), expires_at)
+        elif session.expires_at is not None and expires_at - session.expires_at > Config.SESSION_TOUCH_INTERVAL:
+            self.store.touch(session.sid, expires_at)
+        else:
+            return
+
+        response.set_cookie(
+            name,
+            self._signer(app).sign(session.sid.encode('utf-8')).decode('utf-8'),
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+
+def init_app(app, store=None):
+    """Install server-side sessions on `app`, creating the store's file if needed"""
+    store = store or session_store
+    store.open()
+    app.session_interface = ServerSessionInterface(store)
+
+
+# Global session store instance (its file is created by init_app() or on first use)
+session_store = SessionStore()
+
+bus.subscribe('followed', lambda follower_id, following_id, **_: session_store.invalidate_user(follower_id, following_id))
+bus.subscribe('post_created', lambda user_id, **_: session_store.invalidate_user(user_id))
+bus.subscribe('profile_updated', lambda user_id, **_: session_store.invalidate_user(user_id))
+
+
+if __name__ == "__main__":
+    print("Purging expired sessions...")
+    sessions, snapshots = session_store.purge_expired()
+    print(f"Removed {sessions} sessions and {snapshots} profile snapshots")
@@ -0,0 +1,206 @@
+"""
+Static file responses: cache policy, ETags, range requests and offload
+
+Everything under /assets and the Frontend folders is served through
+send_static(), which
+
+- marks content-addressed media (media_store.py) as `immutable` for a year,
+  since a stored path never changes content, and gives other files a short
+  max-age (or `no-cache` for pages and scripts) so browsers revalidate;
+- sends a strong ETag and answers If-None-Match / If-Modified-Since with 304
+  and Range requests with 206 (via werkzeug's conditional send_file);
+- with Config.STATIC_OFFLOAD set, hands the file body to the front-end server
+  (`x-sendfile` for Apache/lighttpd, `x-accel-redirect` for nginx) so Python
+  workers never stream image bytes.
+
+When build_frontend.py has written Frontend/manifest.json, pages are served
+from their bundled copies and the fingerprinted bundles are sent as
+`immutable`, from their .br/.gz siblings when the client accepts them.
+
+Path lookups are cached: safe_join is done once per (directory, name) and
+serve_frontend's suffix dispatch once per requested path.
+"""
+import json
+import mimetypes
+import os
+import stat
+from functools import lru_cache
+
+from flask import abort, current_app, request, send_file
+from werkzeug.security import safe_join
+
+from config import Config
+import media_store
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+MANIFEST_PATH = os.path.join(ROOT_DIR, 'Frontend', 'manifest.json')
+
+# Content-Encoding -> suffix of the precompressed sibling, in order of preference
+PRECOMPRESSED = (('br', '.br'), ('gzip', '.gz'))
+
+_manifest = {'mtime': None, 'data': None}
+
+# Requested file suffix -> Frontend folder it is served from
+FRONTEND_FOLDERS = {
+    '.html': 'Frontend/html',
+    '.css': 'Frontend/css',
+    '.js': 'Frontend/js',
+}
+
+
+@lru_cache(maxsize=4096)
+def resolve(directory, filename):
+    """Absolute path of `filename` inside `directory` (relative to the app root), or None if it escapes"""
+    return safe_join(os.path.join(ROOT_DIR, directory), filename)
+
+
+@lru_cache(maxsize=1024)
+def frontend_location(filename):
+    """
+    Map a requested path to the (directory, file name) it is served from
+
+    Pages, styles and scripts are looked up by suffix and file name only, so
+    /js/home.js and /home.js both resolve to Frontend/js/home.js.
+
+    Returns:
+        tuple: (directory, file name), or None if the path is not a frontend file
+    """
+    if filename.startswith('assets/'):
+        return 'assets', filename[len('assets/'):]
+    parts = filename.split('/')
+    if len(parts) >= 3 and parts[-2] == 'bundles' and parts[-3] in ('css', 'js'):
+        return f"Frontend/{parts[-3]}/bundles", parts[-1]
+    folder = FRONTEND_FOLDERS.get(os.path.splitext(filename)[1])
+    if folder is None:
+        return None
+    return folder, filename.split('/')[-1]
+
+
+def load_manifest():
+    """Return the bundle manifest written by build_frontend.py (reloaded when it changes), or None"""
+    try:
+        mtime = os.stat(MANIFEST_PATH).st_mtime_ns
+    except OSError:
+        return None
+    if _manifest['mtime'] != mtime:
+        try:
+            with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+                _manifest['data'] = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error reading bundle manifest: {e}")
+            _manifest['data'] = None
+        _manifest['mtime'] = mtime
+    return _manifest['data']
+
+
+def send_page(filename):
+    """Send an HTML page, using its bundled copy when the manifest lists one"""
+    manifest = load_manifest() if Config.USE_FRONTEND_BUNDLES else None
+    if manifest and filename in manifest.get('pages', {}):
+        return send_static('Frontend/html/bundles', filename, max_age=0)
+    return send_static('Frontend/html', filename, max_age=0)
+
+
+def send_static(directory, filename, max_age=None):
+    """
+    Send a file with cache headers, a strong ETag and range support
+
+    Args:
+        directory (str): Folder relative to the app root, e.g. 'assets' or 'Frontend/html'
+        filename (str): Path inside `directory`
+        max_age (int, optional): Cache lifetime for files that are not
+            content-addressed; 0 means `no-cache` (defaults to Config.STATIC_MAX_AGE)
+
+    Returns:
+        Response: 200/206/304 response, or aborts with 404
+    """
+    bundle = _bundle_encodings(directory, filename)
+    if bundle is not None:
+        return _send_bundle(directory, filename, bundle)
+
+    path = resolve(directory, filename)
+    if path is None:
+        abort(404)
+    try:
+        info = os.stat(path)
+    except OSError:
+        abort(404)
+    if not stat.S_ISREG(info.st_mode):
+        abort(404)
+
+    immutable = (
+        directory == 'assets'
+        and filename.startswith('images/')
+        and media_store.is_media_path(filename[len('images/'):])
+    )
+    if immutable:
+        # The file name carries the content hash (plus the variant), so it is the ETag
+        etag = os.path.basename(filename)
+    else:
+        etag = f"{info.st_size:x}-{info.st_mtime_ns:x}"
+
+    if Config.STATIC_OFFLOAD == 'x-accel-redirect':
+        response = _accel_redirect(directory, filename, path, etag, info)
+    else:
+        # send_file honours USE_X_SENDFILE, If-None-Match, If-Modified-Since and Range
+        response = send_file(path, conditional=True, etag=etag, last_modified=info.st_mtime)
+
+    if immutable:
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    else:
+        max_age = Config.STATIC_MAX_AGE if max_age is None else max_age
+        response.headers['Cache-Control'] = f'public, max-age={max_age}' if max_age else 'no-cache'
+    return response
+
+
+def _bundle_encodings(directory, filename):
+    """Precompressed encodings of a manifest-listed bundle, or None for other files"""
+    if not directory.endswith('/bundles') or directory == 'Frontend/html/bundles':
+        return None
+    manifest = load_manifest()
+    if not manifest:
+        return None
+    rel_path = f"{directory[len('Frontend/'):]}/{filename}"
+    return manifest.get('files', {}).get(rel_path)
+
+
+def _send_bundle(directory, filename, encodings):
+    """Send a fingerprinted bundle, precompressed when the client accepts it"""
+    path = resolve(directory, filename)
+    if path is None:
+        abort(404)
+    mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    for encoding, suffix in PRECOMPRESSED:
+        if encoding in encodings and encoding in request.accept_encodings:
+            path, etag = path + suffix, f"{filename}-{encoding}"
+            break
+    else:
+        encoding, etag = None, filename
+    try:
+        response = send_file(path, mimetype=mimetype, conditional=True, etag=etag)
+    except FileNotFoundError:
+        abort(404)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    # The fingerprint changes with the content, so the URL can be cached forever
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+
+def _accel_redirect(directory, filename, path, etag, info):
+    """Empty response telling nginx to send the file from its internal location"""
+    response = current_app.response_class(
+        mimetype=mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    )
+    response.set_etag(etag)
+    response.last_modified = info.st_mtime
+    if request.if_none_match.contains(etag):
+        response.status_code = 304
+        return response
+    prefix = Config.STATIC_ACCEL_PREFIX.rstrip('/')
+    response.headers['X-Accel-Redirect'] = f"{prefix}/{directory}/{filename}"
+    return response
@@ -0,0 +1,229 @@
+"""
+Stories: creation, grouped story rings, expiry purge
+
+- read_rings() returns the live stories a viewer can see, grouped into one
+  ring per author (the viewer's own ring first, then by newest story). The
+  query walks follows(follower_id) and stories(user_id, expires_at), so it
+  needs no IN (...) list.
+- Rings are cached per viewer (cache.py) until the first story in them
+  expires (at most Config.STORY_CACHE_SECONDS). A new story invalidates its
+  author's followers, and a follow or unfollow invalidates the follower.
+- purge_expired_stories() deletes expired rows in batches, releases their
+  media references and removes files of uploads stored before the media
+  store. Each sweep ends with media_store.collect_garbage(), which deletes
+  the blobs that have been unreferenced for the grace period. StorySweeper runs it in the
+  background (started by app.py), or run `python stories.py` from cron.
+
+All functions take `dbs`, anything with an execute_query() method: the global
+`db` or a request-scoped DatabaseSession.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from cache import bus, cache, viewer_scope
+from config import Config
+from database import db
+import images
+import media_store
+import user_stats
+
+
+def create_story(dbs, user_id, image_url, image_status='ready'):
+    """
+    Insert a story that expires after Config.STORY_TTL_HOURS
+
+    The cached rings of the author and their followers are invalidated once
+    the session commits.
+
+    Args:
+        dbs: DatabaseSession (lastrowid and on_commit are used)
+        user_id (int): Author
+        image_url (str): Stored image path
+        image_status (str): 'ready' or 'processing'
+
+    Returns:
+        dict: The new row (id, image_url, image_status, created_at, expires_at)
+    """
+    dbs.execute_query(
+        """
+        INSERT INTO stories (user_id, image_url, image_status, expires_at)
+        VALUES (%s, %s, %s, DATE_ADD(NOW(), INTERVAL %s HOUR))
+        """,
+        (user_id, image_url, image_status, Config.STORY_TTL_HOURS)
+    )
+    story_id = dbs.lastrowid
+    viewer_ids = user_stats.follower_ids(dbs, user_id) + [user_id]
+    bus.publish_on_commit(dbs, 'story_created', user_id=user_id, viewer_ids=viewer_ids)
+    rows = dbs.execute_query(
+        "SELECT id, image_url, image_status, created_at, expires_at FROM stories WHERE id = %s",
+        (story_id,)
+    ) or [{}]
+    return rows[0]
+
+
+def read_rings(dbs, viewer_id):
+    """
+    Live stories from the viewer and the accounts they follow, one ring per author
+
+    Args:
+        dbs: Database or DatabaseSession
+        viewer_id (int): Current user
+
+    Returns:
+        list: Rings {user_id, username, profile_pic, latest_at, stories}, the
+            viewer's own first; each ring's stories are oldest first
+    """
+    key = cache.key('stories', viewer_scope(viewer_id))
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    rows = dbs.execute_query(
+        """
+        SELECT s.id, s.user_id, s.image_url, s.image_status, s.created_at, s.expires_at,
+               TIMESTAMPDIFF(SECOND, NOW(), s.expires_at) AS seconds_left,
+               u.username, u.profile_pic
+        FROM (
+            SELECT following_id AS user_id FROM follows WHERE follower_id = %s
+            UNION ALL
+            SELECT %s
+        ) authors
+        INNER JOIN stories s ON s.user_id = authors.user_id AND s.expires_at > NOW()
+        INNER JOIN users u ON u.id = s.user_id
+        ORDER BY s.user_id, s.created_at, s.id
+        """,
+        (viewer_id, viewer_id)
+    ) or []
+
+    rings = OrderedDict()
+    for row in rows:
+        ring = rings.get(row['user_id'])
+        if ring is None:
+            ring = rings[row['user_id']] = {
+                'user_id': row['user_id'],
+                'username': row['username'],
+                'profile_pic': row['profile_pic'],
+                'latest_at': row['created_at'],
+                'stories': [],
+            }
+        ring['latest_at'] = row['created_at']
+        ring['stories'].append({
+            'id': row['id'],
+            'image_url': row['image_url'],
+            'image_status': row['image_status'],
+            'created_at': row['created_at'],
+            'expires_at': row['expires_at'],
+        })
+
+    result = sorted(
+        rings.values(),
+        key=lambda ring: (ring['user_id'] != viewer_id, -ring['latest_at'].timestamp())
+    )
+
+    # Valid until the first story drops out; not cached while an image is still
+    # being processed, since the worker replaces (and deletes) the original
+    ttl = Config.STORY_CACHE_SECONDS
+    if rows:
+        ttl = min(ttl, min(row['seconds_left'] for row in rows))
+    if not any(row['image_status'] == 'processing' for row in rows):
+        cache.set(key, result, ttl)
+    return result
+
+
+def purge_expired_stories(dbs=db, batch_size=None):
+    """
+    Delete expired stories in batches, release their images and collect
+    unreferenced media
+
+    Args:
+        dbs: Database (each batch runs in its own session)
+        batch_size (int, optional): Rows per batch (defaults to Config.STORY_PURGE_BATCH)
+
+    Returns:
+        int: Number of stories deleted
+    """
+    batch_size = batch_size or Config.STORY_PURGE_BATCH
+    deleted = 0
+    while True:
+        with dbs.session() as session:
+            rows = session.execute_query(
+                """
+                SELECT id, image_url FROM stories
+                WHERE expires_at <= NOW()
+                ORDER BY expires_at
+                LIMIT %s
+                """,
+                (batch_size,)
+            ) or []
+            if not rows:
+                break
+            placeholders = ','.join(['%s'] * len(rows))
+            session.execute_query(
+                f"DELETE FROM stories WHERE id IN ({placeholders})",
+                tuple(row['id'] for row in rows)
+            )
+            paths = [row['image_url'] for row in rows]
+            media_store.release_many(session, paths)
+        # Files are removed only after the delete has committed
+        for path in paths:
+            if not media_store.is_media_path(path):
+                _remove_legacy_image(path)
+        deleted += len(rows)
+        if len(rows) < batch_size:
+            break
+    media_store.collect_garbage(dbs)
+    return deleted
+
+
+def _remove_legacy_image(path):
+    """Remove an upload stored outside the media store, with its variants"""
+    variants = images.variant_paths(path) or {}
+    for candidate in {path, *variants.values()}:
+        try:
+            os.remove(os.path.join(images.IMAGES_DIR, candidate))
+        except OSError:
+            pass
+
+
+class StorySweeper:
+    """Background thread running purge_expired_stories every few minutes"""
+
+    def __init__(self, interval=None):
+        self.interval = interval or Config.STORY_PURGE_INTERVAL
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the sweeper thread (no-op if running)"""
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name='story-sweeper', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the sweeper thread"""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                purge_expired_stories()
+            except Exception as e:
+                print(f"Error purging expired stories: {e}")
+            self._stopping.wait(self.interval)
+
+
+# Global sweeper instance (started by app.py)
+sweeper = StorySweeper()
+
+
+if __name__ == "__main__":
+    print("Purging expired stories...")
+    count = purge_expired_stories()
+    print(f"Deleted {count} stories")
@@ -0,0 +1,225 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TESTS = os.path.dirname(os.path.abspath(__file__))
+for path in (ROOT, TESTS):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import pytest
+
+from fakes import FakeDB
+
+
+@pytest.fixture(autouse=True)
+def session_store(tmp_path, monkeypatch):
+    """Keep every test's sessions and profile snapshots in a temporary file"""
+    import server_sessions
+    store = server_sessions.SessionStore(str(tmp_path / 'sessions.sqlite3'))
+    store.open()
+    monkeypatch.setattr(server_sessions, 'session_store', store)
+    return store
+
+
+@pytest.fixture
+def fake_db():
+    return FakeDB()
+
+
+@pytest.fixture
+def images_dir(tmp_path, monkeypatch):
+    """Point images.IMAGES_DIR at an empty temporary directory"""
+    import images
+    monkeypatch.setattr(images, 'IMAGES_DIR', str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def media_db(fake_db):
+    """
+    FakeDB with the media, media_jobs and image-bearing tables
+
+    tables['media']: sha256 -> {'path', 'size_bytes', 'ref_count', 'expired'}
+    (`expired` stands in for updated_at being older than the GC grace period);
+    tables['posts'] / ['stories']: id -> {'image_url', 'image_status'};
+    tables['users']: id -> {'profile_pic'}; tables['media_jobs']: id -> job row.
+    """
+    tables = fake_db.tables
+    for name in ('media', 'posts', 'stories', 'users', 'media_jobs'):
+        tables[name] = {}
+
+    def select_media_path(digest):
+        row = tables['media'].get(digest)
+        return [{'path': row['path']}] if row else []
+
+    def insert_media(digest, path, size):
+        row = tables['media'].setdefault(digest, {'path': path, 'size_bytes': size, 'ref_count': 0, 'expired': False})
+        row['ref_count'] += 1
+        row['expired'] = False
+        return 1
+
+    def add_media_refs(count, digest):
+        row = tables['media'].get(digest)
+        if row is None:
+            return 0
+        row['ref_count'] = max(row['ref_count'] + count, 0)
+        row['expired'] = False
+        return 1
+
+    def unreferenced_media(grace_seconds):
+        return [
+            {'sha256': digest, 'path': row['path']}
+            for digest, row in tables['media'].items()
+            if row['ref_count'] == 0 and (row['expired'] or grace_seconds <= 0)
+        ]
+
+    def delete_media(digest):
+        row = tables['media'].get(digest)
+        if row is None or row['ref_count'] != 0:
+            return 0
+        del tables['media'][digest]
+        return 1
+
+    def repoint(table, column, has_status):
+        def handler(new_path, old_path):
+            changed = 0
+            for row in tables[table].values():
+                if row[column] == old_path:
+                    row[column] = new_path
+                    if has_status:
+                        row['image_status'] = 'ready'
+                    changed += 1
+            return changed
+        return handler
+
+    def finish_jobs(job_id, source_path):
+        changed = 0
+        for row_id, job in tables['media_jobs'].items():
+            if row_id == job_id or (job['source_path'] == source_path and job['status'] == 'queued'):
+                job['status'] = 'done'
+                changed += 1
+        return changed
+
+    def running_jobs(source_path, job_id):
+        return [
+            {'1': 1} for row_id, job in tables['media_jobs'].items()
+            if job['source_path'] == source_path and job['status'] == 'running' and row_id != job_id
+        ][:1]
+
+    (fake_db
+        .on(r"^SELECT path FROM media WHERE sha256 = %s", select_media_path)
+        .on(r"^INSERT INTO media ", insert_media)
+        .on(r"^UPDATE media SET ref_count = ref_count \+ 1 WHERE sha256 = %s", lambda digest: add_media_refs(1, digest))
+        .on(r"^UPDATE media SET ref_count = GREATEST\(CAST\(ref_count AS SIGNED\) - 1, 0\)", lambda digest: add_media_refs(-1, digest))
+        .on(r"^UPDATE media SET ref_count = GREATEST\(CAST\(ref_count AS SIGNED\) - %s, 0\)", lambda count, digest: add_media_refs(-count, digest))
+        .on(r"^SELECT sha256, path FROM media WHERE ref_count = 0", unreferenced_media)
+        .on(r"^DELETE FROM media WHERE sha256 = %s AND ref_count = 0", delete_media)
+        .on(r"^SELECT id FROM users WHERE profile_pic = %s",
+            lambda path: [{'id': user_id} for user_id, row in tables['users'].items() if row['profile_pic'] == path])
+        .on(r"^UPDATE posts SET image_url = %s, image_status = 'ready' WHERE image_url = %s", repoint('posts', 'image_url', True))
+        .on(r"^UPDATE stories SET image_url = %s, image_status = 'ready' WHERE image_url = %s", repoint('stories', 'image_url', True))
+        .on(r"^UPDATE users SET profile_pic = %s WHERE profile_pic = %s", repoint('users', 'profile_pic', False))
+        .on(r"^UPDATE media_jobs SET status = 'done'", finish_jobs)
+        .on(r"^SELECT 1 FROM media_jobs WHERE source_path = %s AND status = 'running'", running_jobs))
+    return fake_db
+
+
+@pytest.fixture
+def posts_db(fake_db, monkeypatch):
+    """
+    FakeDB with posts, likes and counter shards
+
+    tables['posts']: id -> {'likes_count', 'comments_count'};
+    tables['likes']: set of (user_id, post_id);
+    tables['post_counter_shards']: (post_id, shard) -> [likes_delta, comments_delta].
+    Each test gets a fresh hot-post tracker.
+    """
+    import counters
+    monkeypatch.setattr(counters, 'hot_posts', counters.HotPostTracker())
+    tables = fake_db.tables
+    tables['posts'] = {}
+    tables['likes'] = set()
+    tables['post_counter_shards'] = {}
+
+    def insert_like(user_id, post_id):
+        if (user_id, post_id) in tables['likes']:
+            return 0
+        tables['likes'].add((user_id, post_id))
+        return 1
+
+    def delete_like(user_id, post_id):
+        if (user_id, post_id) not in tables['likes']:
+            return 0
+        tables['likes'].remove((user_id, post_id))
+        return 1
+
+    def adjust(post_id, likes, comments):
+        row = tables['posts'].get(post_id)
+        if row is None:
+            return 0
+        row['likes_count'] = max(row['likes_count'] + likes, 0)
+        row['comments_count'] = max(row['comments_count'] + comments, 0)
+        return 1
+
+    def add_to_shard(post_id, shard, likes, comments):
+        deltas = tables['post_counter_shards'].setdefault((post_id, shard), [0, 0])
+        deltas[0] += likes
+        deltas[1] += comments
+        return 1
+
+    def counts_with_shards(post_id):
+        row = tables['posts'].get(post_id)
+        if row is None:
+            return []
+        shards = [d for (pid, _), d in tables['post_counter_shards'].items() if pid == post_id]
+        return [{
+            'likes_count': row['likes_count'] + sum(d[0] for d in shards),
+            'comments_count': row['comments_count'] + sum(d[1] for d in shards),
+        }]
+
+    def shard_rows(limit):
+        return [
+            {'post_id': post_id, 'shard': shard, 'likes_delta': d[0], 'comments_delta': d[1]}
+            for (post_id, shard), d in sorted(tables['post_counter_shards'].items())
+        ][:limit]
+
+    def delete_shard(post_id, shard):
+        return 1 if tables['post_counter_shards'].pop((post_id, shard), None) else 0
+
+    (fake_db
+        .on(r"^SELECT id FROM posts WHERE id = %s",
+            lambda post_id: [{'id': post_id}] if post_id in tables['posts'] else [])
+        .on(r"^INSERT IGNORE INTO likes ", insert_like)
+        .on(r"^DELETE FROM likes WHERE user_id = %s AND post_id = %s", delete_like)
+        .on(r"^UPDATE posts SET likes_count = GREATEST\(CAST\(likes_count AS SIGNED\) \+ %s, 0\), comments_count",
+            lambda likes, comments, post_id: adjust(post_id, likes, comments))
+        .on(r"^UPDATE posts SET likes_count = GREATEST\(CAST\(likes_count AS SIGNED\) \+ %s, 0\) WHERE id = %s",
+            lambda likes, post_id: adjust(post_id, likes, 0))
+        .on(r"^INSERT INTO post_counter_shards ", add_to_shard)
+        .on(r"^SELECT p.likes_count \+ COALESCE\(SUM\(s.likes_delta\), 0\)", counts_with_shards)
+        .on(r"^SELECT post_id, shard, likes_delta, comments_delta FROM post_counter_shards", shard_rows)
+        .on(r"^DELETE FROM post_counter_shards WHERE post_id = %s AND shard = %s", delete_shard))
+    return fake_db
+
+
+@pytest.fixture
+def app_client(fake_db, session_store, monkeypatch):
+    """Flask test client whose requests run against `fake_db`, a temporary
+    session store and an empty in-process cache"""
+    import app as app_module
+    import cache
+
+    monkeypatch.setattr(app_module, 'session_store', session_store)
+    monkeypatch.setattr(app_module, 'db', fake_db)
+    monkeypatch.setattr(cache.cache, 'backend', cache.MemoryBackend())
+    monkeypatch.setattr(app_module.Config, 'BACKGROUND_WORKERS', False)
+    flask_app = app_module.create_app()
+    flask_app.config['TESTING'] = True
+    return flask_app.test_client()
+
+
+def login(client, user_id):
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+        sess['logged_in'] = True
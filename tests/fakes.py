@@ -0,0 +1,183 @@
+"""
+In-memory stand-ins for the MySQL-backed `db` and DatabaseSession
+
+FakeDB answers statements with handlers registered per test (matched by
+regex against the whitespace-collapsed SQL) that read and write plain Python
+state in `fake.tables`. Sessions snapshot that state, so a rolled-back
+session or savepoint really undoes its writes, and on_commit callbacks run
+only after a successful commit, like database.DatabaseSession.
+"""
+import copy
+import re
+from contextlib import contextmanager
+
+
+class FakeDB:
+    """Database double: handlers keyed by SQL pattern over in-memory tables"""
+
+    def __init__(self):
+        self.tables = {}
+        self.handlers = []
+        self.statements = []
+        self.lastrowid = None
+        self.commits = 0
+
+    def on(self, pattern, handler):
+        """Answer statements matching `pattern` with handler(*params)"""
+        self.handlers.append((re.compile(pattern, re.IGNORECASE | re.DOTALL), handler))
+        return self
+
+    def execute_query(self, query, params=None):
+        sql = ' '.join(query.split())
+        self.statements.append((sql, params))
+        for pattern, handler in self.handlers:
+            if pattern.search(sql):
+                return handler(*(params or ()))
+        raise AssertionError(f"Unexpected query: {sql}")
+
+    def execute_many(self, query, params_list):
+        return sum(self.execute_query(query, params) or 0 for params in params_list)
+
+    def session(self):
+        return FakeSession(self)
+
+    def ran(self, pattern):
+        """Statements run so far matching `pattern`"""
+        regex = re.compile(pattern, re.IGNORECASE | re.DOTALL)
+        return [(sql, params) for sql, params in self.statements if regex.search(sql)]
+
+
+class FakeSession:
+    """DatabaseSession double sharing its FakeDB's handlers and tables"""
+
+    def __init__(self, fake):
+        self._fake = fake
+        self._snapshot = copy.deepcopy(fake.tables)
+        self._after_commit = []
+
+    @property
+    def lastrowid(self):
+        return self._fake.lastrowid
+
+    def execute_query(self, query, params=None):
+        return self._fake.execute_query(query, params)
+
+    def execute_many(self, query, params_list):
+        return self._fake.execute_many(query, params_list)
+
+    def session(self):
+        return FakeSession(self._fake)
+
+    @contextmanager
+    def transaction(self):
+        snapshot = copy.deepcopy(self._fake.tables)
+        try:
+            yield self
+        except Exception:
+            self._restore(snapshot)
+            raise
+
+    def on_commit(self, callback):
+        self._after_commit.append(callback)
+
+    def _restore(self, snapshot):
+        self._fake.tables.clear()
+        self._fake.tables.update(snapshot)
+
+    def close(self, commit=True):
+        callbacks, self._after_commit = self._after_commit, []
+        if not commit:
+            self._restore(self._snapshot)
+            return
+        self._fake.commits += 1
+        for callback in callbacks:
+            callback()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(commit=exc_type is None)
+
+
+class FakeConnection:
+    """
+    mysql.connector connection double for ConnectionPool and DatabaseSession
+
+    Understands just enough SQL to check transaction handling: "ADD <value>"
+    appends to the uncommitted `rows`, SAVEPOINT / ROLLBACK TO SAVEPOINT /
+    RELEASE SAVEPOINT mark and truncate them, and commit() / rollback() publish
+    or discard them into `committed`. Anything else is recorded and ignored.
+    """
+
+    created = 0
+
+    def __init__(self):
+        FakeConnection.created += 1
+        self.id = FakeConnection.created
+        self.autocommit = True
+        self.rows = []
+        self.committed = []
+        self.savepoints = {}
+        self.statements = []
+        self.closed = False
+        self.healthy = True
+        self.pings = 0
+
+    @property
+    def in_transaction(self):
+        return self.rows != self.committed
+
+    def cursor(self, **kwargs):
+        return _FakeCursor(self)
+
+    def commit(self):
+        self.committed = list(self.rows)
+        self.savepoints = {}
+
+    def rollback(self):
+        self.rows = list(self.committed)
+        self.savepoints = {}
+
+    def ping(self, reconnect=False):
+        self.pings += 1
+        if not self.healthy:
+            raise ConnectionError("server has gone away")
+
+    def is_connected(self):
+        return self.healthy
+
+    def close(self):
+        self.closed = True
+
+
+class _FakeCursor:
+    def __init__(self, conn):
+        self._conn = conn
+        self.with_rows = False
+        self.rowcount = 0
+        self.lastrowid = None
+
+    def execute(self, query, params=None):
+        conn = self._conn
+        conn.statements.append(query)
+        words = query.split()
+        if words[0] == 'ADD':
+            conn.rows.append(words[1])
+            self.rowcount = 1
+            self.lastrowid = len(conn.rows)
+            if conn.autocommit:
+                conn.commit()
+        elif words[0] == 'SAVEPOINT':
+            conn.savepoints[words[1]] = len(conn.rows)
+        elif words[:3] == ['ROLLBACK', 'TO', 'SAVEPOINT']:
+            del conn.rows[conn.savepoints[words[3]]:]
+        elif words[:2] == ['RELEASE', 'SAVEPOINT']:
+            conn.savepoints.pop(words[2])
+
+    def executemany(self, query, params_list):
+        for params in params_list:
+            self.execute(query, params)
+
+    def close(self):
+        pass
@@ -0,0 +1,123 @@
+import pytest
+
+import app as app_module
+from conftest import login
+from passwords import HasherBusy
+
+
+def test_create_app_starts_background_workers(monkeypatch):
+    started = []
+    monkeypatch.setattr(app_module, 'start_background_workers', lambda: started.append(1))
+
+    monkeypatch.setattr(app_module.Config, 'BACKGROUND_WORKERS', True)
+    app_module.create_app()
+    monkeypatch.setattr(app_module.Config, 'BACKGROUND_WORKERS', False)
+    app_module.create_app()
+
+    assert started == [1]
+
+
+def test_start_background_workers_honours_each_flag(monkeypatch):
+    started = []
+    workers = {
+        'MEDIA_WORKER_IN_APP': app_module.media_jobs.worker,
+        'MEDIA_GC_IN_APP': app_module.media_store.collector,
+        'STORY_SWEEPER_IN_APP': app_module.stories.sweeper,
+        'COUNTER_FOLD_IN_APP': app_module.counters.folder,
+        'LIKE_WRITE_BEHIND': app_module.likes.buffer,
+        'RECOMMENDATION_REFRESH_IN_APP': app_module.recommendations.refresher,
+    }
+    for flag, worker in workers.items():
+        monkeypatch.setattr(app_module.Config, flag, flag != 'RECOMMENDATION_REFRESH_IN_APP')
+        monkeypatch.setattr(worker, 'start', lambda flag=flag: started.append(flag))
+    monkeypatch.setattr(app_module.atexit, 'register', lambda func: None)
+
+    app_module.start_background_workers()
+
+    assert set(started) == set(workers) - {'RECOMMENDATION_REFRESH_IN_APP'}
+
+
+def busy(*args, **kwargs):
+    raise HasherBusy("Password hashing workers are unavailable")
+
+
+@pytest.mark.parametrize('path, patched', [('/api/login', 'authenticate_user'), ('/api/signup', 'create_user')])
+def test_hasher_failures_answer_503(app_client, monkeypatch, path, patched):
+    monkeypatch.setattr(app_module, patched, busy)
+
+    response = app_client.post(path, json={'username': 'ana', 'password': 'secret password', 'email': 'a@b.co'})
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+
+def test_profile_read_across_an_invalidation_is_served_but_not_cached(app_client, fake_db, session_store):
+    def load_profile(user_id):
+        # A profile edit commits while this request is still reading the old row
+        session_store.invalidate_user(user_id)
+        return [{'id': user_id, 'username': 'old name'}]
+
+    fake_db.on(r"^SELECT u\.id, u\.username, u\.email, u\.full_name", load_profile)
+    login(app_client, 1)
+
+    response = app_client.get('/api/user/me')
+
+    assert response.get_json()['user']['username'] == 'old name'
+    assert session_store.get_user_snapshot(1) is None
+
+
+@pytest.fixture
+def follows_db(fake_db):
+    """fake_db with users 1 and 2 and the statements follow_user runs"""
+    tables = fake_db.tables
+    tables['users'] = {1, 2}
+    tables['follows'] = set()
+    tables['user_stats'] = {}
+
+    def follow(follower_id, following_id):
+        # INSERT IGNORE: a duplicate or a missing user (foreign key) adds nothing
+        if following_id not in tables['users'] or (follower_id, following_id) in tables['follows']:
+            return 0
+        tables['follows'].add((follower_id, following_id))
+        return 1
+
+    def unfollow(follower_id, following_id):
+        if (follower_id, following_id) not in tables['follows']:
+            return 0
+        tables['follows'].discard((follower_id, following_id))
+        return 1
+
+    def adjust_stats(user_id, followers, following, posts, *_):
+        row = tables['user_stats'].setdefault(user_id, {'followers_count': 0, 'following_count': 0, 'posts_count': 0})
+        row['followers_count'] += followers
+        row['following_count'] += following
+        return 1
+
+    (fake_db
+        .on(r"^DELETE FROM follows WHERE follower_id = %s AND following_id = %s", unfollow)
+        .on(r"^INSERT IGNORE INTO follows", follow)
+        .on(r"^SELECT 1 FROM users WHERE id = %s", lambda user_id: [{'1': 1}] if user_id in tables['users'] else [])
+        .on(r"^INSERT INTO user_stats", adjust_stats)
+        .on(r"^INSERT IGNORE INTO timeline_entries", lambda *params: 0)
+        .on(r"^SELECT followers_count, following_count, posts_count FROM user_stats",
+            lambda user_id: [tables['user_stats'].get(user_id, {})]))
+    return fake_db
+
+
+def test_follow_returns_the_targets_new_counts(app_client, follows_db):
+    login(app_client, 1)
+
+    response = app_client.post('/api/follow/2')
+
+    assert response.status_code == 200
+    assert response.get_json() == {'success': True, 'is_following': True, 'followers_count': 1, 'following_count': 0}
+    assert follows_db.tables['follows'] == {(1, 2)}
+
+
+def test_following_a_missing_user_is_not_found(app_client, follows_db):
+    login(app_client, 1)
+
+    response = app_client.post('/api/follow/99')
+
+    assert response.status_code == 404
+    assert follows_db.tables['user_stats'] == {}
@@ -0,0 +1,154 @@
+import bcrypt
+import pytest
+from mysql.connector.errors import IntegrityError, OperationalError
+
+import auth
+from config import Config
+from passwords import HasherBusy, PasswordHasher
+
+
+@pytest.fixture
+def users_db(fake_db, monkeypatch):
+    """fake_db holding tables['users']: id -> row with username, email and password_hash"""
+    monkeypatch.setattr(auth, 'db', fake_db)
+    monkeypatch.setattr(auth, 'hasher', PasswordHasher(workers=0, max_pending=4))
+    monkeypatch.setattr(Config, 'BCRYPT_ROUNDS', 5)
+    users = fake_db.tables['users'] = {}
+
+    def find(username, email):
+        return [dict(row, id=user_id) for user_id, row in users.items()
+                if row['username'] == username or row['email'] == email]
+
+    def update_hash(new_hash, user_id, old_hash):
+        row = users.get(user_id)
+        if row is None or row['password_hash'] != old_hash:
+            return 0
+        row['password_hash'] = new_hash
+        return 1
+
+    def insert(username, email, password_hash, full_name, bio):
+        # Like the UNIQUE keys on users (MySQL 8 names them 'users.<column>')
+        for key, value in (('username', username), ('email', email)):
+            if any(row[key] == value for row in users.values()):
+                raise IntegrityError(msg=f"Duplicate entry '{value}' for key 'users.{key}'", errno=1062)
+        fake_db.lastrowid = max(users, default=0) + 1
+        users[fake_db.lastrowid] = {'username': username, 'email': email, 'password_hash': password_hash}
+        return 1
+
+    (fake_db
+        .on(r"^SELECT id, username, email, password_hash", find)
+        .on(r"^UPDATE users SET password_hash = %s WHERE id = %s AND password_hash = %s", update_hash)
+        .on(r"^INSERT INTO users ", insert)
+        .on(r"^INSERT IGNORE INTO user_stats", lambda user_id: 1))
+    return fake_db
+
+
+def add_user(fake, user_id, password, rounds):
+    fake.tables['users'][user_id] = {
+        'username': f'user{user_id}', 'email': f'user{user_id}@example.com',
+        'password_hash': bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=rounds)).decode(),
+        'full_name': None, 'bio': None, 'profile_pic': 'default.jpg', 'is_private': 0,
+    }
+
+
+def test_login_with_the_current_cost_keeps_the_hash(users_db):
+    add_user(users_db, 1, 'secret password', rounds=5)
+    before = users_db.tables['users'][1]['password_hash']
+
+    user = auth.authenticate_user('user1', 'secret password')
+
+    assert user['id'] == 1 and 'password_hash' not in user
+    assert users_db.tables['users'][1]['password_hash'] == before
+
+
+def test_login_upgrades_a_hash_made_with_another_cost(users_db):
+    add_user(users_db, 1, 'secret password', rounds=4)
+
+    assert auth.authenticate_user('user1@example.com', 'secret password')
+
+    new_hash = users_db.tables['users'][1]['password_hash']
+    assert new_hash.startswith('$2b$05$')
+    assert bcrypt.checkpw(b'secret password', new_hash.encode())
+
+
+def test_wrong_password_does_not_upgrade(users_db):
+    add_user(users_db, 1, 'secret password', rounds=4)
+
+    assert auth.authenticate_user('user1', 'wrong password') is None
+    assert not users_db.ran(r"^UPDATE users SET password_hash")
+
+
+def test_upgrade_skips_a_hash_that_changed_meanwhile(users_db):
+    add_user(users_db, 1, 'secret password', rounds=4)
+
+    auth.upgrade_password_hash(1, 'secret password', 'some older hash')
+
+    assert users_db.tables['users'][1]['password_hash'].startswith('$2b$04$')
+
+
+def test_malformed_stored_hash_never_matches(users_db):
+    assert not auth.verify_password('anything', 'not a bcrypt hash')
+
+
+def test_hasher_failure_is_not_reported_as_a_wrong_password(users_db, monkeypatch):
+    add_user(users_db, 1, 'secret password', rounds=5)
+
+    def unavailable(*args):
+        raise HasherBusy("Password hashing workers are unavailable")
+
+    monkeypatch.setattr(auth.hasher, 'verify', unavailable)
+
+    with pytest.raises(HasherBusy):
+        auth.authenticate_user('user1', 'secret password')
+
+
+@pytest.mark.parametrize('message, key', [
+    ("Duplicate entry 'ana' for key 'users.username'", 'username'),  # MySQL 8
+    ("Duplicate entry 'a@b.co' for key 'email'", 'email'),  # MySQL 5.7
+    ("Duplicate entry 'x' for key 'PRIMARY'", 'PRIMARY'),
+])
+def test_duplicate_key_name_reads_the_key_from_the_message(message, key):
+    assert auth.duplicate_key_name(IntegrityError(msg=message, errno=auth.ER_DUP_ENTRY)) == key
+
+
+def test_duplicate_key_name_ignores_other_errors():
+    assert auth.duplicate_key_name(OperationalError(msg="for key 'users.username'", errno=2013)) is None
+    assert auth.duplicate_key_name(ValueError("for key 'username'")) is None
+
+
+@pytest.mark.parametrize('username, email, message', [
+    ('user1', 'new@example.com', auth.DUPLICATE_KEY_MESSAGES['username']),
+    ('newname', 'user1@example.com', auth.DUPLICATE_KEY_MESSAGES['email']),
+])
+def test_signup_with_a_taken_value_names_the_field(users_db, username, email, message):
+    add_user(users_db, 1, 'secret password', rounds=4)
+
+    with pytest.raises(auth.AuthError) as raised:
+        auth.create_user(username, email, 'another password1')
+
+    assert str(raised.value) == message
+    assert list(users_db.tables['users']) == [1]
+
+
+def test_unknown_unique_key_gives_a_generic_error(fake_db):
+    def insert(*params):
+        raise IntegrityError(msg="Duplicate entry 'x' for key 'users.PRIMARY'", errno=1062)
+
+    fake_db.on(r"^INSERT INTO users ", insert)
+
+    with pytest.raises(auth.AuthError, match='^Failed to create user'):
+        auth.insert_user(fake_db.session(), 'ana', 'a@b.co', 'hash')
+
+
+def test_bulk_signup_skips_duplicates_and_keeps_the_rest(users_db):
+    add_user(users_db, 1, 'secret password', rounds=4)
+
+    created, errors = auth.create_users([
+        {'username': 'ana', 'email': 'ana@example.com', 'password': 'another password1'},
+        {'username': 'bob', 'email': 'user1@example.com', 'password': 'another password1'},
+        {'username': 'ana', 'email': 'ana2@example.com', 'password': 'another password1'},
+    ])
+
+    assert [user['username'] for user in created] == ['ana']
+    assert errors == [('bob', auth.DUPLICATE_KEY_MESSAGES['email']), ('ana', auth.DUPLICATE_KEY_MESSAGES['username'])]
+    assert sorted(row['username'] for row in users_db.tables['users'].values()) == ['ana', 'user1']
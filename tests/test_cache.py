@@ -0,0 +1,120 @@
+import time
+
+import pytest
+
+import cache
+from cache import Cache, InvalidationBus, MemoryBackend, viewer_scope
+
+
+@pytest.fixture
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(cache.cache, 'backend', MemoryBackend())
+    return cache.cache
+
+
+def test_memory_backend_expires_entries():
+    backend = MemoryBackend(max_entries=10)
+    backend.set('a', 1, ttl=0.05)
+    assert backend.get('a') == 1
+    time.sleep(0.06)
+    assert backend.get('a') is None
+
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = MemoryBackend(max_entries=2)
+    backend.set('a', 1, ttl=60)
+    backend.set('b', 2, ttl=60)
+    backend.get('a')
+    backend.set('c', 3, ttl=60)
+
+    assert backend.get('a') == 1
+    assert backend.get('b') is None
+    assert backend.stats()['evictions'] == 1
+
+
+def test_only_if_absent_keeps_existing_value():
+    backend = MemoryBackend()
+    assert backend.set('gen', 1, ttl=60, only_if_absent=True)
+    assert not backend.set('gen', 2, ttl=60, only_if_absent=True)
+    assert backend.get('gen') == 1
+
+
+def test_invalidating_a_scope_hides_its_keys_only():
+    c = Cache(MemoryBackend(), prefix='t:')
+    mine = c.key('feed', viewer_scope(1), 'page')
+    theirs = c.key('feed', viewer_scope(2), 'page')
+    c.set(mine, 'mine', 60)
+    c.set(theirs, 'theirs', 60)
+
+    c.invalidate(viewer_scope(1))
+
+    assert c.get(c.key('feed', viewer_scope(1), 'page')) is None
+    assert c.get(c.key('feed', viewer_scope(2), 'page')) == 'theirs'
+
+
+def test_get_or_load_calls_loader_once_and_counts_hits():
+    c = Cache(MemoryBackend(), prefix='t:')
+    calls = []
+    key = c.key('feed', viewer_scope(1))
+
+    def load():
+        calls.append(1)
+        return {'posts': []}
+
+    assert c.get_or_load(key, load, 60) == {'posts': []}
+    assert c.get_or_load(key, load, 60) == {'posts': []}
+    assert len(calls) == 1
+    assert c.stats()['namespaces']['feed'] == {'hits': 1, 'misses': 1, 'errors': 0, 'hit_rate': 0.5}
+
+
+def test_unreachable_backend_skips_the_cache():
+    class Broken(MemoryBackend):
+        def get(self, key):
+            raise ConnectionError("down")
+
+    c = Cache(Broken(), prefix='t:')
+    key = c.key('feed', viewer_scope(1))
+    assert key is None
+    assert c.get_or_load(key, lambda: 'fresh', 60) == 'fresh'
+
+
+def test_bus_publishes_only_after_commit(fake_db):
+    bus = InvalidationBus()
+    seen = []
+    bus.subscribe('followed', lambda **data: seen.append(data))
+
+    with fake_db.session() as dbs:
+        bus.publish_on_commit(dbs, 'followed', follower_id=1, following_id=2)
+        assert seen == []
+    assert seen == [{'follower_id': 1, 'following_id': 2}]
+
+    session = fake_db.session()
+    bus.publish_on_commit(session, 'followed', follower_id=3, following_id=4)
+    session.close(commit=False)
+    assert len(seen) == 1
+
+
+def test_failing_handler_does_not_stop_the_others():
+    bus = InvalidationBus()
+    seen = []
+    bus.subscribe('post_liked', lambda **data: 1 / 0)
+    bus.subscribe('post_liked', lambda **data: seen.append(data['post_id']))
+
+    bus.publish('post_liked', user_id=1, post_id=9)
+
+    assert seen == [9]
+
+
+@pytest.mark.parametrize('event, data, invalidated', [
+    ('post_liked', {'user_id': 1, 'post_id': 9}, {1}),
+    ('followed', {'follower_id': 1, 'following_id': 2}, {1}),
+    ('post_created', {'user_id': 2, 'viewer_ids': [1, 2, 3]}, {1, 2, 3}),
+    ('profile_updated', {'user_id': 2, 'viewer_ids': [1, 3]}, {1, 2, 3}),
+])
+def test_default_subscriptions_invalidate_affected_viewers(fresh_cache, event, data, invalidated):
+    before = {user_id: fresh_cache.generation(viewer_scope(user_id)) for user_id in (1, 2, 3, 4)}
+
+    cache.bus.publish(event, **data)
+
+    changed = {user_id for user_id in before if fresh_cache.generation(viewer_scope(user_id)) != before[user_id]}
+    assert changed == invalidated
@@ -0,0 +1,74 @@
+import sqlite3
+
+import pytest
+
+import comment_previews
+from comment_previews import latest_comments
+
+
+@pytest.fixture
+def comments_db(fake_db):
+    """
+    fake_db answering preview queries from an in-memory SQLite copy of its tables
+
+    Post 1 has five comments (two tie on created_at), post 2 has one, post 3 none.
+    """
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    conn.executescript("""
+        CREATE TABLE users (id INTEGER PRIMARY KEY, username TEXT);
+        CREATE TABLE comments (id INTEGER PRIMARY KEY, post_id INTEGER, user_id INTEGER,
+                               comment_text TEXT, created_at TEXT);
+        INSERT INTO users VALUES (1, 'ana'), (2, 'bo');
+        INSERT INTO comments VALUES
+            (1, 1, 1, 'first', '2024-05-01 09:00:00'),
+            (2, 1, 2, 'second', '2024-05-01 10:00:00'),
+            (3, 1, 1, 'third', '2024-05-01 11:00:00'),
+            (4, 1, 2, 'fourth', '2024-05-01 12:00:00'),
+            (5, 1, 1, 'fifth', '2024-05-01 12:00:00'),
+            (6, 2, 2, 'only', '2024-05-01 08:00:00');
+    """)
+
+    def run_in_sqlite(*params):
+        sql, _ = fake_db.statements[-1]
+        # SQLite does not accept parenthesized UNION members, but does accept subqueries
+        sql = sql.replace('(SELECT c.id', 'SELECT * FROM (SELECT c.id')
+        return [dict(row) for row in conn.execute(sql.replace('%s', '?'), params)]
+
+    fake_db.on(r"FROM comments c INNER JOIN users u", run_in_sqlite)
+    yield fake_db
+    conn.close()
+
+
+def texts(previews, post_id):
+    return [row['comment_text'] for row in previews.get(post_id, [])]
+
+
+def test_each_post_gets_its_newest_comments_only(comments_db):
+    previews = latest_comments(comments_db, [1, 2, 3], per_post=3)
+
+    assert texts(previews, 1) == ['fifth', 'fourth', 'third']
+    assert texts(previews, 2) == ['only']
+    assert 3 not in previews
+
+
+def test_limit_defaults_to_config(comments_db, monkeypatch):
+    monkeypatch.setattr(comment_previews.Config, 'FEED_COMMENT_PREVIEWS', 2)
+
+    previews = latest_comments(comments_db, [1])
+
+    assert texts(previews, 1) == ['fifth', 'fourth']
+    # The limit is applied in the database, per post
+    assert comments_db.statements[-1][1] == (1, 2)
+
+
+def test_duplicate_ids_query_each_post_once(comments_db):
+    latest_comments(comments_db, [2, 1, 2], per_post=1)
+
+    assert comments_db.statements[-1][1] == (2, 1, 1, 1)
+
+
+@pytest.mark.parametrize('post_ids, per_post', [([], 3), ([1], 0)])
+def test_nothing_to_preview_runs_no_query(comments_db, post_ids, per_post):
+    assert latest_comments(comments_db, post_ids, per_post=per_post) == {}
+    assert comments_db.statements == []
@@ -0,0 +1,196 @@
+import sqlite3
+
+import pytest
+
+import counters
+import likes
+import timeline
+from conftest import login
+
+
+@pytest.fixture
+def post(posts_db):
+    posts_db.tables['posts'][10] = {'likes_count': 5, 'comments_count': 1}
+    return 10
+
+
+def make_hot(monkeypatch, threshold=3):
+    tracker = counters.HotPostTracker(threshold=threshold, window=60, hold=60)
+    monkeypatch.setattr(counters, 'hot_posts', tracker)
+    return tracker
+
+
+def test_tracker_promotes_after_threshold_and_holds():
+    tracker = counters.HotPostTracker(threshold=3, window=60, hold=60)
+
+    assert [tracker.record(1) for _ in range(4)] == [False, False, True, True]
+    assert not tracker.record(2)
+    assert tracker.stats() == {'hot_posts': 1, 'tracked_posts': 1, 'promotions': 1}
+
+
+def test_hot_post_updates_land_on_shards(posts_db, post, monkeypatch):
+    make_hot(monkeypatch)
+
+    for user_id in range(1, 6):
+        with posts_db.session() as dbs:
+            likes.like_post(dbs, user_id, post)
+
+    # The first two updates went to the row, the rest to shards
+    assert posts_db.tables['posts'][post]['likes_count'] == 7
+    assert sum(d[0] for d in posts_db.tables['post_counter_shards'].values()) == 3
+    assert counters.get_post_counters(posts_db, post) == {'likes_count': 10, 'comments_count': 1}
+
+
+def test_folding_moves_shards_into_posts(posts_db, post, monkeypatch):
+    make_hot(monkeypatch, threshold=1)
+    for user_id in range(1, 21):
+        counters.adjust_post_counters(posts_db, post, likes=1)
+    counters.adjust_post_counters(posts_db, post, likes=-1, comments=2)
+
+    assert counters.fold_counter_shards(posts_db, batch_size=4) >= 1
+
+    assert posts_db.tables['post_counter_shards'] == {}
+    assert posts_db.tables['posts'][post] == {'likes_count': 24, 'comments_count': 3}
+    assert counters.get_post_counters(posts_db, post) == {'likes_count': 24, 'comments_count': 3}
+
+
+def test_fold_with_no_shards_does_nothing(posts_db, post):
+    assert counters.fold_counter_shards(posts_db) == 0
+    assert posts_db.tables['posts'][post] == {'likes_count': 5, 'comments_count': 1}
+
+
+@pytest.fixture
+def sqlite_posts():
+    conn = sqlite3.connect(':memory:')
+    conn.create_function('GREATEST', 2, max)
+    conn.executescript("""
+        CREATE TABLE posts (id INTEGER PRIMARY KEY, likes_count INTEGER, comments_count INTEGER);
+        CREATE TABLE post_counter_shards (post_id INTEGER, shard INTEGER, likes_delta INTEGER,
+                                          comments_delta INTEGER, PRIMARY KEY (post_id, shard));
+        INSERT INTO posts VALUES (1, 10, 2), (2, 3, 0), (3, 1, 1);
+        INSERT INTO post_counter_shards VALUES (1, 0, 4, 1), (1, 7, 2, 0), (3, 2, -5, 0);
+    """)
+    yield conn
+    conn.close()
+
+
+def test_list_columns_add_unfolded_shards(sqlite_posts):
+    rows = sqlite_posts.execute(
+        f"SELECT p.id, {counters.post_counter_columns('p')} FROM posts p ORDER BY p.id"
+    ).fetchall()
+
+    # Post 3's shards would take it below zero; the count is clamped
+    assert rows == [(1, 16, 3), (2, 3, 0), (3, 0, 1)]
+
+
+def test_list_queries_select_the_shard_sums(fake_db):
+    fake_db.on(r"FROM timeline_entries te", lambda *params: [])
+
+    timeline.read_timeline(fake_db, 1, 10)
+
+    sql, _ = fake_db.ran(r"FROM timeline_entries te")[0]
+    assert counters.post_counter_columns('p') in sql
+
+
+def test_profile_grid_selects_the_shard_sums(app_client, fake_db):
+    fake_db.on(r"FROM posts p WHERE p.user_id = %s", lambda *params: [])
+    login(app_client, 1)
+
+    assert app_client.get('/api/user/2/posts').status_code == 200
+
+    sql, _ = fake_db.ran(r"FROM posts p WHERE p.user_id = %s")[0]
+    assert counters.post_counter_columns('p') in sql
+
+
+def test_cold_post_updates_the_row_in_place(posts_db, post):
+    counters.adjust_post_counters(posts_db, post, likes=1)
+    counters.adjust_post_counters(posts_db, post, comments=1)
+
+    assert posts_db.tables['posts'][post] == {'likes_count': 6, 'comments_count': 2}
+    assert posts_db.tables['post_counter_shards'] == {}
+
+
+def test_zero_delta_runs_no_statement(posts_db, post):
+    assert counters.adjust_post_counters(posts_db, post) == 0
+    assert posts_db.statements == []
+
+
+def test_counters_never_go_below_zero(posts_db, post):
+    counters.adjust_post_counters(posts_db, post, likes=-10, comments=-10)
+
+    assert counters.get_post_counters(posts_db, post) == {'likes_count': 0, 'comments_count': 0}
+
+
+def test_missing_post_reads_as_zero(posts_db):
+    assert counters.get_post_counters(posts_db, 999) == {'likes_count': 0, 'comments_count': 0}
+
+
+@pytest.fixture
+def reconcile_db(posts_db):
+    """posts_db plus the statements reconcile_post_counters() runs"""
+    tables = posts_db.tables
+    tables['comments'] = []
+
+    def in_range(post_id, start, end):
+        return start <= post_id < end
+
+    def delete_shards(start, end):
+        doomed = [key for key in tables['post_counter_shards'] if in_range(key[0], start, end)]
+        for key in doomed:
+            del tables['post_counter_shards'][key]
+        return len(doomed)
+
+    def recount(*params):
+        start, end = params[-2:]
+        fixed = 0
+        for post_id, row in tables['posts'].items():
+            if not in_range(post_id, start, end):
+                continue
+            counts = {
+                'likes_count': sum(1 for _, pid in tables['likes'] if pid == post_id),
+                'comments_count': tables['comments'].count(post_id),
+            }
+            if counts != row:
+                row.update(counts)
+                fixed += 1
+        return fixed
+
+    posts_db.before_bounds = []
+
+    def bounds():
+        for hook in posts_db.before_bounds:
+            hook()
+        return [{'lo': min(tables['posts'], default=None), 'hi': max(tables['posts'], default=None)}]
+
+    (posts_db
+        .on(r"^SELECT MIN\(id\) AS lo, MAX\(id\) AS hi FROM posts", bounds)
+        .on(r"^SELECT post_id FROM post_counter_shards WHERE post_id >= %s AND post_id < %s FOR UPDATE",
+            lambda start, end: [{'post_id': pid} for pid, _ in tables['post_counter_shards'] if in_range(pid, start, end)])
+        .on(r"^DELETE FROM post_counter_shards WHERE post_id >= %s AND post_id < %s", delete_shards)
+        .on(r"^UPDATE posts p LEFT JOIN", recount))
+    return posts_db
+
+
+def test_reconcile_fixes_drift_and_discards_counted_shards(reconcile_db, post):
+    reconcile_db.tables['likes'] = {(1, post), (2, post)}
+    reconcile_db.tables['post_counter_shards'][(post, 3)] = [1, 0]
+
+    assert counters.reconcile_post_counters(reconcile_db, batch_size=5) == 1
+
+    assert counters.get_post_counters(reconcile_db, post) == {'likes_count': 2, 'comments_count': 0}
+
+
+def test_like_sharded_while_reconcile_runs_is_counted_once(reconcile_db, post, monkeypatch):
+    make_hot(monkeypatch, threshold=1)
+    reconcile_db.tables['likes'] = {(1, post)}
+
+    def like_arrives():
+        # A hot-post like commits (like row + shard) after reconcile has started
+        with reconcile_db.session() as dbs:
+            likes.like_post(dbs, 2, post)
+
+    reconcile_db.before_bounds.append(like_arrives)
+
+    counters.reconcile_post_counters(reconcile_db)
+
+    assert counters.get_post_counters(reconcile_db, post) == {'likes_count': 2, 'comments_count': 0}
@@ -0,0 +1,188 @@
+import threading
+import time
+
+import pytest
+from mysql.connector.errors import PoolError
+
+from database import ConnectionPool, DatabaseSession
+from fakes import FakeConnection
+
+
+def make_pool(**kwargs):
+    kwargs.setdefault('idle_timeout', 0)  # no reaper thread unless a test asks for one
+    return ConnectionPool(FakeConnection, **kwargs)
+
+
+# -- pool checkout and reaping -------------------------------------------
+
+def test_released_connections_are_reused():
+    pool = make_pool(min_size=0, max_size=2)
+
+    first = pool.acquire()
+    pool.release(first)
+    second = pool.acquire()
+
+    assert second is first
+    assert pool.stats()['created'] == 1
+    assert pool.stats()['borrows'] == 2
+
+
+def test_warm_up_opens_min_size_connections():
+    pool = make_pool(min_size=3, max_size=5)
+    pool.warm_up()
+
+    stats = pool.stats()
+    assert (stats['size'], stats['idle'], stats['in_use']) == (3, 3, 0)
+
+
+def test_checkout_times_out_when_the_pool_is_exhausted():
+    pool = make_pool(min_size=0, max_size=1)
+    pool.acquire()
+
+    with pytest.raises(PoolError, match="Timed out"):
+        pool.acquire(timeout=0.05)
+    assert pool.stats()['timeouts'] == 1
+
+
+def test_waiting_checkout_gets_the_released_connection():
+    pool = make_pool(min_size=0, max_size=1)
+    held = pool.acquire()
+    got = []
+
+    waiter = threading.Thread(target=lambda: got.append(pool.acquire(timeout=2)))
+    waiter.start()
+    time.sleep(0.05)
+    pool.release(held)
+    waiter.join()
+
+    assert got == [held]
+    assert pool.stats()['wait_time_max'] > 0
+
+
+def test_unhealthy_idle_connection_is_replaced_on_checkout():
+    pool = make_pool(min_size=0, max_size=1, ping_interval=0)
+    stale = pool.acquire()
+    pool.release(stale)
+    stale.healthy = False
+
+    fresh = pool.acquire()
+
+    assert fresh is not stale
+    assert stale.closed
+    assert pool.stats()['health_check_failures'] == 1
+    assert pool.stats()['size'] == 1
+
+
+def test_release_rolls_back_an_open_transaction():
+    pool = make_pool(min_size=0, max_size=1)
+    conn = pool.acquire()
+    conn.autocommit = False
+    conn.cursor().execute("ADD a")
+
+    pool.release(conn)
+
+    assert conn.rows == [] and not conn.closed
+
+
+def test_reaper_closes_idle_connections_above_min_size():
+    pool = make_pool(min_size=1, max_size=3, idle_timeout=0.05)
+    conns = [pool.acquire() for _ in range(3)]
+    for conn in conns:
+        pool.release(conn)
+
+    assert pool.reap_idle() == 0  # not idle long enough yet
+    time.sleep(0.06)
+    assert pool.reap_idle() == 2
+
+    stats = pool.stats()
+    assert (stats['size'], stats['idle'], stats['closed']) == (1, 1, 2)
+    # The most recently used connection is the one kept
+    assert [conn.closed for conn in conns] == [True, True, False]
+
+
+def test_closed_pool_refuses_checkouts():
+    pool = make_pool(min_size=0, max_size=1)
+    pool.release(pool.acquire())
+    pool.close_all()
+
+    with pytest.raises(PoolError, match="closed"):
+        pool.acquire()
+    pool.reopen()
+    assert pool.acquire() is not None
+
+
+# -- sessions and savepoints ---------------------------------------------
+
+class _Database:
+    def __init__(self, pool):
+        self.pool = pool
+
+
+@pytest.fixture
+def pool():
+    return make_pool(min_size=0, max_size=1)
+
+
+def open_session(pool):
+    return DatabaseSession(_Database(pool))
+
+
+def test_session_commits_on_close_and_returns_the_connection(pool):
+    dbs = open_session(pool)
+    dbs.execute_query("ADD a")
+    dbs.execute_query("ADD b")
+    assert pool.stats()['in_use'] == 1
+
+    dbs.close()
+
+    conn = pool.acquire()
+    assert conn.committed == ['a', 'b']
+    assert conn.autocommit is True
+    assert dbs.lastrowid == 2
+
+
+def test_failed_transaction_block_rolls_back_only_its_own_writes(pool):
+    with open_session(pool) as dbs:
+        dbs.execute_query("ADD before")
+        with pytest.raises(ValueError):
+            with dbs.transaction():
+                dbs.execute_query("ADD inside")
+                raise ValueError("boom")
+        with dbs.transaction():
+            dbs.execute_query("ADD after")
+
+    assert pool.acquire().committed == ['before', 'after']
+
+
+def test_nested_transactions_use_distinct_savepoints(pool):
+    with open_session(pool) as dbs:
+        with dbs.transaction():
+            dbs.execute_query("ADD outer")
+            with pytest.raises(ValueError):
+                with dbs.transaction():
+                    dbs.execute_query("ADD inner")
+                    raise ValueError("boom")
+
+    conn = pool.acquire()
+    assert conn.committed == ['outer']
+    assert [s for s in conn.statements if 'SAVEPOINT' in s] == [
+        'SAVEPOINT sp_1', 'SAVEPOINT sp_2', 'ROLLBACK TO SAVEPOINT sp_2', 'RELEASE SAVEPOINT sp_1',
+    ]
+
+
+def test_on_commit_callbacks_run_only_after_commit(pool):
+    seen = []
+    with open_session(pool) as dbs:
+        dbs.execute_query("ADD a")
+        dbs.on_commit(lambda: seen.append('committed'))
+        assert seen == []
+    assert seen == ['committed']
+
+    with pytest.raises(ValueError):
+        with open_session(pool) as dbs:
+            dbs.execute_query("ADD b")
+            dbs.on_commit(lambda: seen.append('rolled back'))
+            raise ValueError("boom")
+
+    assert seen == ['committed']
+    assert pool.acquire().committed == ['a']
@@ -0,0 +1,110 @@
+from datetime import datetime
+
+import pytest
+
+import cache
+
+from conftest import login
+
+
+def post_row(post_id, image_status='ready'):
+    return {
+        'id': post_id, 'user_id': 2, 'image_url': f"media/ab/{'a' * 64}_full.webp",
+        'image_status': image_status, 'caption': '', 'created_at': datetime(2024, 1, post_id),
+        'likes_count': 0, 'comments_count': 0,
+        'username': 'author', 'profile_pic': 'default.jpg', 'full_name': '',
+    }
+
+
+@pytest.fixture
+def feed_db(fake_db):
+    fake_db.tables['timeline'] = []
+    fake_db.tables['timeline_seeds'] = set()
+    # What rebuild_timeline() would copy in from follows and posts
+    fake_db.tables['history'] = []
+
+    def mark_seeded(owner_id):
+        if owner_id in fake_db.tables['timeline_seeds']:
+            return 0
+        fake_db.tables['timeline_seeds'].add(owner_id)
+        return 1
+
+    def rebuild(*params):
+        fake_db.tables['timeline'] = sorted(
+            {row['id']: row for row in fake_db.tables['timeline'] + fake_db.tables['history']}.values(),
+            key=lambda row: row['id'], reverse=True
+        )
+        return len(fake_db.tables['timeline'])
+
+    (fake_db
+        .on(r"^SELECT 1 FROM timeline_seeds WHERE owner_id = %s",
+            lambda owner_id: [{'1': 1}] if owner_id in fake_db.tables['timeline_seeds'] else [])
+        .on(r"^INSERT IGNORE INTO timeline_seeds \(owner_id\) VALUES", mark_seeded)
+        .on(r"^DELETE FROM timeline_entries WHERE owner_id = %s$", lambda owner_id: 0)
+        .on(r"^INSERT IGNORE INTO timeline_entries .* ROW_NUMBER\(\)", rebuild)
+        .on(r"FROM timeline_entries te", lambda *params: list(fake_db.tables['timeline']))
+        .on(r"^SELECT post_id FROM likes", lambda *params: [])
+        .on(r"FROM comments c", lambda *params: []))
+    return fake_db
+
+
+def timeline_reads(fake):
+    return len(fake.ran(r"FROM timeline_entries te"))
+
+
+def test_feed_is_cached_per_viewer(app_client, feed_db):
+    feed_db.tables['timeline'] = [post_row(2), post_row(1)]
+    login(app_client, 1)
+
+    first = app_client.get('/api/feed').get_json()
+    second = app_client.get('/api/feed').get_json()
+
+    assert [p['id'] for p in first['posts']] == [2, 1]
+    assert second == first
+    assert timeline_reads(feed_db) == 1
+
+
+def test_feed_with_processing_images_is_not_cached(app_client, feed_db):
+    feed_db.tables['timeline'] = [post_row(2, 'processing'), post_row(1)]
+    login(app_client, 1)
+
+    first = app_client.get('/api/feed').get_json()
+    assert first['posts'][0]['image_status'] == 'processing'
+    feed_db.tables['timeline'][0]['image_status'] = 'ready'
+    second = app_client.get('/api/feed').get_json()
+
+    assert second['posts'][0]['image_status'] == 'ready'
+    assert timeline_reads(feed_db) == 2
+
+
+def test_empty_timeline_is_seeded_once(app_client, feed_db):
+    login(app_client, 1)
+
+    for _ in range(3):
+        assert app_client.get('/api/feed').get_json()['posts'] == []
+        cache.cache.invalidate(cache.viewer_scope(1))
+
+    assert feed_db.tables['timeline_seeds'] == {1}
+    assert len(feed_db.ran(r"ROW_NUMBER\(\)")) == 1
+    assert timeline_reads(feed_db) == 3
+
+
+def test_unseeded_timeline_with_a_fanned_out_post_is_still_seeded(app_client, feed_db):
+    # A followed account posted after the upgrade, before this user's first visit
+    feed_db.tables['timeline'] = [post_row(3)]
+    feed_db.tables['history'] = [post_row(2), post_row(1)]
+    login(app_client, 1)
+
+    posts = app_client.get('/api/feed').get_json()['posts']
+
+    assert [p['id'] for p in posts] == [3, 2, 1]
+    assert feed_db.tables['timeline_seeds'] == {1}
+
+
+def test_seeded_timeline_is_never_rebuilt(app_client, feed_db):
+    feed_db.tables['timeline_seeds'] = {1}
+    feed_db.tables['history'] = [post_row(1)]
+    login(app_client, 1)
+
+    assert app_client.get('/api/feed').get_json()['posts'] == []
+    assert not feed_db.ran(r"ROW_NUMBER\(\)")
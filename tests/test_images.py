@@ -0,0 +1,101 @@
+import io
+import os
+
+import pytest
+from PIL import Image
+
+import images
+
+
+@pytest.fixture(autouse=True)
+def small_variants(monkeypatch):
+    monkeypatch.setattr(images, 'VARIANTS', {'thumb': 16, 'feed': 32, 'full': 64})
+
+
+def image_bytes(size, mode='RGB', fmt='PNG', color='red', **save_args):
+    buffer = io.BytesIO()
+    Image.new(mode, size, color).save(buffer, fmt, **save_args)
+    buffer.seek(0)
+    return buffer
+
+
+def open_variant(directory, file_name):
+    with Image.open(os.path.join(directory, file_name)) as image:
+        image.load()
+        return image
+
+
+def test_variants_are_width_bounded_webp(tmp_path):
+    written = images.ingest_image(image_bytes((100, 50)), str(tmp_path), 'key')
+
+    assert written == {name: f'key_{name}.webp' for name in ('thumb', 'feed', 'full')}
+    sizes = {name: open_variant(tmp_path, file_name).size for name, file_name in written.items()}
+    assert sizes == {'thumb': (16, 8), 'feed': (32, 16), 'full': (64, 32)}
+    assert {open_variant(tmp_path, file_name).format for file_name in written.values()} == {'WEBP'}
+
+
+def test_small_images_are_not_upscaled(tmp_path):
+    written = images.ingest_image(image_bytes((20, 10)), str(tmp_path), 'key')
+
+    assert open_variant(tmp_path, written['thumb']).size == (16, 8)
+    assert open_variant(tmp_path, written['full']).size == (20, 10)
+
+
+def test_exif_orientation_is_applied_and_metadata_dropped(tmp_path):
+    exif = Image.Exif()
+    exif[0x0112] = 6  # rotate 90 degrees clockwise
+    upload = image_bytes((60, 30), fmt='JPEG', exif=exif.tobytes())
+
+    written = images.ingest_image(upload, str(tmp_path), 'key')
+
+    full = open_variant(tmp_path, written['full'])
+    assert full.size == (30, 60)
+    assert not full.getexif()
+
+
+def test_transparency_is_kept(tmp_path):
+    written = images.ingest_image(image_bytes((20, 20), mode='RGBA', color=(255, 0, 0, 128)), str(tmp_path), 'key')
+
+    assert open_variant(tmp_path, written['full']).mode == 'RGBA'
+
+
+@pytest.mark.parametrize('check', [
+    lambda upload, tmp_path: images.check_image(upload),
+    lambda upload, tmp_path: images.ingest_image(upload, str(tmp_path), 'key'),
+])
+def test_images_over_max_pixels_are_rejected(tmp_path, monkeypatch, check):
+    monkeypatch.setattr(images.Config, 'IMAGE_MAX_PIXELS', 100 * 50 - 1)
+
+    with pytest.raises(images.ImageError, match='too large'):
+        check(image_bytes((100, 50)), tmp_path / 'out')
+    assert not (tmp_path / 'out').exists()
+
+
+def test_check_image_rewinds_and_rejects_non_images():
+    upload = image_bytes((10, 10))
+    images.check_image(upload)
+    assert upload.tell() == 0
+
+    with pytest.raises(images.ImageError, match='Unsupported'):
+        images.check_image(io.BytesIO(b'not an image'))
+
+
+def test_ingest_file_writes_next_to_the_original_once(images_dir):
+    os.makedirs(images_dir / 'posts')
+    (images_dir / 'posts' / 'abc.png').write_bytes(image_bytes((100, 50)).getvalue())
+
+    assert images.ingest_file('posts/abc.png') == 'posts/abc_full.webp'
+    assert sorted(os.listdir(images_dir / 'posts')) == [
+        'abc.png', 'abc_feed.webp', 'abc_full.webp', 'abc_thumb.webp'
+    ]
+    # Already processed: the original is not decoded again
+    (images_dir / 'posts' / 'abc.png').write_bytes(b'corrupt')
+    assert images.ingest_file('posts/abc.png') == 'posts/abc_full.webp'
+
+
+def test_variant_paths_derive_from_the_full_path():
+    assert images.variant_paths('posts/abc_full.webp') == {
+        'thumb': 'posts/abc_thumb.webp', 'feed': 'posts/abc_feed.webp', 'full': 'posts/abc_full.webp'
+    }
+    assert images.variant_paths('posts/legacy.jpg') is None
+    assert images.variant_paths(None) is None
@@ -0,0 +1,83 @@
+import sqlite3
+
+import pytest
+
+import inbox
+from conftest import login
+
+
+@pytest.fixture
+def inbox_db(fake_db):
+    """
+    fake_db answering inbox queries from an in-memory SQLite copy of its tables
+
+    User 1 talks to 2 (conversation 10), 3 (11) and 4 (12, no messages yet).
+    Conversations 11 and 12 tie on last_activity_at.
+    """
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    conn.executescript("""
+        CREATE TABLE users (id INTEGER PRIMARY KEY, username TEXT, full_name TEXT, profile_pic TEXT);
+        CREATE TABLE conversations (id INTEGER PRIMARY KEY, last_message_id INTEGER);
+        CREATE TABLE conversation_members (conversation_id INTEGER, user_id INTEGER, last_activity_at TEXT);
+        CREATE TABLE messages (id INTEGER PRIMARY KEY, conversation_id INTEGER, sender_id INTEGER,
+                               message_text TEXT, image_url TEXT, created_at TEXT);
+        INSERT INTO users (id, username) VALUES (1, 'me'), (2, 'ana'), (3, 'bo'), (4, 'cy');
+        INSERT INTO messages VALUES
+            (100, 10, 2, 'older', NULL, '2024-05-01 09:00:00'),
+            (101, 10, 1, 'newest', NULL, '2024-05-01 12:00:00'),
+            (102, 11, 3, 'hi', NULL, '2024-05-01 10:00:00');
+        INSERT INTO conversations VALUES (10, 101), (11, 102), (12, NULL);
+        INSERT INTO conversation_members VALUES
+            (10, 1, '2024-05-01 12:00:00'), (10, 2, '2024-05-01 12:00:00'),
+            (11, 1, '2024-05-01 10:00:00'), (11, 3, '2024-05-01 10:00:00'),
+            (12, 1, '2024-05-01 10:00:00'), (12, 4, '2024-05-01 10:00:00');
+    """)
+
+    def run_in_sqlite(*params):
+        sql, _ = fake_db.statements[-1]
+        return [dict(row) for row in conn.execute(sql.replace('%s', '?'), params)]
+
+    fake_db.on(r"FROM conversation_members cm INNER JOIN conversations c", run_in_sqlite)
+    yield fake_db
+    conn.close()
+
+
+def test_inbox_is_ordered_by_latest_activity_then_id(inbox_db):
+    rows = inbox.list_inbox(inbox_db, 1)
+
+    assert [(row['conversation_id'], row['other_username']) for row in rows] == [(10, 'ana'), (12, 'cy'), (11, 'bo')]
+
+
+def test_inbox_rows_carry_the_last_message(inbox_db):
+    rows = {row['conversation_id']: row for row in inbox.list_inbox(inbox_db, 1)}
+
+    assert (rows[10]['last_message_text'], rows[10]['last_sender_username']) == ('newest', 'me')
+    assert rows[12]['last_message_id'] is None
+
+
+def test_inbox_pages_through_tied_activity(inbox_db):
+    first = inbox.list_inbox(inbox_db, 1, limit=2)
+    last = first[-1]
+
+    rest = inbox.list_inbox(inbox_db, 1, limit=2, after=(last['last_activity_at'], last['conversation_id']))
+
+    assert [row['conversation_id'] for row in first + rest] == [10, 12, 11]
+
+
+def test_inbox_entry_is_none_for_non_members(inbox_db):
+    assert inbox.get_inbox_entry(inbox_db, 11, 3)['other_username'] == 'me'
+    assert inbox.get_inbox_entry(inbox_db, 11, 2) is None
+
+
+def test_conversations_endpoint_formats_the_last_message(app_client, inbox_db):
+    login(app_client, 2)
+
+    body = app_client.get('/api/messages/conversations').get_json()
+
+    assert [c['id'] for c in body['conversations']] == [10]
+    conversation = body['conversations'][0]
+    assert conversation['other_user']['username'] == 'me'
+    assert conversation['last_message']['message_text'] == 'newest'
+    assert conversation['last_message']['sender_username'] == 'me'
+    assert body['next_cursor'] is None
@@ -0,0 +1,136 @@
+import pytest
+
+import counters
+import likes
+from conftest import login
+
+
+@pytest.fixture
+def post(posts_db):
+    posts_db.tables['posts'][10] = {'likes_count': 0, 'comments_count': 0}
+    return 10
+
+
+def test_liking_twice_adds_one_like(posts_db, post):
+    with posts_db.session() as dbs:
+        assert likes.like_post(dbs, 1, post)
+        assert not likes.like_post(dbs, 1, post)
+
+    assert posts_db.tables['likes'] == {(1, post)}
+    assert posts_db.tables['posts'][post]['likes_count'] == 1
+
+
+def test_unliking_twice_removes_one_like(posts_db, post):
+    with posts_db.session() as dbs:
+        likes.like_post(dbs, 1, post)
+        likes.like_post(dbs, 2, post)
+        assert likes.unlike_post(dbs, 1, post)
+        assert not likes.unlike_post(dbs, 1, post)
+
+    assert posts_db.tables['likes'] == {(2, post)}
+    assert posts_db.tables['posts'][post]['likes_count'] == 1
+
+
+def test_liking_a_missing_post_raises(posts_db):
+    with posts_db.session() as dbs:
+        with pytest.raises(likes.PostNotFound):
+            likes.like_post(dbs, 1, 404)
+
+    assert posts_db.tables['likes'] == set()
+    assert not posts_db.ran(r"^INSERT IGNORE INTO likes")
+
+
+def statements_on_posts(fake):
+    """Kinds of statement run against posts and likes, in order"""
+    kinds = []
+    for sql, _ in fake.statements:
+        if sql.startswith('UPDATE posts'):
+            kinds.append('update posts')
+        elif 'LOCK IN SHARE MODE' in sql:
+            kinds.append('share lock')
+        elif sql.startswith('INSERT IGNORE INTO likes'):
+            kinds.append('insert like')
+        elif sql.startswith('INSERT INTO post_counter_shards'):
+            kinds.append('shard')
+    return kinds
+
+
+def test_cold_like_takes_the_exclusive_lock_before_inserting(posts_db, post):
+    with posts_db.session() as dbs:
+        likes.like_post(dbs, 1, post)
+
+    # No shared lock to upgrade, so concurrent likes queue instead of deadlocking
+    assert statements_on_posts(posts_db) == ['update posts', 'insert like']
+
+
+def test_cold_duplicate_like_reverts_its_count(posts_db, post):
+    with posts_db.session() as dbs:
+        likes.like_post(dbs, 1, post)
+        likes.like_post(dbs, 1, post)
+
+    assert statements_on_posts(posts_db)[2:] == ['update posts', 'insert like', 'update posts']
+    assert posts_db.tables['posts'][post]['likes_count'] == 1
+
+
+def test_hot_like_never_writes_the_posts_row(posts_db, post, monkeypatch):
+    monkeypatch.setattr(counters, 'hot_posts', counters.HotPostTracker(threshold=1, window=60, hold=60))
+
+    with posts_db.session() as dbs:
+        likes.like_post(dbs, 1, post)
+        likes.like_post(dbs, 1, post)
+
+    assert statements_on_posts(posts_db) == ['share lock', 'insert like', 'shard', 'share lock', 'insert like']
+    assert counters.get_post_counters(posts_db, post)['likes_count'] == 1
+
+
+def test_write_behind_counts_once_after_commit(posts_db, post, monkeypatch):
+    monkeypatch.setattr(likes.Config, 'LIKE_WRITE_BEHIND', True)
+    buffer = likes.LikeCounterBuffer(interval=60)
+    monkeypatch.setattr(likes, 'buffer', buffer)
+
+    session = posts_db.session()
+    likes.like_post(session, 1, post)
+    likes.like_post(session, 1, post)
+    assert buffer.pending(post) == 0
+    session.close(commit=True)
+    assert buffer.pending(post) == 1
+    assert likes.likes_count(posts_db, post) == 1
+
+    assert buffer.flush(posts_db) == 1
+    assert posts_db.tables['posts'][post]['likes_count'] == 1
+    assert buffer.pending(post) == 0
+
+
+def test_rolled_back_like_is_not_buffered(posts_db, post, monkeypatch):
+    monkeypatch.setattr(likes.Config, 'LIKE_WRITE_BEHIND', True)
+    buffer = likes.LikeCounterBuffer(interval=60)
+    monkeypatch.setattr(likes, 'buffer', buffer)
+
+    session = posts_db.session()
+    likes.like_post(session, 1, post)
+    session.close(commit=False)
+
+    assert buffer.pending(post) == 0
+    assert posts_db.tables['likes'] == set()
+
+
+@pytest.mark.parametrize('method', ['PUT', 'POST'])
+def test_like_route_returns_404_for_a_missing_post(app_client, posts_db, method):
+    login(app_client, 1)
+
+    response = app_client.open('/api/posts/404/like', method=method)
+
+    assert response.status_code == 404
+    assert response.get_json() == {'error': 'Post not found'}
+
+
+def test_repeated_put_is_idempotent(app_client, posts_db, post):
+    login(app_client, 1)
+
+    for _ in range(2):
+        response = app_client.put(f'/api/posts/{post}/like')
+        assert response.status_code == 200
+        assert response.get_json() == {'success': True, 'is_liked': True, 'likes_count': 1}
+
+    response = app_client.delete(f'/api/posts/{post}/like')
+    assert response.get_json() == {'success': True, 'is_liked': False, 'likes_count': 0}
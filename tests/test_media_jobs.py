@@ -0,0 +1,110 @@
+import io
+import os
+
+import pytest
+from PIL import Image
+
+import cache
+import images
+import media_jobs
+import media_store
+import server_sessions
+
+
+def png_bytes(color='red'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (40, 30), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def jobs(media_db, images_dir, monkeypatch):
+    monkeypatch.setattr(media_jobs, 'db', media_db)
+    monkeypatch.setattr(cache.cache, 'backend', cache.MemoryBackend())
+    media_db.tables['follows'] = set()
+    media_db.on(r"^SELECT follower_id FROM follows WHERE following_id = %s",
+                lambda user_id: [{'follower_id': a} for a, b in media_db.tables['follows'] if b == user_id])
+    return media_db
+
+
+def upload_post(fake, post_id, data):
+    """Store an upload and queue its job, as the post route does"""
+    with fake.session() as dbs:
+        path = media_store.store_file(dbs, io.BytesIO(data), 'photo.png')
+    fake.tables['posts'][post_id] = {'image_url': path, 'image_status': 'processing'}
+    job = {'id': post_id, 'target_type': 'post', 'target_id': post_id, 'source_path': path, 'attempts': 1}
+    fake.tables['media_jobs'][post_id] = dict(job, status='queued')
+    return job
+
+
+def run_job(fake, job):
+    fake.tables['media_jobs'][job['id']]['status'] = 'running'
+    media_jobs.complete_job(job, images.ingest_file(job['source_path']))
+
+
+def test_identical_uploads_share_one_original(jobs):
+    data = png_bytes()
+    first = upload_post(jobs, 1, data)
+    second = upload_post(jobs, 2, data)
+
+    assert first['source_path'] == second['source_path']
+    assert jobs.tables['media'][media_store.digest_of(first['source_path'])]['ref_count'] == 2
+
+
+def test_first_job_repoints_every_row_sharing_the_original(jobs):
+    data = png_bytes()
+    first = upload_post(jobs, 1, data)
+    upload_post(jobs, 2, data)
+
+    run_job(jobs, first)
+
+    full_path = f"{os.path.splitext(first['source_path'])[0]}_full.webp"
+    for post_id in (1, 2):
+        assert jobs.tables['posts'][post_id] == {'image_url': full_path, 'image_status': 'ready'}
+    assert os.path.exists(os.path.join(images.IMAGES_DIR, full_path))
+    assert not os.path.exists(os.path.join(images.IMAGES_DIR, first['source_path']))
+    # The second job had nothing left to do
+    assert jobs.tables['media_jobs'][2]['status'] == 'done'
+
+
+def test_original_kept_while_another_job_is_reading_it(jobs):
+    data = png_bytes()
+    first = upload_post(jobs, 1, data)
+    second = upload_post(jobs, 2, data)
+    jobs.tables['media_jobs'][2]['status'] = 'running'
+    original = os.path.join(images.IMAGES_DIR, first['source_path'])
+
+    run_job(jobs, first)
+    assert os.path.exists(original)
+
+    run_job(jobs, second)
+    assert not os.path.exists(original)
+    assert jobs.tables['posts'][2]['image_status'] == 'ready'
+
+
+def test_rows_changed_since_the_upload_are_left_alone(jobs):
+    first = upload_post(jobs, 1, png_bytes())
+    jobs.tables['users'][7] = {'profile_pic': 'profiles/other.jpg'}
+
+    run_job(jobs, first)
+
+    assert jobs.tables['users'][7] == {'profile_pic': 'profiles/other.jpg'}
+
+
+def test_processed_profile_picture_invalidates_followers(jobs):
+    with jobs.session() as dbs:
+        path = media_store.store_file(dbs, io.BytesIO(png_bytes('blue')), 'me.png')
+    jobs.tables['users'][5] = {'profile_pic': path}
+    jobs.tables['follows'] = {(6, 5), (7, 5)}
+    job = {'id': 1, 'target_type': 'profile', 'target_id': 5, 'source_path': path, 'attempts': 1}
+    jobs.tables['media_jobs'][1] = dict(job, status='running')
+    server_sessions.session_store.put_user_snapshot(5, {'profile_pic': path}, 0)
+    scopes = {user_id: cache.cache.generation(cache.viewer_scope(user_id)) for user_id in (5, 6, 7, 8)}
+
+    media_jobs.complete_job(job, images.ingest_file(path))
+
+    assert jobs.tables['users'][5]['profile_pic'].endswith('_full.webp')
+    assert server_sessions.session_store.get_user_snapshot(5) is None
+    for user_id in (5, 6, 7):
+        assert cache.cache.generation(cache.viewer_scope(user_id)) != scopes[user_id]
+    assert cache.cache.generation(cache.viewer_scope(8)) == scopes[8]
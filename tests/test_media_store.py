@@ -0,0 +1,156 @@
+import io
+import os
+import time
+
+import images
+import media_store
+
+
+def store(fake, data, filename='photo.jpg', commit=True):
+    session = fake.session()
+    path = media_store.store_file(session, io.BytesIO(data), filename)
+    session.close(commit=commit)
+    return path
+
+
+def blob_exists(path):
+    return os.path.exists(os.path.join(images.IMAGES_DIR, path))
+
+
+def tmp_files():
+    tmp_dir = os.path.join(images.IMAGES_DIR, media_store.MEDIA_FOLDER, media_store.TMP_FOLDER)
+    return os.listdir(tmp_dir) if os.path.isdir(tmp_dir) else []
+
+
+def test_identical_content_is_stored_once(media_db, images_dir):
+    first = store(media_db, b'same bytes', 'a.jpg')
+    second = store(media_db, b'same bytes', 'b.png')
+
+    assert first == second
+    assert first.endswith('.jpg')
+    assert media_store.is_media_path(first)
+    assert media_db.tables['media'][media_store.digest_of(first)]['ref_count'] == 2
+    assert blob_exists(first)
+    assert tmp_files() == []
+
+
+def test_blob_appears_only_after_commit(media_db, images_dir):
+    session = media_db.session()
+    path = media_store.store_file(session, io.BytesIO(b'new content'), 'a.jpg')
+    assert not blob_exists(path)
+
+    session.close(commit=True)
+    assert blob_exists(path)
+    assert tmp_files() == []
+
+
+def test_rolled_back_upload_leaves_no_blob(media_db, images_dir):
+    path = store(media_db, b'rolled back', commit=False)
+
+    assert not blob_exists(path)
+    assert media_db.tables['media'] == {}
+    # Only the temp file is left, and garbage collection removes it
+    assert len(tmp_files()) == 1
+    media_store.collect_garbage(media_db, grace_seconds=0)
+    assert tmp_files() == []
+
+
+def test_recent_temp_files_survive_collection(media_db, images_dir):
+    store(media_db, b'in flight', commit=False)
+
+    media_store.collect_garbage(media_db, grace_seconds=3600)
+
+    assert len(tmp_files()) == 1
+
+
+def test_processed_content_returns_full_variant(media_db, images_dir):
+    original = store(media_db, b'processed')
+    full = f"{os.path.splitext(original)[0]}_full.webp"
+    open(os.path.join(images.IMAGES_DIR, full), 'wb').close()
+
+    assert store(media_db, b'processed') == full
+    assert media_db.tables['media'][media_store.digest_of(full)]['ref_count'] == 2
+
+
+def test_release_and_garbage_collection(media_db, images_dir):
+    path = store(media_db, b'shared')
+    media_store.add_ref(media_db, path)
+    digest = media_store.digest_of(path)
+
+    media_store.release_many(media_db, [path, path, 'posts/legacy.jpg'])
+    assert media_db.tables['media'][digest]['ref_count'] == 0
+
+    # Within the grace period the blob stays
+    assert media_store.collect_garbage(media_db, grace_seconds=3600) == 0
+    assert blob_exists(path)
+
+    media_db.tables['media'][digest]['expired'] = True
+    assert media_store.collect_garbage(media_db, grace_seconds=3600) == 1
+    assert not blob_exists(path)
+    assert digest not in media_db.tables['media']
+
+
+def test_referenced_blobs_are_never_collected(media_db, images_dir):
+    path = store(media_db, b'kept')
+    media_db.tables['media'][media_store.digest_of(path)]['expired'] = True
+
+    assert media_store.collect_garbage(media_db, grace_seconds=0) == 0
+    assert blob_exists(path)
+
+
+def released_blob(fake):
+    """Store content, drop its only reference and let its grace period run out"""
+    path = store(fake, b'released')
+    media_store.release(fake, path)
+    fake.tables['media'][media_store.digest_of(path)]['expired'] = True
+    return path
+
+
+def test_upload_of_collected_content_stores_it_again(media_db, images_dir, monkeypatch):
+    path = released_blob(media_db)
+    execute_query = media_db.execute_query
+
+    def collect_first(query, params=None):
+        # The collector commits just before the upload looks its content up
+        monkeypatch.setattr(media_db, 'execute_query', execute_query)
+        media_store.collect_garbage(media_db, grace_seconds=3600)
+        return execute_query(query, params)
+
+    monkeypatch.setattr(media_db, 'execute_query', collect_first)
+
+    assert store(media_db, b'released') == path
+    assert media_db.tables['media'][media_store.digest_of(path)]['ref_count'] == 1
+    assert blob_exists(path)
+    assert tmp_files() == []
+
+
+def test_collector_running_after_an_upload_found_the_blob_keeps_it(media_db, images_dir, monkeypatch):
+    path = released_blob(media_db)
+    exists = os.path.exists
+
+    def collect_after_check(candidate):
+        # The collector runs once the upload has seen the blob on disk and dropped its temp copy
+        found = exists(candidate)
+        if found and candidate.endswith(path):
+            monkeypatch.setattr(os.path, 'exists', exists)
+            media_store.collect_garbage(media_db, grace_seconds=3600)
+        return found
+
+    monkeypatch.setattr(os.path, 'exists', collect_after_check)
+
+    assert store(media_db, b'released') == path
+    assert media_db.tables['media'][media_store.digest_of(path)]['ref_count'] == 1
+    assert blob_exists(path)
+
+
+def test_collector_thread_runs_collect_garbage(monkeypatch):
+    calls = []
+    monkeypatch.setattr(media_store, 'collect_garbage', lambda: calls.append(1))
+    collector = media_store.MediaCollector(interval=0.01)
+    collector.start()
+    deadline = time.monotonic() + 2
+    while not calls and time.monotonic() < deadline:
+        time.sleep(0.01)
+    collector.stop()
+
+    assert calls
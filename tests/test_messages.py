@@ -0,0 +1,64 @@
+import sqlite3
+
+import pytest
+
+from conftest import login
+
+
+@pytest.fixture
+def messages_db(fake_db):
+    """
+    fake_db answering the membership lookup from an in-memory SQLite copy of its tables
+
+    Conversation 1 predates inbox.py's backfill, so its last_message_id is NULL.
+    """
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    conn.executescript("""
+        CREATE TABLE conversations (id INTEGER PRIMARY KEY, last_message_id INTEGER);
+        CREATE TABLE conversation_members (conversation_id INTEGER, user_id INTEGER);
+        CREATE TABLE messages (id INTEGER PRIMARY KEY, conversation_id INTEGER);
+        INSERT INTO conversations VALUES (1, NULL);
+        INSERT INTO conversation_members VALUES (1, 1), (1, 2);
+        INSERT INTO messages VALUES (1, 1), (2, 1);
+    """)
+
+    def run_in_sqlite(*params):
+        sql, _ = fake_db.statements[-1]
+        return [dict(row) for row in conn.execute(sql.replace('%s', '?'), params)]
+
+    (fake_db
+        .on(r"FROM conversation_members cm INNER JOIN conversations c", run_in_sqlite)
+        .on(r"FROM messages m INNER JOIN users u", lambda *params: []))
+    fake_db.sqlite = conn
+    yield fake_db
+    conn.close()
+
+
+def etag(client):
+    return client.get('/api/messages/conversations/1/messages?after_id=2').headers['ETag']
+
+
+def test_etag_tracks_new_messages_before_the_inbox_backfill(app_client, messages_db):
+    login(app_client, 1)
+    first = etag(app_client)
+
+    messages_db.sqlite.execute("INSERT INTO messages VALUES (3, 1)")
+
+    assert etag(app_client) != first
+
+
+def test_unchanged_conversation_answers_304(app_client, messages_db):
+    login(app_client, 1)
+    url = '/api/messages/conversations/1/messages?after_id=2'
+    tag = app_client.get(url).headers['ETag']
+
+    response = app_client.get(url, headers={'If-None-Match': tag})
+
+    assert response.status_code == 304
+
+
+def test_non_members_get_404(app_client, messages_db):
+    login(app_client, 3)
+
+    assert app_client.get('/api/messages/conversations/1/messages').status_code == 404
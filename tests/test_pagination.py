@@ -0,0 +1,75 @@
+import random
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from conftest import login
+from pagination import CursorError, decode_cursor, encode_cursor, keyset_condition, paginate, parse_limit
+
+
+def test_cursor_round_trips_datetimes_and_ids():
+    cursor = encode_cursor(datetime(2024, 5, 1, 12, 30, 15), 42)
+
+    assert decode_cursor(cursor, 2) == (datetime(2024, 5, 1, 12, 30, 15), 42)
+    assert decode_cursor(None, 2) is None
+    assert decode_cursor('', 2) is None
+
+
+@pytest.mark.parametrize('cursor', ['not base64!', encode_cursor(1), encode_cursor(1, 2, 3), 'W3siYSI6MX0sMV0'])
+def test_malformed_cursors_are_rejected(cursor):
+    with pytest.raises(CursorError):
+        decode_cursor(cursor, 2)
+
+
+def test_keyset_condition_sql():
+    sql, params = keyset_condition([('p.created_at', 'desc'), ('p.id', 'desc')], ('t', 7))
+
+    assert sql == "(p.created_at < %s OR (p.created_at = %s AND p.id < %s))"
+    assert params == ['t', 't', 7]
+
+
+def test_parse_limit_clamps():
+    assert [parse_limit(v, 20, 50) for v in (None, '', 'x', '0', '-3', '10', '999')] == [20, 20, 20, 1, 1, 10, 50]
+
+
+@pytest.mark.parametrize('directions', [('desc', 'desc'), ('desc', 'asc'), ('asc', 'asc')])
+def test_paging_visits_every_row_once_despite_ties(directions):
+    rng = random.Random(7)
+    rows = [(rng.randint(1, 5), row_id) for row_id in range(1, 41)]  # many equal scores
+    conn = sqlite3.connect(':memory:')
+    conn.execute("CREATE TABLE t (score INTEGER, id INTEGER PRIMARY KEY)")
+    conn.executemany("INSERT INTO t VALUES (?, ?)", rows)
+    columns = list(zip(('score', 'id'), directions))
+    order = ', '.join(f"{column} {direction.upper()}" for column, direction in columns)
+
+    seen, cursor, limit = [], None, 7
+    while True:
+        after = decode_cursor(cursor, 2)
+        where, params = keyset_condition(columns, after) if after else ('1 = 1', [])
+        page = conn.execute(
+            f"SELECT score, id FROM t WHERE {where} ORDER BY {order} LIMIT ?".replace('%s', '?'),
+            (*params, limit + 1)
+        ).fetchall()
+        page, cursor = paginate(page, limit, lambda row: row)
+        seen.extend(page)
+        if cursor is None:
+            break
+
+    assert seen == conn.execute(f"SELECT score, id FROM t ORDER BY {order}").fetchall()
+    assert len(seen) == 40
+
+
+def test_paginate_only_returns_a_cursor_when_more_rows_exist():
+    assert paginate([1, 2], 2, lambda r: (r,)) == ([1, 2], None)
+    page, cursor = paginate([1, 2, 3], 2, lambda r: (r,))
+    assert page == [1, 2] and decode_cursor(cursor, 1) == (2,)
+
+
+def test_routes_reject_a_bad_cursor(app_client):
+    login(app_client, 1)
+
+    response = app_client.get('/api/user/2/posts?cursor=garbage')
+
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Invalid cursor'}
@@ -0,0 +1,104 @@
+import threading
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import passwords
+from passwords import HasherBusy, PasswordHasher
+
+
+def test_inline_hash_and_verify():
+    hasher = PasswordHasher(workers=0, max_pending=2)
+    hashed = hasher.hash('correct horse', rounds=4)
+
+    assert hashed.startswith('$2b$04$')
+    assert hasher.verify('correct horse', hashed)
+    assert not hasher.verify('wrong horse', hashed)
+    assert hasher.stats()['completed'] == 3
+
+
+def test_saturated_hasher_rejects_with_hasher_busy():
+    hasher = PasswordHasher(workers=0, max_pending=1, queue_timeout=0.01)
+    running, release = threading.Event(), threading.Event()
+
+    def slow():
+        running.set()
+        release.wait(2)
+
+    worker = threading.Thread(target=hasher._run, args=(slow,))
+    worker.start()
+    running.wait(2)
+    with pytest.raises(HasherBusy):
+        hasher._run(lambda: None)
+    release.set()
+    worker.join()
+
+    assert hasher.stats()['rejected'] == 1
+    assert hasher._run(lambda: 'free again') == 'free again'
+
+
+class FakeExecutor:
+    """ProcessPoolExecutor double whose futures fail with BrokenProcessPool when `broken`"""
+
+    def __init__(self, broken):
+        self.broken = broken
+        self.shut_down = False
+
+    def submit(self, fn, *args):
+        executor = self
+
+        class Future:
+            def result(self):
+                if executor.broken:
+                    raise BrokenProcessPool("A child process terminated abruptly")
+                return fn(*args)
+        return Future()
+
+    def shutdown(self, wait=True):
+        self.shut_down = True
+
+
+def hasher_with_executors(monkeypatch, *executors):
+    created = list(executors)
+    hasher = PasswordHasher(workers=1, max_pending=2)
+    monkeypatch.setattr(passwords, 'ProcessPoolExecutor', lambda **kwargs: created.pop(0))
+    return hasher
+
+
+def test_broken_pool_is_replaced_and_the_call_retried(monkeypatch):
+    broken, fresh = FakeExecutor(broken=True), FakeExecutor(broken=False)
+    hasher = hasher_with_executors(monkeypatch, broken, fresh)
+
+    assert hasher._run(lambda: 'hashed') == 'hashed'
+    assert broken.shut_down
+    assert hasher._executor is fresh
+    assert hasher.stats()['pool_restarts'] == 1
+    # Later calls keep using the new pool
+    assert hasher._run(lambda: 'again') == 'again'
+
+
+def test_pool_that_keeps_breaking_raises_hasher_busy(monkeypatch):
+    hasher = hasher_with_executors(monkeypatch, FakeExecutor(True), FakeExecutor(True), FakeExecutor(False))
+
+    with pytest.raises(HasherBusy):
+        hasher._run(lambda: 'hashed')
+    # The next request gets a working pool
+    assert hasher._run(lambda: 'hashed') == 'hashed'
+
+
+@pytest.mark.parametrize('password_hash, rounds', [
+    ('$2b$12$' + 'a' * 53, 12),
+    ('$2b$04$' + 'a' * 53, 4),
+    ('not a bcrypt hash', None),
+    (None, None),
+])
+def test_hash_rounds(password_hash, rounds):
+    assert passwords.hash_rounds(password_hash) == rounds
+
+
+def test_needs_rehash_compares_with_configured_cost(monkeypatch):
+    monkeypatch.setattr(passwords.Config, 'BCRYPT_ROUNDS', 12)
+
+    assert not passwords.needs_rehash('$2b$12$' + 'a' * 53)
+    assert passwords.needs_rehash('$2b$10$' + 'a' * 53)
+    assert passwords.needs_rehash('legacy')
@@ -0,0 +1,78 @@
+import sqlite3
+
+import pytest
+
+from conftest import login
+
+
+@pytest.fixture
+def people_db(fake_db):
+    """fake_db answering people-you-may-know from an in-memory SQLite copy of its tables"""
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    conn.executescript("""
+        CREATE TABLE users (id INTEGER PRIMARY KEY, username TEXT, full_name TEXT, profile_pic TEXT, bio TEXT);
+        CREATE TABLE user_stats (user_id INTEGER PRIMARY KEY, followers_count INTEGER,
+                                 following_count INTEGER, posts_count INTEGER);
+        CREATE TABLE follows (follower_id INTEGER, following_id INTEGER);
+        CREATE TABLE user_recommendations (user_id INTEGER, position INTEGER,
+                                           candidate_id INTEGER, mutual_count INTEGER);
+        INSERT INTO users (id, username) VALUES (1, 'me'), (2, 'popular'), (3, 'followed'),
+                                                (4, 'quiet'), (5, 'brand_new'), (6, 'newer');
+        INSERT INTO user_stats VALUES (1, 0, 1, 0), (2, 50, 0, 3), (3, 9, 0, 1), (4, 0, 0, 0);
+        INSERT INTO follows VALUES (1, 3);
+    """)
+
+    def run_in_sqlite(*params):
+        sql, _ = fake_db.statements[-1]
+        return [dict(row) for row in conn.execute(sql.replace('%s', '?'), params)]
+
+    (fake_db
+        .on(r"^SELECT 1 FROM user_recommendations", run_in_sqlite)
+        .on(r"FROM user_recommendations r", run_in_sqlite)
+        .on(r"FROM users u LEFT JOIN user_stats us", run_in_sqlite))
+    fake_db.sqlite = conn
+    yield fake_db
+    conn.close()
+
+
+def page(client, cursor=None, limit=2):
+    query = f'?limit={limit}' + (f'&cursor={cursor}' if cursor else '')
+    return client.get(f'/api/people-you-may-know{query}').get_json()
+
+
+def test_fallback_includes_users_without_stats(app_client, people_db):
+    login(app_client, 1)
+
+    body = page(app_client, limit=10)
+
+    assert [u['username'] for u in body['users']] == ['popular', 'quiet', 'brand_new', 'newer']
+    assert body['users'][2]['followers_count'] == 0
+    assert body['next_cursor'] is None
+
+
+def test_fallback_pages_across_users_without_stats(app_client, people_db):
+    login(app_client, 1)
+
+    seen = []
+    cursor = None
+    while True:
+        body = page(app_client, cursor, limit=1)
+        seen.extend(u['username'] for u in body['users'])
+        cursor = body['next_cursor']
+        if not cursor:
+            break
+
+    assert seen == ['popular', 'quiet', 'brand_new', 'newer']
+
+
+def test_stored_candidates_replace_the_fallback_for_their_user_only(app_client, people_db):
+    people_db.sqlite.execute("INSERT INTO user_recommendations VALUES (1, 0, 4, 2), (1, 1, 5, 1)")
+
+    login(app_client, 1)
+    body = page(app_client, limit=10)
+    assert [(u['username'], u['mutual_count']) for u in body['users']] == [('quiet', 2), ('brand_new', 1)]
+
+    # User 3 has no stored candidates, so it still gets the most-followed accounts
+    login(app_client, 3)
+    assert [u['username'] for u in page(app_client, limit=2)['users']] == ['popular', 'me']
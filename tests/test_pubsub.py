@@ -0,0 +1,99 @@
+import pytest
+
+import app as app_module
+from conftest import login
+from pubsub import Broker
+
+
+def test_published_messages_reach_current_subscribers_only():
+    broker = Broker()
+    with broker.subscribe('conversation:1') as subscription:
+        other = broker.subscribe('conversation:2')
+
+        assert broker.publish('conversation:1', {'id': 1}) == 1
+        assert subscription.get(timeout=0) == {'id': 1}
+        assert other.get(timeout=0) is None
+        other.close()
+
+    assert broker.publish('conversation:1', {'id': 2}) == 0
+    assert broker.stats() == {'published': 2, 'delivered': 1, 'dropped': 0, 'topics': 0, 'subscriptions': 0}
+
+
+def test_full_queue_marks_the_subscriber_overflowed():
+    broker = Broker(queue_size=2)
+    subscription = broker.subscribe('conversation:1')
+
+    delivered = [broker.publish('conversation:1', {'id': i}) for i in range(3)]
+
+    assert delivered == [1, 1, 0]
+    assert subscription.overflowed
+    assert broker.stats()['dropped'] == 1
+
+
+@pytest.fixture
+def stream_client(app_client, fake_db, monkeypatch):
+    """app_client with user 1 in conversation 7, whose stored messages are ids 1..5"""
+    fake_db.tables['after'] = []
+
+    def messages_after(conversation_id, after_id, limit):
+        fake_db.tables['after'].append(after_id)
+        return [
+            {'id': i, 'sender_id': 2, 'message_text': f'm{i}', 'image_url': None,
+             'created_at': None, 'username': 'ana', 'profile_pic': None}
+            for i in range(after_id + 1, 6)
+        ][:limit]
+
+    (fake_db
+        .on(r"^SELECT 1 FROM conversation_members", lambda conversation_id, user_id: [{'1': 1}] if user_id == 1 else [])
+        .on(r"FROM messages m INNER JOIN users u", messages_after))
+    monkeypatch.setattr(app_module, 'broker', Broker(queue_size=2))
+    login(app_client, 1)
+    return app_client
+
+
+def open_stream(client, **headers):
+    return client.get('/api/messages/conversations/7/stream', headers=headers, buffered=False)
+
+
+def event_ids(chunks):
+    return [int(line[4:]) for chunk in chunks for line in chunk.decode().splitlines() if line.startswith('id: ')]
+
+
+def test_reconnect_replays_the_backlog_after_last_event_id(stream_client, fake_db, monkeypatch):
+    # A backlog that fills the limit ends the stream so the next reconnect resumes from it
+    monkeypatch.setattr(app_module.Config, 'SSE_BACKLOG_LIMIT', 2)
+
+    response = open_stream(stream_client, **{'Last-Event-ID': '2'})
+
+    assert response.mimetype == 'text/event-stream'
+    assert event_ids(response.response) == [3, 4]
+    assert fake_db.tables['after'] == [2]
+    assert app_module.broker.stats()['subscriptions'] == 0
+
+
+def test_published_message_is_pushed_to_an_open_stream(stream_client):
+    response = open_stream(stream_client, **{'Last-Event-ID': '5'})
+    chunks = iter(response.response)
+    assert next(chunks).startswith(b'retry: ')
+
+    app_module.broker.publish('conversation:7', {'id': 6, 'message_text': 'live'})
+
+    assert event_ids([next(chunks)]) == [6]
+    response.close()
+    assert app_module.broker.stats()['subscriptions'] == 0
+
+
+def test_overflowing_subscriber_is_disconnected(stream_client):
+    response = open_stream(stream_client)
+    for i in range(3):
+        app_module.broker.publish('conversation:7', {'id': i + 6})
+
+    # The stream ends without events; the client reconnects with its Last-Event-ID
+    assert event_ids(response.response) == []
+    assert app_module.broker.stats()['subscriptions'] == 0
+
+
+def test_non_members_cannot_open_the_stream(stream_client):
+    login(stream_client, 3)
+
+    assert open_stream(stream_client).status_code == 404
@@ -0,0 +1,144 @@
+import sqlite3
+from array import array
+
+import pytest
+
+import recommendations
+
+# follower -> followed, over users 1..7 (7 follows nobody and nobody follows 7)
+FOLLOWS = [
+    (1, 2), (1, 3),
+    (2, 1), (2, 4), (2, 5),
+    (3, 1), (3, 4), (3, 6),
+    (4, 6),
+    (5, 6),
+    (6, 2),
+]
+USERS = [1, 2, 3, 4, 5, 6, 7]
+
+
+def follow_graph():
+    index = {user_id: i for i, user_id in enumerate(USERS)}
+    edges = sorted((index[a], index[b]) for a, b in FOLLOWS)
+    return recommendations.FollowGraph(
+        USERS, array('q', [a for a, _ in edges]), array('q', [b for _, b in edges])
+    )
+
+
+def ranked(graph, rows):
+    """Score rows as {user id: [(candidate id, mutual count), ...]}"""
+    result = {}
+    for u, c, mutual in rows:
+        result.setdefault(graph.user_ids[u], []).append((graph.user_ids[c], int(mutual)))
+    return result
+
+
+def test_python_scoring_ranks_friends_of_friends():
+    graph = follow_graph()
+
+    scored = ranked(graph, recommendations._score_python(graph, 0, len(graph), top_k=2))
+
+    # 4 is followed by both of user 1's follows; 6 beats 5 on follower count
+    assert scored[1] == [(4, 2), (6, 1)]
+    assert scored[4] == [(2, 1)]
+    assert 7 not in scored
+
+
+@pytest.mark.skipif(recommendations.np is None, reason="numpy is not installed")
+@pytest.mark.parametrize('top_k', [1, 2, 10])
+def test_numpy_scoring_matches_python(top_k):
+    np = recommendations.np
+    graph = follow_graph()
+    out_degree = [graph.offsets[i + 1] - graph.offsets[i] for i in range(len(graph))]
+    arrays = (
+        np.frombuffer(graph.offsets, dtype=np.int64),
+        np.frombuffer(graph.targets, dtype=np.int64),
+        np.frombuffer(graph.followers, dtype=np.int64),
+        np.array(out_degree, dtype=np.int64),
+    )
+
+    for lo, hi in [(0, len(graph)), (0, 3), (3, 7)]:
+        assert (recommendations._score_numpy(arrays, lo, hi, top_k)
+                == recommendations._score_python(graph, lo, hi, top_k))
+
+
+@pytest.fixture
+def graph_db(fake_db):
+    """fake_db holding USERS and FOLLOWS and collecting stored recommendations"""
+    tables = fake_db.tables
+    tables['user_recommendations'] = {}
+
+    def follows_after(follower_id, following_id, limit):
+        return [
+            {'follower_id': a, 'following_id': b}
+            for a, b in sorted(FOLLOWS) if (a, b) > (follower_id, following_id)
+        ][:limit]
+
+    def delete_recommendations(*user_ids):
+        for user_id in user_ids:
+            tables['user_recommendations'].pop(user_id, None)
+        return len(user_ids)
+
+    def insert_recommendation(user_id, position, candidate_id, mutual_count):
+        tables['user_recommendations'].setdefault(user_id, []).append((position, candidate_id, mutual_count))
+        return 1
+
+    (fake_db
+        .on(r"^SELECT id FROM users ORDER BY id", lambda: [{'id': user_id} for user_id in USERS])
+        .on(r"^SELECT follower_id, following_id FROM follows", follows_after)
+        .on(r"^DELETE FROM user_recommendations WHERE user_id IN", delete_recommendations)
+        .on(r"^INSERT INTO user_recommendations", insert_recommendation))
+    return fake_db
+
+
+@pytest.mark.parametrize('numpy', [True, False])
+def test_compute_stores_ranked_positions(graph_db, monkeypatch, numpy):
+    if numpy and recommendations.np is None:
+        pytest.skip("numpy is not installed")
+    if not numpy:
+        monkeypatch.setattr(recommendations, 'np', None)
+    # Small blocks so several transactions run
+    monkeypatch.setattr(recommendations.Config, 'RECOMMENDATION_BLOCK_USERS', 2)
+
+    result = recommendations.compute_recommendations(graph_db, top_k=2)
+
+    assert result['engine'] == ('numpy' if numpy else 'python')
+    assert result['users'] == len(USERS) and result['edges'] == len(FOLLOWS)
+    assert graph_db.tables['user_recommendations'][1] == [(0, 4, 2), (1, 6, 1)]
+    assert 7 not in graph_db.tables['user_recommendations']
+
+
+def test_graph_is_read_in_keyset_pages(graph_db):
+    graph = recommendations.load_follow_graph(graph_db, batch_size=4)
+
+    assert len(graph.targets) == len(FOLLOWS)
+    assert len(graph_db.ran(r"FROM follows")) == 3
+    assert [graph.user_ids[i] for i in graph.following(USERS.index(3))] == [1, 4, 6]
+
+
+def test_read_recommendations_skips_accounts_followed_since_the_run(fake_db):
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    conn.executescript("""
+        CREATE TABLE users (id INTEGER PRIMARY KEY, username TEXT, full_name TEXT, profile_pic TEXT, bio TEXT);
+        CREATE TABLE user_stats (user_id INTEGER PRIMARY KEY, followers_count INTEGER,
+                                 following_count INTEGER, posts_count INTEGER);
+        CREATE TABLE follows (follower_id INTEGER, following_id INTEGER);
+        CREATE TABLE user_recommendations (user_id INTEGER, position INTEGER,
+                                           candidate_id INTEGER, mutual_count INTEGER);
+        INSERT INTO users (id, username) VALUES (1, 'me'), (4, 'four'), (5, 'five'), (6, 'six');
+        INSERT INTO user_recommendations VALUES (1, 0, 4, 2), (1, 1, 5, 1), (1, 2, 6, 1);
+        INSERT INTO follows VALUES (1, 5);
+    """)
+
+    def run_in_sqlite(*params):
+        sql, _ = fake_db.statements[-1]
+        return [dict(row) for row in conn.execute(sql.replace('%s', '?'), params)]
+
+    fake_db.on(r"FROM user_recommendations r", run_in_sqlite)
+
+    rows = recommendations.read_recommendations(fake_db, 1, -1, 10)
+
+    assert [(row['position'], row['username']) for row in rows] == [(0, 'four'), (2, 'six')]
+    assert [row['username'] for row in recommendations.read_recommendations(fake_db, 1, 0, 10)] == ['six']
+    conn.close()
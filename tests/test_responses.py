@@ -0,0 +1,88 @@
+import gzip
+import json
+from datetime import datetime
+from decimal import Decimal
+
+import brotli
+import pytest
+from flask import Flask, Response, jsonify
+
+import responses
+from conftest import login
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    responses.init_app(app)
+
+    @app.route('/api/big')
+    def big():
+        return jsonify({'items': [{'id': i, 'at': datetime(2024, 5, 1, 12, 30)} for i in range(200)]})
+
+    @app.route('/api/small')
+    def small():
+        return jsonify({'ok': True})
+
+    @app.route('/api/stream')
+    def stream():
+        return Response((' ' * 2048 for _ in range(2)), mimetype='application/json')
+
+    return app.test_client()
+
+
+def test_requirements_provide_the_fast_encoders():
+    assert responses.encoders() == {'json': 'orjson', 'compression': ['br', 'gzip']}
+
+
+def test_dumps_encodes_database_values():
+    assert json.loads(responses.dumps({
+        'at': datetime(2024, 5, 1, 12, 30),
+        'count': Decimal('3'),
+        'ratio': Decimal('0.5'),
+    })) == {'at': '2024-05-01T12:30:00', 'count': 3, 'ratio': 0.5}
+
+
+def test_large_bodies_prefer_brotli(client):
+    response = client.get('/api/big', headers={'Accept-Encoding': 'gzip, br'})
+
+    assert response.headers['Content-Encoding'] == 'br'
+    body = json.loads(brotli.decompress(response.data))
+    assert body['items'][0] == {'id': 0, 'at': '2024-05-01T12:30:00'}
+
+
+def test_gzip_when_brotli_is_not_accepted(client):
+    response = client.get('/api/big', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert len(json.loads(gzip.decompress(response.data))['items']) == 200
+
+
+def test_small_bodies_are_sent_as_is(client):
+    response = client.get('/api/small', headers={'Accept-Encoding': 'gzip, br'})
+
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_json() == {'ok': True}
+
+
+def test_streamed_bodies_are_not_compressed(client):
+    response = client.get('/api/stream', headers={'Accept-Encoding': 'gzip, br'})
+
+    assert 'Content-Encoding' not in response.headers
+    assert len(response.data) == 4096
+
+
+def test_followings_for_messages_is_not_streamed(app_client, fake_db):
+    fake_db.on(r"FROM follows f INNER JOIN users u", lambda *params: [
+        {'id': 2, 'username': 'ana', 'full_name': 'Ana', 'profile_pic': None, 'conversation_id': 5},
+    ])
+    login(app_client, 1)
+
+    response = app_client.get('/api/messages/following')
+
+    # A streamed body has no Content-Length
+    assert response.headers.get('Content-Length')
+    assert response.get_json() == {'users': [{
+        'id': 2, 'username': 'ana', 'full_name': 'Ana',
+        'profile_pic': '/assets/images/profiles/default.jpg', 'conversation_id': 5,
+    }]}
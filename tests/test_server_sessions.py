@@ -0,0 +1,88 @@
+import threading
+import time
+
+from flask import Flask
+
+import server_sessions
+
+
+def test_sessions_round_trip(session_store):
+    session_store.save('abc', {'user_id': 1, 'logged_in': True}, time.time() + 60)
+
+    assert session_store.load('abc')[0] == {'user_id': 1, 'logged_in': True}
+    session_store.delete('abc')
+    assert session_store.load('abc') is None
+
+
+def test_expired_rows_are_purged(session_store):
+    session_store.save('old', {'user_id': 1}, time.time() - 1)
+    session_store.save('new', {'user_id': 1}, time.time() + 60)
+
+    assert session_store.purge_expired() == (1, 0)
+    assert session_store.load('new') is not None
+
+
+def test_connections_are_reused_across_threads(session_store, monkeypatch):
+    opened = []
+    connect = session_store._connect
+
+    def counting_connect():
+        opened.append(1)
+        return connect()
+
+    monkeypatch.setattr(session_store, '_connect', counting_connect)
+
+    def work():
+        for _ in range(5):
+            session_store.get_user_snapshot(1)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+        thread.join()
+
+    # Threads run one after another here, so they share a single connection
+    assert len(opened) == 1
+
+
+def test_pool_keeps_at_most_pool_size_idle_connections(tmp_path, monkeypatch):
+    monkeypatch.setattr(server_sessions.Config, 'SESSION_STORE_POOL_SIZE', 1)
+    store = server_sessions.SessionStore(str(tmp_path / 'pool.sqlite3'))
+
+    with store._connection() as first, store._connection() as second:
+        assert first is not second
+    assert len(store._idle) == 1
+    store.close()
+    assert store._idle == []
+
+
+def test_schema_is_created_once(tmp_path, monkeypatch):
+    store = server_sessions.SessionStore(str(tmp_path / 'once.sqlite3'))
+    store.open()
+    # Later connections work without re-running the schema
+    monkeypatch.setattr(server_sessions, '_SCHEMA', 'this is not SQL')
+    store.close()
+
+    store.put_user_snapshot(1, {'username': 'ana'}, 0)
+    assert store.get_user_snapshot(1) == {'username': 'ana'}
+
+
+def test_store_file_is_created_by_init_app_not_on_construction(tmp_path):
+    path = tmp_path / 'lazy.sqlite3'
+    store = server_sessions.SessionStore(str(path))
+    assert not path.exists()
+
+    server_sessions.init_app(Flask(__name__), store)
+    assert path.exists()
+
+
+def test_snapshot_loaded_before_an_invalidation_is_not_cached(session_store):
+    generation = session_store.user_generation(1)
+    # The profile changes (and is invalidated) while the old one is being read
+    session_store.invalidate_user(1)
+
+    assert session_store.put_user_snapshot(1, {'username': 'old'}, generation) is False
+    assert session_store.get_user_snapshot(1) is None
+
+    assert session_store.put_user_snapshot(1, {'username': 'new'}, session_store.user_generation(1))
+    assert session_store.get_user_snapshot(1) == {'username': 'new'}
@@ -0,0 +1,198 @@
+import gzip
+import json
+
+import pytest
+from flask import Flask
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+import static_files
+
+BLOB = 'media/ab/' + 'ab' * 32 + '.jpg'
+
+
+@pytest.fixture
+def static_root(tmp_path, monkeypatch):
+    """Serve static files from an empty temporary app root"""
+    monkeypatch.setattr(static_files, 'ROOT_DIR', str(tmp_path))
+    monkeypatch.setattr(static_files, 'MANIFEST_PATH', str(tmp_path / 'Frontend' / 'manifest.json'))
+    monkeypatch.setattr(static_files, '_manifest', {'mtime': None, 'data': None})
+    monkeypatch.setattr(static_files.Config, 'STATIC_OFFLOAD', '')
+    static_files.resolve.cache_clear()
+    yield tmp_path
+    static_files.resolve.cache_clear()
+
+
+@pytest.fixture
+def client(static_root):
+    (static_root / 'assets' / 'images' / 'media' / 'ab').mkdir(parents=True)
+    (static_root / 'assets' / 'images' / BLOB).write_bytes(b'0123456789')
+    (static_root / 'assets' / 'icons').mkdir()
+    (static_root / 'assets' / 'icons' / 'logo.png').write_bytes(b'logo bytes')
+    (static_root / 'secret.txt').write_bytes(b'outside assets')
+
+    app = Flask(__name__, static_folder=None)
+
+    @app.route('/assets/<path:filename>')
+    def assets(filename):
+        return static_files.send_static('assets', filename)
+
+    return app.test_client()
+
+
+def test_media_blobs_are_immutable_with_their_name_as_etag(client):
+    response = client.get(f'/assets/images/{BLOB}')
+
+    assert response.data == b'0123456789'
+    assert response.headers['Cache-Control'] == static_files.IMMUTABLE_CACHE_CONTROL
+    assert response.get_etag() == ('ab' * 32 + '.jpg', False)
+
+
+def test_other_files_get_a_short_max_age(client, monkeypatch):
+    monkeypatch.setattr(static_files.Config, 'STATIC_MAX_AGE', 60)
+
+    response = client.get('/assets/icons/logo.png')
+
+    assert response.headers['Cache-Control'] == 'public, max-age=60'
+    assert response.get_etag()[0]
+
+
+def test_matching_etag_answers_304(client):
+    etag = client.get('/assets/icons/logo.png').headers['ETag']
+
+    response = client.get('/assets/icons/logo.png', headers={'If-None-Match': etag})
+
+    assert response.status_code == 304
+    assert response.data == b''
+
+
+def test_range_requests_answer_206(client):
+    response = client.get(f'/assets/images/{BLOB}', headers={'Range': 'bytes=2-5'})
+
+    assert response.status_code == 206
+    assert response.data == b'2345'
+    assert response.headers['Content-Range'] == 'bytes 2-5/10'
+
+
+def test_unsatisfiable_range_answers_416(client):
+    response = client.get(f'/assets/images/{BLOB}', headers={'Range': 'bytes=50-60'})
+
+    assert response.status_code == 416
+
+
+@pytest.mark.parametrize('path', ['/assets/icons/missing.png', '/assets/icons', '/assets/..%2Fsecret.txt'])
+def test_missing_directories_and_escapes_are_404(client, path):
+    assert client.get(path).status_code == 404
+
+
+def test_x_accel_redirect_hands_the_body_to_nginx(client, monkeypatch):
+    monkeypatch.setattr(static_files.Config, 'STATIC_OFFLOAD', 'x-accel-redirect')
+    monkeypatch.setattr(static_files.Config, 'STATIC_ACCEL_PREFIX', '/protected/')
+
+    response = client.get(f'/assets/images/{BLOB}')
+
+    assert response.headers['X-Accel-Redirect'] == f'/protected/assets/images/{BLOB}'
+    assert response.data == b''
+    assert response.mimetype == 'image/jpeg'
+    assert response.headers['Cache-Control'] == static_files.IMMUTABLE_CACHE_CONTROL
+
+    revalidated = client.get(f'/assets/images/{BLOB}', headers={'If-None-Match': response.headers['ETag']})
+    assert revalidated.status_code == 304
+    assert 'X-Accel-Redirect' not in revalidated.headers
+
+
+@pytest.fixture
+def built_frontend(static_root, monkeypatch):
+    """A one-page frontend in the temporary root, built by build_frontend.py"""
+    import build_frontend
+
+    frontend = static_root / 'Frontend'
+    for folder in ('html', 'css', 'js'):
+        (frontend / folder).mkdir(parents=True)
+    (frontend / 'html' / 'home.html').write_text(
+        '<head>\n'
+        '    <link rel="stylesheet" href="../css/base.css">\n'
+        '    <link rel="stylesheet" href="../css/home.css">\n'
+        '</head>\n'
+        '<body>\n'
+        '    <script src="../js/api.js"></script>\n'
+        '    <script src="../js/home.js"></script>\n'
+        '</body>\n'
+    )
+    (frontend / 'css' / 'base.css').write_text('/* base */\nbody {\n    margin: 0;\n}\n')
+    (frontend / 'css' / 'home.css').write_text('a:hover {\n    color: red;\n}\n')
+    (frontend / 'js' / 'api.js').write_text('// api\nconst api = 1\n')
+    (frontend / 'js' / 'home.js').write_text('console.log(api);\n')
+    monkeypatch.setattr(build_frontend, 'FRONTEND_DIR', str(frontend))
+    monkeypatch.setattr(build_frontend, 'MANIFEST_PATH', str(frontend / 'manifest.json'))
+    monkeypatch.setattr(static_files.Config, 'USE_FRONTEND_BUNDLES', True)
+    return build_frontend.build()
+
+
+@pytest.fixture
+def frontend_client(built_frontend):
+    app = Flask(__name__, static_folder=None)
+
+    @app.route('/home')
+    def home():
+        return static_files.send_page('home.html')
+
+    @app.route('/<path:filename>')
+    def frontend(filename):
+        location = static_files.frontend_location(filename)
+        if location is None:
+            return '', 404
+        return static_files.send_static(*location)
+
+    return app.test_client()
+
+
+def test_manifest_lists_each_pages_bundles_and_their_encodings(built_frontend, static_root):
+    page = built_frontend['pages']['home.html']
+
+    assert page['css'].startswith('css/bundles/home.') and page['js'].startswith('js/bundles/home.')
+    expected = ['gzip', 'br'] if brotli is not None else ['gzip']
+    assert built_frontend['files'] == {page['css']: expected, page['js']: expected}
+    assert json.loads((static_root / 'Frontend' / 'manifest.json').read_text()) == built_frontend
+
+    bundle = (static_root / 'Frontend' / page['css']).read_bytes()
+    assert bundle == b'body{margin:0}a:hover{color:red}'
+    assert gzip.decompress((static_root / 'Frontend' / (page['css'] + '.gz')).read_bytes()) == bundle
+    rewritten = (static_root / 'Frontend' / 'html' / 'bundles' / 'home.html').read_text()
+    assert rewritten.count('<link') == 1 and f'href="/{page["css"]}"' in rewritten
+    assert rewritten.count('<script') == 1 and f'src="/{page["js"]}"' in rewritten
+
+
+@pytest.mark.parametrize('accept, encoding', [('gzip, br', 'br'), ('gzip', 'gzip'), ('', None)])
+def test_bundles_are_sent_precompressed(frontend_client, built_frontend, static_root, accept, encoding):
+    if encoding == 'br' and brotli is None:
+        pytest.skip("brotli is not installed")
+    rel_path = built_frontend['pages']['home.html']['js']
+
+    response = frontend_client.get(f'/{rel_path}', headers={'Accept-Encoding': accept})
+
+    expected = (static_root / 'Frontend' / rel_path).read_bytes()
+    decode = {'br': lambda data: brotli.decompress(data), 'gzip': gzip.decompress, None: lambda data: data}[encoding]
+    assert response.headers.get('Content-Encoding') == encoding
+    assert decode(response.data) == expected
+    assert response.mimetype in ('text/javascript', 'application/javascript')
+    assert response.headers['Cache-Control'] == static_files.IMMUTABLE_CACHE_CONTROL
+    assert 'Accept-Encoding' in response.headers['Vary']
+
+
+def test_each_encoding_has_its_own_etag(frontend_client, built_frontend):
+    url = '/' + built_frontend['pages']['home.html']['css']
+    gzip_etag = frontend_client.get(url, headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+
+    assert frontend_client.get(url, headers={'Accept-Encoding': 'gzip', 'If-None-Match': gzip_etag}).status_code == 304
+    assert frontend_client.get(url, headers={'If-None-Match': gzip_etag}).status_code == 200
+
+
+def test_pages_use_their_bundled_copy_only_when_enabled(frontend_client, monkeypatch):
+    assert b'/css/bundles/' in frontend_client.get('/home').data
+
+    monkeypatch.setattr(static_files.Config, 'USE_FRONTEND_BUNDLES', False)
+    assert b'../css/base.css' in frontend_client.get('/home').data
@@ -0,0 +1,68 @@
+import io
+import os
+
+import pytest
+
+import images
+import media_store
+import stories
+
+
+@pytest.fixture
+def story_db(media_db, images_dir, monkeypatch):
+    """media_db whose stories rows carry an `expired` flag"""
+    tables = media_db.tables
+
+    def expired_stories(limit):
+        return [
+            {'id': story_id, 'image_url': row['image_url']}
+            for story_id, row in tables['stories'].items() if row['expired']
+        ][:limit]
+
+    def delete_stories(*ids):
+        for story_id in ids:
+            tables['stories'].pop(story_id, None)
+        return len(ids)
+
+    (media_db
+        .on(r"^SELECT id, image_url FROM stories WHERE expires_at <= NOW\(\)", expired_stories)
+        .on(r"^DELETE FROM stories WHERE id IN", delete_stories))
+    monkeypatch.setattr(stories.Config, 'MEDIA_GC_GRACE_SECONDS', 0)
+    return media_db
+
+
+def add_story(fake, story_id, data, expired):
+    with fake.session() as dbs:
+        path = media_store.store_file(dbs, io.BytesIO(data), 'story.jpg')
+    fake.tables['stories'][story_id] = {'image_url': path, 'image_status': 'ready', 'expired': expired}
+    return path
+
+
+def test_sweep_deletes_expired_stories_and_collects_their_blobs(story_db):
+    gone = add_story(story_db, 1, b'old story', expired=True)
+    kept = add_story(story_db, 2, b'live story', expired=False)
+
+    assert stories.purge_expired_stories(story_db, batch_size=10) == 1
+
+    assert list(story_db.tables['stories']) == [2]
+    assert media_store.digest_of(gone) not in story_db.tables['media']
+    assert not os.path.exists(os.path.join(images.IMAGES_DIR, gone))
+    assert os.path.exists(os.path.join(images.IMAGES_DIR, kept))
+
+
+def test_shared_blob_survives_until_its_last_story_expires(story_db):
+    path = add_story(story_db, 1, b'same', expired=True)
+    add_story(story_db, 2, b'same', expired=False)
+
+    stories.purge_expired_stories(story_db, batch_size=1)
+
+    assert os.path.exists(os.path.join(images.IMAGES_DIR, path))
+    assert story_db.tables['media'][media_store.digest_of(path)]['ref_count'] == 1
+
+
+def test_sweep_collects_garbage_even_with_nothing_to_delete(story_db, monkeypatch):
+    calls = []
+    monkeypatch.setattr(media_store, 'collect_garbage', lambda dbs: calls.append(dbs))
+
+    assert stories.purge_expired_stories(story_db) == 0
+    assert calls == [story_db]
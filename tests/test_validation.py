@@ -0,0 +1,65 @@
+import random
+
+import pytest
+
+import validation
+from bench_validation import legacy_sanitize_input
+
+ADVERSARIAL = [
+    "johndoe' OR 1=1 --",
+    "-SELECT-",
+    "-select-",
+    "/SELECT*",
+    "*SELECT/",
+    "x-DROP-p_",
+    "xSELECTp_",
+    "sSELECTp_",
+    "o-r 1=1",
+    "or 1=-1",
+    "an;d 1=1",
+    "a--nd 2=2",
+    "OR/**/1=1",
+    "or;1=1",
+    "o​r 1=1",
+    "SELSELECTECT",
+    "DRDROPOP table",
+    "UNI/**/ON SEL/**/ECT",
+    ";;--;/**/;",
+    "  admin'--  ",
+    "1 OR 1 = 1 AND 2=2",
+    "xp_cmdshell",
+    "x;p_",
+    "s--p_who",
+    "<SCRIPT>alert(1)</SCRIPT>",
+    "EXEC-UTE",
+    "ΣELECT select SELECT",
+    "",
+    "   ",
+    None,
+    42,
+]
+
+TOKENS = ['SELECT', 'select', 'or', 'and', ' ', '1', '=', '-', ';', '/', '*', 'x', 'p', 's', '_', 'a', "'", 'DROP', '\t']
+
+
+def random_corpus(count=3000, seed=20240501):
+    rng = random.Random(seed)
+    return [''.join(rng.choice(TOKENS) for _ in range(rng.randint(1, 12))) for _ in range(count)]
+
+
+@pytest.mark.parametrize('value', ADVERSARIAL)
+def test_sanitize_input_matches_the_legacy_passes(value):
+    assert validation.sanitize_input(value) == legacy_sanitize_input(value)
+
+
+def test_sanitize_input_matches_the_legacy_passes_on_random_input():
+    mismatches = [
+        value for value in random_corpus()
+        if validation.sanitize_input(value) != legacy_sanitize_input(value)
+    ]
+    assert mismatches == []
+
+
+def test_clean_text_keeps_words_and_strips_controls():
+    assert validation.clean_text(' select this;\r\nnow\x00 ', 100) == ('select this;\nnow', None)
+    assert validation.clean_text('x' * 11, 10, 'Bio')[1] == 'Bio must be 10 characters or less'
@@ -0,0 +1,188 @@
+"""
+Materialized home timelines (fan-out on write)
+
+Every post is copied into the `timeline_entries` of its author and each of
+the author's followers when it is created, so reading a home feed is a single
+range scan over (owner_id, created_at, post_id) instead of an IN (...) over
+every followed account.
+
+Timelines that predate fan-out on write are seeded once, on their owner's
+first feed read that finds no `timeline_seeds` row. Emptiness is not the
+test: a fanned-out post can land in a timeline that was never seeded, and the
+owner's history must still be backfilled. `python timeline.py` seeds every
+timeline at once (run it on upgrade and after bulk imports).
+
+All functions take `dbs`, anything with an execute_query() method: the global
+`db` or a request-scoped DatabaseSession.
+"""
+from config import Config
+from database import db
+import counters
+from pagination import keyset_condition
+
+
+def fan_out_post(dbs, post_id):
+    """
+    Push a new post into its author's timeline and every follower's timeline
+
+    Args:
+        dbs: Database or DatabaseSession
+        post_id (int): Newly created post
+
+    Returns:
+        int: Number of timeline entries written
+    """
+    return dbs.execute_query(
+        """
+        INSERT IGNORE INTO timeline_entries (owner_id, post_id, author_id, created_at)
+        SELECT f.follower_id, p.id, p.user_id, p.created_at
+        FROM posts p
+        INNER JOIN follows f ON f.following_id = p.user_id
+        WHERE p.id = %s
+        UNION ALL
+        SELECT p.user_id, p.id, p.user_id, p.created_at
+        FROM posts p
+        WHERE p.id = %s
+        """,
+        (post_id, post_id)
+    )
+
+
+def on_follow(dbs, follower_id, following_id, limit=None):
+    """
+    Backfill the newest posts of a newly followed account into the follower's timeline
+
+    Args:
+        dbs: Database or DatabaseSession
+        follower_id (int): User who followed
+        following_id (int): User being followed
+        limit (int, optional): Max posts to copy (defaults to Config.TIMELINE_BACKFILL_LIMIT)
+    """
+    limit = Config.TIMELINE_BACKFILL_LIMIT if limit is None else limit
+    return dbs.execute_query(
+        """
+        INSERT IGNORE INTO timeline_entries (owner_id, post_id, author_id, created_at)
+        SELECT %s, p.id, p.user_id, p.created_at
+        FROM posts p
+        WHERE p.user_id = %s
+        ORDER BY p.created_at DESC, p.id DESC
+        LIMIT %s
+        """,
+        (follower_id, following_id, limit)
+    )
+
+
+def on_unfollow(dbs, follower_id, following_id):
+    """Remove an unfollowed account's posts from the follower's timeline"""
+    return dbs.execute_query(
+        "DELETE FROM timeline_entries WHERE owner_id = %s AND author_id = %s",
+        (follower_id, following_id)
+    )
+
+
+def rebuild_timeline(dbs, owner_id, limit=None):
+    """
+    Recompute one user's timeline from follows and posts
+
+    Used to seed timelines that predate fan-out on write. Copies at most
+    `limit` posts per followed account (defaults to Config.TIMELINE_BACKFILL_LIMIT).
+    """
+    limit = Config.TIMELINE_BACKFILL_LIMIT if limit is None else limit
+    dbs.execute_query("DELETE FROM timeline_entries WHERE owner_id = %s", (owner_id,))
+    dbs.execute_query(
+        """
+        INSERT IGNORE INTO timeline_entries (owner_id, post_id, author_id, created_at)
+        SELECT %s, ranked.id, ranked.user_id, ranked.created_at
+        FROM (
+            SELECT p.id, p.user_id, p.created_at,
+                   ROW_NUMBER() OVER (PARTITION BY p.user_id ORDER BY p.created_at DESC, p.id DESC) AS rn
+            FROM posts p
+            WHERE p.user_id = %s
+               OR p.user_id IN (SELECT following_id FROM follows WHERE follower_id = %s)
+        ) ranked
+        WHERE ranked.rn <= %s
+        """,
+        (owner_id, owner_id, owner_id, limit)
+    )
+
+
+def seed_timeline(dbs, owner_id):
+    """
+    Rebuild a timeline that has never been seeded
+
+    Seeded timelines cost one primary-key read. Otherwise the marker row is
+    inserted first, so concurrent first reads seed the timeline only once.
+
+    Returns:
+        bool: True if the timeline was seeded by this call
+    """
+    if dbs.execute_query("SELECT 1 FROM timeline_seeds WHERE owner_id = %s", (owner_id,)):
+        return False
+    if not dbs.execute_query("INSERT IGNORE INTO timeline_seeds (owner_id) VALUES (%s)", (owner_id,)):
+        return False
+    rebuild_timeline(dbs, owner_id)
+    return True
+
+
+def rebuild_all_timelines(dbs=db):
+    """Recompute every user's timeline (run after bulk imports such as populate_database.py)"""
+    dbs.execute_query("DELETE FROM timeline_entries")
+    written = dbs.execute_query(
+        """
+        INSERT IGNORE INTO timeline_entries (owner_id, post_id, author_id, created_at)
+        SELECT f.follower_id, p.id, p.user_id, p.created_at
+        FROM posts p
+        INNER JOIN follows f ON f.following_id = p.user_id
+        UNION ALL
+        SELECT p.user_id, p.id, p.user_id, p.created_at
+        FROM posts p
+        """
+    )
+    dbs.execute_query("INSERT IGNORE INTO timeline_seeds (owner_id) SELECT id FROM users")
+    return written
+
+
+def read_timeline(dbs, owner_id, limit=50, before=None):
+    """
+    Read a page of a user's home timeline, newest first
+
+    Args:
+        dbs: Database or DatabaseSession
+        owner_id (int): Viewer whose timeline is read
+        limit (int): Max posts to return
+        before (tuple, optional): (created_at, post_id) of the last post already
+            shown; only older posts are returned
+
+    Returns:
+        list: Post rows joined with author info
+    """
+    where = "te.owner_id = %s"
+    params = [owner_id]
+    if before:
+        condition, condition_params = keyset_condition(
+            [('te.created_at', 'desc'), ('te.post_id', 'desc')], before
+        )
+        where += f" AND {condition}"
+        params.extend(condition_params)
+    params.append(limit)
+
+    return dbs.execute_query(
+        f"""
+        SELECT p.id, p.user_id, p.image_url, p.image_status, p.caption, p.created_at,
+               {counters.post_counter_columns('p')},
+               u.username, u.profile_pic, u.full_name
+        FROM timeline_entries te
+        INNER JOIN posts p ON p.id = te.post_id
+        INNER JOIN users u ON u.id = te.author_id
+        WHERE {where}
+        ORDER BY te.created_at DESC, te.post_id DESC
+        LIMIT %s
+        """,
+        tuple(params)
+    ) or []
+
+
+if __name__ == "__main__":
+    print("Rebuilding home timelines...")
+    count = rebuild_all_timelines()
+    print(f"Wrote {count} timeline entries")
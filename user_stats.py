@@ -0,0 +1,125 @@
+"""
+Per-user follower / following / post counters
+
+The `user_stats` table holds one row of counters per user, adjusted in the
+same transaction as follows, unfollows and new posts. Profile and people
+endpoints read these columns instead of three correlated COUNT(*) subqueries
+per user row, and people-you-may-know orders by the indexed followers_count.
+
+Functions take `dbs`, anything with an execute_query() method: the global
+`db` or a request-scoped DatabaseSession.
+"""
+from database import db
+
+# Column list for queries that LEFT JOIN user_stats us ON us.user_id = u.id
+STATS_COLUMNS = """
+    COALESCE(us.followers_count, 0) AS followers_count,
+    COALESCE(us.following_count, 0) AS following_count,
+    COALESCE(us.posts_count, 0) AS posts_count
+"""
+
+
+def ensure_user_stats(dbs, user_id):
+    """Create the zeroed counter row for a new user"""
+    return dbs.execute_query("INSERT IGNORE INTO user_stats (user_id) VALUES (%s)", (user_id,))
+
+
+def adjust_user_stats(dbs, user_id, followers=0, following=0, posts=0):
+    """
+    Apply deltas to a user's counters, creating the row if it is missing
+
+    Args:
+        dbs: Database or DatabaseSession (use the session that made the write)
+        user_id (int): User to update
+        followers (int): Change in followers_count
+        following (int): Change in following_count
+        posts (int): Change in posts_count
+    """
+    if not followers and not following and not posts:
+        return 0
+    # Clamp at zero so a stray double-decrement cannot underflow the UNSIGNED columns
+    return dbs.execute_query(
+        """
+        INSERT INTO user_stats (user_id, followers_count, following_count, posts_count)
+        VALUES (%s, GREATEST(%s, 0), GREATEST(%s, 0), GREATEST(%s, 0))
+        ON DUPLICATE KEY UPDATE
+            followers_count = GREATEST(CAST(followers_count AS SIGNED) + %s, 0),
+            following_count = GREATEST(CAST(following_count AS SIGNED) + %s, 0),
+            posts_count = GREATEST(CAST(posts_count AS SIGNED) + %s, 0)
+        """,
+        (user_id, followers, following, posts, followers, following, posts)
+    )
+
+
+def record_follow(dbs, follower_id, following_id, delta):
+    """Adjust both sides of a follow (+1) or unfollow (-1)"""
+    adjust_user_stats(dbs, follower_id, following=delta)
+    adjust_user_stats(dbs, following_id, followers=delta)
+
+
+def follower_ids(dbs, user_id):
+    """Ids of every account following `user_id`"""
+    rows = dbs.execute_query("SELECT follower_id FROM follows WHERE following_id = %s", (user_id,)) or []
+    return [row['follower_id'] for row in rows]
+
+
+def get_user_stats(dbs, user_id):
+    """
+    Read a user's counters
+
+    Returns:
+        dict: {'followers_count': int, 'following_count': int, 'posts_count': int}
+    """
+    rows = dbs.execute_query(
+        "SELECT followers_count, following_count, posts_count FROM user_stats WHERE user_id = %s",
+        (user_id,)
+    ) or [{}]
+    return {
+        'followers_count': int(rows[0].get('followers_count') or 0),
+        'following_count': int(rows[0].get('following_count') or 0),
+        'posts_count': int(rows[0].get('posts_count') or 0)
+    }
+
+
+def reconcile_user_stats(dbs=db, batch_size=1000):
+    """
+    Recompute every user's counters from follows and posts
+
+    Creates missing rows and walks users in id ranges of `batch_size`.
+
+    Returns:
+        int: Rows inserted or changed (as reported by MySQL)
+    """
+    bounds = dbs.execute_query("SELECT MIN(id) AS lo, MAX(id) AS hi FROM users") or [{}]
+    lo, hi = bounds[0].get('lo'), bounds[0].get('hi')
+    if lo is None:
+        return 0
+
+    changed = 0
+    start = int(lo)
+    while start <= int(hi):
+        end = start + batch_size
+        changed += dbs.execute_query(
+            """
+            INSERT INTO user_stats (user_id, followers_count, following_count, posts_count)
+            SELECT u.id,
+                   (SELECT COUNT(*) FROM follows f WHERE f.following_id = u.id),
+                   (SELECT COUNT(*) FROM follows f WHERE f.follower_id = u.id),
+                   (SELECT COUNT(*) FROM posts p WHERE p.user_id = u.id)
+            FROM users u
+            WHERE u.id >= %s AND u.id < %s
+            ON DUPLICATE KEY UPDATE
+                followers_count = VALUES(followers_count),
+                following_count = VALUES(following_count),
+                posts_count = VALUES(posts_count)
+            """,
+            (start, end)
+        ) or 0
+        start = end
+    return changed
+
+
+if __name__ == "__main__":
+    print("Reconciling user stats...")
+    count = reconcile_user_stats()
+    print(f"Updated {count} user_stats rows")
@@ -0,0 +1,163 @@
+"""
+Input validation and sanitization
+
+Every pattern is compiled once at import. sanitize_input() removes the
+blocked SQL fragments with the same four passes, in the same order, as the
+version that recompiled them on every call, so its output is unchanged: a
+later pass sees what an earlier one left ("-SELECT-" becomes "--", which the
+next pass removes), and a single combined alternation would miss that.
+clean_text() normalizes free text such as captions, bios, comments and
+messages in one scan for control characters.
+
+auth.py re-exports the validators, so `from auth import validate_username`
+keeps working. `python bench_validation.py` measures the per-call cost.
+"""
+import re
+
+USERNAME_MIN_LENGTH = 3
+USERNAME_MAX_LENGTH = 30
+EMAIL_MAX_LENGTH = 100
+PASSWORD_MIN_LENGTH = 8
+PASSWORD_MAX_LENGTH = 128
+
+# Free-text limits (characters)
+FULL_NAME_MAX_LENGTH = 100
+BIO_MAX_LENGTH = 500
+CAPTION_MAX_LENGTH = 2200
+COMMENT_MAX_LENGTH = 1000
+MESSAGE_MAX_LENGTH = 2000
+
+USERNAME_PATTERN = re.compile(r'[a-zA-Z0-9._]+')
+EMAIL_PATTERN = re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}')
+
+# SQL keywords, comment/statement tokens and tautologies, removed in this order
+_SQL_PATTERNS = tuple(re.compile(pattern, re.IGNORECASE) for pattern in (
+    r"\b(?:SELECT|INSERT|UPDATE|DELETE|DROP|CREATE|ALTER|EXEC|EXECUTE|UNION|SCRIPT)\b",
+    r"--|;|/\*|\*/|xp_|sp_",
+    r"\bor\b\s+\d+\s*=\s*\d+",
+    r"\band\b\s+\d+\s*=\s*\d+",
+))
+
+# C0 controls except tab, newline and carriage return, plus DEL
+_CONTROL_CHARS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]')
+
+
+def sanitize_input(value):
+    """
+    Sanitize input to prevent SQL injection and XSS
+    Note: Using parameterized queries is the primary defense,
+    but this adds an extra layer of validation
+
+    Args:
+        value: Input value to sanitize
+
+    Returns:
+        str: Sanitized value
+    """
+    if not isinstance(value, str):
+        return value
+    value = value.strip()
+    for pattern in _SQL_PATTERNS:
+        value = pattern.sub('', value)
+    return value
+
+
+def clean_text(value, max_length, label='Text'):
+    """
+    Normalize user-written text (captions, bios, comments, messages)
+
+    Strips surrounding whitespace and control characters and normalizes line
+    endings. Unlike sanitize_input, words are never removed, since a caption
+    may legitimately say "select" or contain a semicolon.
+
+    Args:
+        value: Submitted value (None is treated as empty)
+        max_length (int): Maximum length after cleaning
+        label (str): Field name used in the error message
+
+    Returns:
+        tuple: (cleaned text, error_message or None)
+    """
+    if value is None:
+        return '', None
+    if not isinstance(value, str):
+        value = str(value)
+    value = value.strip()
+    if '\r' in value:
+        value = value.replace('\r\n', '\n').replace('\r', '\n')
+    value = _CONTROL_CHARS.sub('', value)
+    if len(value) > max_length:
+        return value, f"{label} must be {max_length} characters or less"
+    return value, None
+
+
+def validate_username(username):
+    """
+    Validate username format
+
+    Args:
+        username (str): Username to validate
+
+    Returns:
+        tuple: (is_valid, error_message)
+    """
+    username = username.strip() if username else ''
+    if not username:
+        return False, "Username is required"
+
+    if len(username) < USERNAME_MIN_LENGTH:
+        return False, f"Username must be at least {USERNAME_MIN_LENGTH} characters"
+
+    if len(username) > USERNAME_MAX_LENGTH:
+        return False, f"Username must be {USERNAME_MAX_LENGTH} characters or less"
+
+    # Only allow alphanumeric, dots, and underscores
+    if not USERNAME_PATTERN.fullmatch(username):
+        return False, "Username can only contain letters, numbers, dots, and underscores"
+
+    return True, None
+
+
+def validate_email(email):
+    """
+    Validate email format
+
+    Args:
+        email (str): Email to validate
+
+    Returns:
+        tuple: (is_valid, error_message)
+    """
+    email = email.strip().lower() if email else ''
+    if not email:
+        return False, "Email is required"
+
+    if len(email) > EMAIL_MAX_LENGTH:
+        return False, f"Email must be {EMAIL_MAX_LENGTH} characters or less"
+
+    if not EMAIL_PATTERN.fullmatch(email):
+        return False, "Please enter a valid email address"
+
+    return True, None
+
+
+def validate_password(password):
+    """
+    Validate password strength
+
+    Args:
+        password (str): Password to validate
+
+    Returns:
+        tuple: (is_valid, error_message)
+    """
+    if not password:
+        return False, "Password is required"
+
+    if len(password) < PASSWORD_MIN_LENGTH:
+        return False, f"Password must be at least {PASSWORD_MIN_LENGTH} characters"
+
+    if len(password) > PASSWORD_MAX_LENGTH:
+        return False, "Password is too long"
+
+    return True, None